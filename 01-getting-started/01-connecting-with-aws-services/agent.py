@@ -6,7 +6,8 @@ from strands.models import BedrockModel
 from typing import Any
 from strands.types.tools import ToolResult, ToolUse
 import uuid
-from strands_tools import current_time, retrieve
+from strands_tools import current_time
+import cached_retrieve
 
 
 
@@ -198,7 +199,7 @@ agent = Agent(
     model=model,
     system_prompt=system_prompt,
     tools=[
-        retrieve,
+        cached_retrieve.retrieve_tool,
         current_time,
         get_booking_details,
         create_booking,
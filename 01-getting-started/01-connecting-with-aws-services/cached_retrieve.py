@@ -0,0 +1,262 @@
+"""
+Caching wrapper around the strands_tools `retrieve` tool.
+
+The module exposes `retrieve_tool`, a tool with the same name, input schema and description as
+strands_tools.retrieve, so it can be passed to an Agent in its place (conversations that already
+called `retrieve` keep working):
+
+    import cached_retrieve
+    agent = Agent(tools=[cached_retrieve.retrieve_tool, ...])
+
+Results are cached by exact query and by normalized query (case, punctuation and whitespace
+insensitive) together with the retrieval parameters. Entries expire after a TTL, the cache is
+bounded with LRU eviction, and it is invalidated whenever the latest ingestion job of the
+Knowledge Base changes. Queries that miss both keys are looked up in a semantic cache of recent
+query embeddings (see semantic_cache.py), so paraphrased questions are served from the cache too.
+Hit ratios are available through cache_metrics() / log_cache_metrics().
+
+Configuration (environment variables):
+    RETRIEVE_CACHE_TTL_SECONDS: time to live of a cached result (default 300)
+    RETRIEVE_CACHE_MAX_ENTRIES: maximum number of cached results (default 256)
+    RETRIEVE_CACHE_INGESTION_CHECK_SECONDS: how often the ingestion job id is checked (default 60)
+    RETRIEVE_SEMANTIC_CACHE: set to "false" to disable the semantic cache (default "true")
+"""
+
+import copy
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+import boto3
+from strands.tools.tools import PythonAgentTool
+from strands.types.tools import ToolResult, ToolUse
+from strands_tools import retrieve as _retrieve_tool
+
+from semantic_cache import SemanticCache
+
+logger = logging.getLogger(__name__)
+
+TOOL_SPEC = _retrieve_tool.TOOL_SPEC
+
+CACHE_TTL_SECONDS = float(os.environ.get("RETRIEVE_CACHE_TTL_SECONDS", 300))
+CACHE_MAX_ENTRIES = int(os.environ.get("RETRIEVE_CACHE_MAX_ENTRIES", 256))
+INGESTION_CHECK_SECONDS = float(os.environ.get("RETRIEVE_CACHE_INGESTION_CHECK_SECONDS", 60))
+SEMANTIC_CACHE_ENABLED = os.environ.get("RETRIEVE_SEMANTIC_CACHE", "true").lower() == "true"
+
+
+def normalize_query(text: str) -> str:
+    """
+    Normalize a query so that trivially different phrasings share a cache key
+    e.g. "What's on the Nonna menu?" and "what's on the  nonna menu" map to the same key
+    """
+    return " ".join(re.sub(r"[^\w\s']", " ", text.lower()).split())
+
+
+class RetrievalCache:
+    """
+    Thread-safe TTL + LRU cache of retrieve tool results, keyed by query and retrieval parameters
+    """
+
+    def __init__(self, ttl_seconds=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._ingestion_tokens = {}
+        self._ingestion_checked_at = {}
+        self.stats = {"exact_hits": 0, "normalized_hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    @staticmethod
+    def make_keys(tool_input: dict):
+        """
+        Build the (exact, normalized) cache keys for a retrieve tool input
+        """
+        params = json.dumps(
+            {
+                "knowledgeBaseId": tool_input.get("knowledgeBaseId") or os.environ.get("KNOWLEDGE_BASE_ID"),
+                "region": tool_input.get("region") or os.environ.get("AWS_REGION"),
+                "numberOfResults": tool_input.get("numberOfResults"),
+                "score": tool_input.get("score"),
+                "retrieveFilter": tool_input.get("retrieveFilter"),
+            },
+            sort_keys=True,
+            default=str,
+        )
+        text = tool_input.get("text", "")
+        return ("exact", params, text), ("normalized", params, normalize_query(text))
+
+    def get(self, tool_input: dict):
+        """
+        Return a cached result for the tool input, or None on a miss
+        """
+        exact_key, normalized_key = self.make_keys(tool_input)
+        now = time.monotonic()
+        with self._lock:
+            for key, stat in ((exact_key, "exact_hits"), (normalized_key, "normalized_hits")):
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                stored_at, result = entry
+                if now - stored_at > self.ttl_seconds:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                self.stats[stat] += 1
+                return copy.deepcopy(result)
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, tool_input: dict, result: ToolResult):
+        """
+        Store a successful result under both the exact and the normalized key
+        """
+        now = time.monotonic()
+        with self._lock:
+            for key in self.make_keys(tool_input):
+                self._entries[key] = (now, copy.deepcopy(result))
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.stats["invalidations"] += 1
+
+    def check_ingestion(self, kb_id: str, region: str):
+        """
+        Invalidate the cache if the latest ingestion job of the Knowledge Base changed since the last
+        check. The Bedrock API is queried at most once every INGESTION_CHECK_SECONDS per Knowledge Base
+        Returns:
+            True if the cache was invalidated
+        """
+        if not kb_id:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            if now - self._ingestion_checked_at.get(kb_id, float("-inf")) < INGESTION_CHECK_SECONDS:
+                return False
+            self._ingestion_checked_at[kb_id] = now
+        try:
+            token = latest_ingestion_token(kb_id, region)
+        except Exception as e:
+            logger.warning("Could not check ingestion jobs for Knowledge Base %s: %s", kb_id, e)
+            return False
+        with self._lock:
+            previous = self._ingestion_tokens.get(kb_id)
+            self._ingestion_tokens[kb_id] = token
+        if previous is not None and previous != token:
+            logger.info("Knowledge Base %s was re-ingested, invalidating retrieval cache", kb_id)
+            self.clear()
+            return True
+        return False
+
+    def metrics(self) -> dict:
+        with self._lock:
+            hits = self.stats["exact_hits"] + self.stats["normalized_hits"]
+            lookups = hits + self.stats["misses"]
+            return {
+                **self.stats,
+                "entries": len(self._entries),
+                "hit_ratio": hits / lookups if lookups else 0.0,
+                "exact_hit_ratio": self.stats["exact_hits"] / lookups if lookups else 0.0,
+                "normalized_hit_ratio": self.stats["normalized_hits"] / lookups if lookups else 0.0,
+            }
+
+
+def latest_ingestion_token(kb_id: str, region: str):
+    """
+    Return the id and status of the most recent ingestion job of every data source of a Knowledge Base
+    """
+    client = boto3.client("bedrock-agent", region_name=region)
+    token = []
+    data_sources = client.list_data_sources(knowledgeBaseId=kb_id, maxResults=100)["dataSourceSummaries"]
+    for ds in data_sources:
+        jobs = client.list_ingestion_jobs(
+            knowledgeBaseId=kb_id,
+            dataSourceId=ds["dataSourceId"],
+            sortBy={"attribute": "STARTED_AT", "order": "DESCENDING"},
+            maxResults=1,
+        )["ingestionJobSummaries"]
+        if jobs:
+            token.append((ds["dataSourceId"], jobs[0]["ingestionJobId"], jobs[0]["status"]))
+    return tuple(sorted(token))
+
+
+_cache = RetrievalCache()
+_semantic_cache = SemanticCache(ttl_seconds=CACHE_TTL_SECONDS) if SEMANTIC_CACHE_ENABLED else None
+
+
+def cache_metrics() -> dict:
+    """
+    Return the retrieval cache counters and hit ratios
+    """
+    metrics = _cache.metrics()
+    if _semantic_cache is not None:
+        metrics["semantic"] = _semantic_cache.metrics()
+    return metrics
+
+
+def log_cache_metrics():
+    """
+    Write the cache metrics to stdout in CloudWatch Embedded Metric Format so they are extracted as
+    metrics. The document is printed rather than logged: CloudWatch only extracts lines that are bare
+    JSON, without a logging or Lambda runtime prefix
+    """
+    metrics = cache_metrics()
+    names = ["hit_ratio", "exact_hit_ratio", "normalized_hit_ratio", "misses", "evictions", "entries"]
+    if "semantic" in metrics:
+        metrics["semantic_hit_ratio"] = metrics["semantic"]["hit_ratio"]
+        metrics["semantic_latency_saved_ms"] = metrics["semantic"]["latency_saved_ms"]
+        names += ["semantic_hit_ratio", "semantic_latency_saved_ms"]
+    print(json.dumps({
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": "RestaurantAssistant/RetrieveCache",
+                "Dimensions": [[]],
+                "Metrics": [{"Name": name} for name in names],
+            }],
+        },
+        **{name: metrics[name] for name in names},
+    }), flush=True)
+
+
+def cached_retrieve(tool: ToolUse, **kwargs: Any) -> ToolResult:
+    """
+    Drop-in replacement for strands_tools.retrieve that serves repeated questions from the cache
+    """
+    tool_input = tool["input"]
+    kb_id = tool_input.get("knowledgeBaseId") or os.environ.get("KNOWLEDGE_BASE_ID")
+    region = tool_input.get("region") or os.environ.get("AWS_REGION", "us-west-2")
+    if _cache.check_ingestion(kb_id, region) and _semantic_cache is not None:
+        _semantic_cache.clear()
+
+    text = tool_input.get("text", "")
+    params = RetrievalCache.make_keys(tool_input)[0][1]
+    cached = _cache.get(tool_input)
+    if cached is None and _semantic_cache is not None:
+        cached = _semantic_cache.lookup(text, params)
+    if cached is not None:
+        logger.debug("Retrieval cache hit for query: %s", text)
+        cached["toolUseId"] = tool["toolUseId"]
+        return cached
+
+    start = time.perf_counter()
+    result = _retrieve_tool.retrieve(tool, **kwargs)
+    latency_ms = (time.perf_counter() - start) * 1000
+    if result.get("status") == "success":
+        _cache.put(tool_input, result)
+        if _semantic_cache is not None:
+            _semantic_cache.add(text, params, result, latency_ms)
+    return result
+
+
+# The caching tool under the name of the tool it replaces
+retrieve_tool = PythonAgentTool(TOOL_SPEC["name"], TOOL_SPEC, cached_retrieve)
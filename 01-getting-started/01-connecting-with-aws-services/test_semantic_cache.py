@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Regression test of the Knowledge Base semantic cache with the default hashing embedder: paraphrases
+of a cached question are served from the cache, near-duplicate questions about another restaurant
+or dish are not.
+
+Usage:
+    python test_semantic_cache.py
+    python -m pytest test_semantic_cache.py
+"""
+
+from semantic_cache import HashingEmbedder, SemanticCache
+
+params = "kb-id|numberOfResults=5"
+question = (
+    "Hi, I am visiting Nonna with my family next Saturday evening, does Nonna have gluten free pasta "
+    "options on the kids menu for children with celiac disease and nut allergies?"
+)
+
+
+def cache_with(text):
+    cache = SemanticCache(embed_fn=HashingEmbedder())
+    cache.add(text, params, {"passages": [text]}, latency_ms=100.0)
+    return cache
+
+
+def test_paraphrases_hit():
+    cache = cache_with("what is on the Nonna menu")
+    for paraphrase in ["What's on the menu at Nonna?", "show me Nonna's menu"]:
+        assert cache.lookup(paraphrase, params) is not None, paraphrase
+
+
+def test_other_entities_and_nouns_miss():
+    cache = cache_with(question)
+    for original, replacement in [("pasta", "pizza"), ("Nonna", "Bistro"), ("nut", "egg")]:
+        near_duplicate = question.replace(original, replacement)
+        assert cache.lookup(near_duplicate, params) is None, near_duplicate
+    assert cache.lookup(question, params) is not None
+
+
+if __name__ == "__main__":
+    test_paraphrases_hit()
+    test_other_entities_and_nouns_miss()
+    print("✅ Paraphrases hit, questions about other restaurants or dishes miss")
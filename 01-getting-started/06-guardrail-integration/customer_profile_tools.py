@@ -2,104 +2,155 @@ from customer_profiles import CustomerProfileManager
 from strands import tool
 from typing import Dict, Optional, List
 
-# Initialize the customer profile manager
+# Initialize the customer profile manager (profiles are read from the store on demand)
 profile_manager = CustomerProfileManager()
 
+
+def _find_profile(customer_id: str = None, email: str = None):
+    """Look up a profile by customer ID, or by email when no customer ID is given"""
+    if customer_id:
+        return profile_manager.get_profile(customer_id)
+    return profile_manager.get_profile_by_email(email)
+
+
 @tool
 def get_customer_profile(customer_id: str = None, email: str = None) -> Dict:
     """
     Get customer profile information by customer ID or email.
-    
+    The purchase history and support tickets are not included, only their counts:
+    use list_customer_purchases and list_customer_tickets to read them.
+
     Args:
         customer_id (str, optional): The customer ID to lookup
         email (str, optional): The customer email to lookup
-        
+
     Returns:
         dict: Customer profile information or error message
     """
     if not customer_id and not email:
-        return {"status": "error", content: [{"text": "Either customer_id or email must be provided"}]}
-    
-    profile = None
-    if customer_id:
-        profile = profile_manager.get_profile(customer_id)
-    elif email:
-        profile = profile_manager.get_profile_by_email(email)
-        
+        return {"status": "error", "content": [{"text": "Either customer_id or email must be provided"}]}
+
+    profile = _find_profile(customer_id, email)
     if not profile:
-        return {"status": "error", content: [{"text": "Customer profile not found"}]}
+        return {"status": "error", "content": [{"text": "Customer profile not found"}]}
 
-    return profile.to_dict()
+    return {
+        **profile.to_dict(include_histories=False),
+        "purchase_count": profile_manager.store.count_history("purchase_history", profile.customer_id),
+        "support_ticket_count": profile_manager.store.count_history("support_tickets", profile.customer_id),
+    }
 
 
 @tool
-def list_customer_purchases(customer_id: str = None, email: str = None) -> List[Dict]:
+def list_customer_purchases(customer_id: str = None, email: str = None, page: int = 1, page_size: int = 20) -> Dict:
     """
-    Get a list of customer purchases by customer ID or email.
-    
+    Get a page of customer purchases by customer ID or email, oldest first.
+
     Args:
         customer_id (str, optional): The customer ID to lookup
         email (str, optional): The customer email to lookup
-        
+        page (int, optional): The page number, starting at 1
+        page_size (int, optional): The number of purchases per page (at most 100)
+
     Returns:
-        list: List of customer purchases or error message
+        dict: The purchases of the page ("items"), the total number of purchases and whether more pages exist, or error message
     """
     if not customer_id and not email:
-        return {"status": "error", content: [{"text": "Either customer_id or email must be provided"}]}
-    
-    profile = None
-    if customer_id:
-        profile = profile_manager.get_profile(customer_id)
-    elif email:
-        profile = profile_manager.get_profile_by_email(email)
-        
+        return {"status": "error", "content": [{"text": "Either customer_id or email must be provided"}]}
+
+    profile = _find_profile(customer_id, email)
     if not profile:
-        return {"status": "error", content: [{"text": "Customer profile not found"}]}
-        
-    return profile.purchase_history
+        return {"status": "error", "content": [{"text": "Customer profile not found"}]}
+
+    return profile_manager.get_purchases(profile.customer_id, page, page_size)
 
 
 @tool
-def list_customer_tickets(customer_id: str = None, email: str = None) -> List[Dict]:
+def list_customer_tickets(customer_id: str = None, email: str = None, page: int = 1, page_size: int = 20) -> Dict:
     """
-    Get a list of customer support tickets by customer ID or email.
-    
+    Get a page of customer support tickets by customer ID or email, oldest first.
+
     Args:
         customer_id (str, optional): The customer ID to lookup
         email (str, optional): The customer email to lookup
-        
+        page (int, optional): The page number, starting at 1
+        page_size (int, optional): The number of tickets per page (at most 100)
+
     Returns:
-        list: List of customer support tickets or error message
+        dict: The tickets of the page ("items"), the total number of tickets and whether more pages exist, or error message
     """
     if not customer_id and not email:
-        return {"status": "error", content: [{"text": "Either customer_id or email must be provided"}]}
-    
-    profile = None
-    if customer_id:
-        profile = profile_manager.get_profile(customer_id)
-    elif email:
-        profile = profile_manager.get_profile_by_email(email)
-        
+        return {"status": "error", "content": [{"text": "Either customer_id or email must be provided"}]}
+
+    profile = _find_profile(customer_id, email)
     if not profile:
-        return {"status": "error", content: [{"text": "Customer profile not found"}]}
-        
-    return profile.support_tickets
+        return {"status": "error", "content": [{"text": "Customer profile not found"}]}
+
+    return profile_manager.get_support_tickets(profile.customer_id, page, page_size)
+
+
+def _resolve(customer_ids: List[str] = None, emails: List[str] = None):
+    """Resolve the requested customers, returning (customer IDs found, requested keys not found)"""
+    resolved = profile_manager.resolve_customer_ids(customer_ids, emails)
+    found = list(dict.fromkeys(cid for cid in resolved.values() if cid))
+    not_found = [key for key, cid in resolved.items() if not cid]
+    return found, not_found
+
+
+@tool
+def get_customer_spend_summary(customer_ids: List[str] = None, emails: List[str] = None) -> Dict:
+    """
+    Get the total spend and number of purchases of one or more customers, broken down by product type,
+    with the totals over all the requested customers. Use it instead of adding up purchase lists.
+
+    Args:
+        customer_ids (list, optional): The customer IDs to summarize
+        emails (list, optional): The customer emails to summarize
+
+    Returns:
+        dict: Spend summary per customer ("customers"), over all of them ("overall") and the customers not found, or error message
+    """
+    if not customer_ids and not emails:
+        return {"status": "error", "content": [{"text": "Either customer_ids or emails must be provided"}]}
+
+    found, not_found = _resolve(customer_ids, emails)
+    return {**profile_manager.spend_summary(found), "not_found": not_found}
+
+
+@tool
+def get_customer_ticket_summary(customer_ids: List[str] = None, emails: List[str] = None) -> Dict:
+    """
+    Get the number of open and closed support tickets of one or more customers, in total and by ticket type,
+    with the counts over all the requested customers. Use it instead of counting ticket lists.
+
+    Args:
+        customer_ids (list, optional): The customer IDs to summarize
+        emails (list, optional): The customer emails to summarize
+
+    Returns:
+        dict: Ticket counts per customer ("customers"), over all of them ("overall") and the customers not found, or error message
+    """
+    if not customer_ids and not emails:
+        return {"status": "error", "content": [{"text": "Either customer_ids or emails must be provided"}]}
+
+    found, not_found = _resolve(customer_ids, emails)
+    return {**profile_manager.ticket_summary(found), "not_found": not_found}
 
 
 @tool
 def update_customer_profile(customer_id: str, updates: Dict) -> Dict:
     """
     Update customer profile information.
-    
+
     Args:
         customer_id (str): The customer ID to update
         updates (dict): The updates to apply to the profile
-        
+
     Returns:
         dict: Updated customer profile or error message
     """
     profile = profile_manager.update_profile(customer_id, updates)
     if not profile:
-        return {"status": "error", content: [{"text": "Customer profile not found"}]}
-        
-    return profile.to_dict()
+        return {"status": "error", "content": [{"text": "Customer profile not found"}]}
+
+    return profile.to_dict(include_histories=False)
@@ -2,15 +2,41 @@
 Customer Profile Management for Solar KB Agent
 """
 
-import json
 import os
+import threading
+import time
 import uuid
-from datetime import datetime
-from typing import Dict, List, Optional
+from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from profile_store import SQLiteProfileStore, history_tables
 
 
 class CustomerProfile:
-    """Customer profile data model"""
+    """
+    Customer profile data model
+
+    Profiles use __slots__ to keep their memory footprint small. When created with a
+    `history_loader`, a purchase history or support ticket list that is not given is only read,
+    through history_loader(kind, customer_id), the first time it is accessed.
+    """
+
+    __slots__ = (
+        "customer_id",
+        "name",
+        "email",
+        "country",
+        "state",
+        "preferences",
+        "created_at",
+        "updated_at",
+        "_purchase_history",
+        "_support_tickets",
+        "_history_loader",
+    )
 
     def __init__(
         self,
@@ -24,90 +50,290 @@ class CustomerProfile:
         preferences: Dict = None,
         created_at: str = None,
         updated_at: str = None,
+        history_loader: Callable[[str, str], List[Dict]] = None,
     ):
         self.customer_id = customer_id
         self.name = name
         self.email = email
         self.country = country
         self.state = state
-        self.purchase_history = purchase_history or []
-        self.support_tickets = support_tickets or []
+        self._history_loader = history_loader
+        # None marks a history that is not loaded yet
+        empty = None if history_loader else []
+        self._purchase_history = purchase_history if purchase_history is not None else empty
+        self._support_tickets = support_tickets if support_tickets is not None else empty
         self.preferences = preferences or {}
         self.created_at = created_at or datetime.now().isoformat()
         self.updated_at = updated_at or datetime.now().isoformat()
 
-    def to_dict(self) -> Dict:
-        """Convert profile to dictionary"""
-        return {
+    def _history(self, kind: str) -> List[Dict]:
+        items = getattr(self, "_" + kind)
+        if items is None:
+            items = self._history_loader(kind, self.customer_id)
+            setattr(self, "_" + kind, items)
+        return items
+
+    def history_loaded(self, kind: str) -> bool:
+        """Whether the "purchase_history" or "support_tickets" list is in memory"""
+        return getattr(self, "_" + kind) is not None
+
+    @property
+    def purchase_history(self) -> List[Dict]:
+        return self._history("purchase_history")
+
+    @purchase_history.setter
+    def purchase_history(self, value: List[Dict]):
+        self._purchase_history = value if value is not None else []
+
+    @property
+    def support_tickets(self) -> List[Dict]:
+        return self._history("support_tickets")
+
+    @support_tickets.setter
+    def support_tickets(self, value: List[Dict]):
+        self._support_tickets = value if value is not None else []
+
+    def to_dict(self, include_histories: bool = True) -> Dict:
+        """Convert profile to dictionary, optionally without the purchase history and support tickets"""
+        data = {
             "customer_id": self.customer_id,
             "name": self.name,
             "email": self.email,
             "country": self.country,
             "state": self.state,
-            "purchase_history": self.purchase_history,
-            "support_tickets": self.support_tickets,
+            "purchase_history": self.purchase_history if include_histories else None,
+            "support_tickets": self.support_tickets if include_histories else None,
             "preferences": self.preferences,
             "created_at": self.created_at,
             "updated_at": self.updated_at,
         }
+        if not include_histories:
+            for kind in history_tables:
+                del data[kind]
+        return data
 
     @classmethod
-    def from_dict(cls, data: Dict) -> "CustomerProfile":
+    def from_dict(cls, data: Dict, history_loader: Callable = None) -> "CustomerProfile":
         """Create profile from dictionary"""
-        return cls(**data)
+        return cls(**data, history_loader=history_loader)
+
+
+class ProfilesView(Mapping):
+    """Read-only mapping of customer ID to profile, backed by the store of a manager"""
+
+    def __init__(self, manager: "CustomerProfileManager"):
+        self._manager = manager
+
+    def __getitem__(self, customer_id: str) -> CustomerProfile:
+        profile = self._manager.get_profile(customer_id)
+        if profile is None:
+            raise KeyError(customer_id)
+        return profile
+
+    def __iter__(self):
+        return self._manager.store.iter_ids()
+
+    def __len__(self):
+        return len(self._manager.store)
 
 
 class CustomerProfileManager:
-    """Manager for customer profiles"""
+    """
+    Manager for customer profiles
+
+    Profiles live in a store (see profile_store.py) and are only materialized when they are
+    accessed: lookups by customer ID, email or location go to the store indexes, the resulting
+    CustomerProfile objects are kept in a bounded LRU cache, and their purchase history and
+    support tickets are read on first access or one page at a time (get_purchases,
+    get_support_tickets). Opening the manager therefore does not read the profiles, and memory
+    stays bounded by `max_cached_profiles` whatever the size of the store.
+    `profiles` is a read-only mapping view of the whole store.
+
+    Changes are written through the store, one profile or one history entry at a time.
+    By default profiles are stored in a SQLite database next to `profiles_file`, and an existing
+    `profiles_file` JSON is imported into it the first time.
+    """
 
-    def __init__(self, profiles_file: str = "customer_profiles.json"):
+    def __init__(
+        self,
+        profiles_file: str = "customer_profiles.json",
+        store=None,
+        max_cached_profiles: int = 1024,
+    ):
         self.profiles_file = profiles_file
-        self.profiles: Dict[str, CustomerProfile] = {}
-        self._load_profiles()
-
-    def _load_profiles(self):
-        """Load profiles from file"""
-        if os.path.exists(self.profiles_file):
-            try:
-                with open(self.profiles_file, "r") as f:
-                    profile_data = json.load(f)
-                    for customer_id, data in profile_data.items():
-                        self.profiles[customer_id] = CustomerProfile.from_dict(data)
-            except Exception as e:
-                print(f"Error loading profiles: {str(e)}")
-
-    def _save_profiles(self):
-        """Save profiles to file"""
+        if store is None:
+            store = SQLiteProfileStore(os.path.splitext(profiles_file)[0] + ".db")
+            if len(store) == 0 and os.path.exists(profiles_file):
+                store.import_json(profiles_file)
+        self.store = store
+        self.max_cached_profiles = max_cached_profiles
+        self._cache: "OrderedDict[str, CustomerProfile]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.profiles = ProfilesView(self)
+
+    def _cache_profile(self, profile: CustomerProfile):
+        """Add a profile to the LRU cache, evicting the least recently used ones"""
+        with self._cache_lock:
+            self._cache[profile.customer_id] = profile
+            self._cache.move_to_end(profile.customer_id)
+            while len(self._cache) > self.max_cached_profiles:
+                self._cache.popitem(last=False)
+
+    def _persist(self, write, *args, **kwargs):
+        """Write a change to the store"""
         try:
-            profile_data = {
-                customer_id: profile.to_dict()
-                for customer_id, profile in self.profiles.items()
-            }
-            with open(self.profiles_file, "w") as f:
-                json.dump(profile_data, f, indent=2)
+            write(*args, **kwargs)
         except Exception as e:
             print(f"Error saving profiles: {str(e)}")
 
+    def bulk_load(self, profiles: Iterable[Dict], batch_size: int = 1000) -> int:
+        """
+        Write many profile dicts to the store in large transactions, without materializing them.
+        Existing profiles with the same customer IDs are replaced
+        Returns:
+            number of profiles written
+        """
+        written = self.store.put_many(profiles, batch_size=batch_size)
+        with self._cache_lock:
+            self._cache.clear()
+        return written
+
+    def export_json(self, path: str = None):
+        """Export every profile to a JSON file (customer_profiles.json format)"""
+        self.store.export_json(path or self.profiles_file)
+
     def create_profile(self, profile_data: Dict) -> CustomerProfile:
         """Create a new customer profile"""
         if "customer_id" not in profile_data:
             profile_data["customer_id"] = str(uuid.uuid4())
 
-        profile = CustomerProfile.from_dict(profile_data)
-        self.profiles[profile.customer_id] = profile
-        self._save_profiles()
+        profile = CustomerProfile.from_dict(profile_data, history_loader=self.store.get_history)
+        self._persist(self.store.put_profile, profile.to_dict())
+        self._cache_profile(profile)
         return profile
 
     def get_profile(self, customer_id: str) -> Optional[CustomerProfile]:
         """Get a customer profile by ID"""
-        return self.profiles.get(customer_id)
+        with self._cache_lock:
+            profile = self._cache.get(customer_id)
+            if profile is not None:
+                self._cache.move_to_end(customer_id)
+                return profile
+        data = self.store.get_profile(customer_id)
+        if data is None:
+            return None
+        profile = CustomerProfile.from_dict(data, history_loader=self.store.get_history)
+        self._cache_profile(profile)
+        return profile
 
     def get_profile_by_email(self, email: str) -> Optional[CustomerProfile]:
         """Get a customer profile by email"""
-        for profile in self.profiles.values():
-            if profile.email.lower() == email.lower():
-                return profile
-        return None
+        customer_id = self.store.find_by_email(email)
+        return self.get_profile(customer_id) if customer_id else None
+
+    def get_profiles_by_location(
+        self, country: str, state: str = None
+    ) -> List[CustomerProfile]:
+        """Get the customer profiles of a country, or of a state of a country"""
+        return [
+            self.get_profile(customer_id)
+            for customer_id in self.store.find_by_location(country, state)
+        ]
+
+    def _history_page(
+        self, customer_id: str, kind: str, page: int, page_size: int
+    ) -> Optional[Dict]:
+        """Read one page of a history from the store, oldest entries first"""
+        if self.get_profile(customer_id) is None:
+            return None
+        page = max(1, int(page))
+        page_size = min(max(1, int(page_size)), 100)
+        total = self.store.count_history(kind, customer_id)
+        return {
+            "customer_id": customer_id,
+            "items": self.store.get_history(
+                kind, customer_id, offset=(page - 1) * page_size, limit=page_size
+            ),
+            "page": page,
+            "page_size": page_size,
+            "total": total,
+            "has_more": page * page_size < total,
+        }
+
+    def get_purchases(
+        self, customer_id: str, page: int = 1, page_size: int = 20
+    ) -> Optional[Dict]:
+        """Get one page of the purchase history of a customer"""
+        return self._history_page(customer_id, "purchase_history", page, page_size)
+
+    def get_support_tickets(
+        self, customer_id: str, page: int = 1, page_size: int = 20
+    ) -> Optional[Dict]:
+        """Get one page of the support tickets of a customer"""
+        return self._history_page(customer_id, "support_tickets", page, page_size)
+
+    def resolve_customer_ids(
+        self, customer_ids: List[str] = None, emails: List[str] = None
+    ) -> Dict[str, Optional[str]]:
+        """Map every requested customer ID or email to the customer ID of its profile (None if not found)"""
+        resolved = {}
+        for customer_id in customer_ids or []:
+            resolved[customer_id] = (
+                customer_id if self.store.get_profile(customer_id) else None
+            )
+        for email in emails or []:
+            resolved[email] = self.store.find_by_email(email)
+        return resolved
+
+    def spend_summary(self, customer_ids: List[str]) -> Dict:
+        """
+        Summarize the spend of customers from the store aggregates
+        Args:
+            customer_ids (list): customer IDs
+        Returns:
+            dict with, per customer, the total spend and purchases and the breakdown per product
+            type, and the same figures over all the customers ("overall")
+        """
+        customers = {
+            customer_id: {"total_spend": 0.0, "purchases": 0, "by_product_type": {}}
+            for customer_id in customer_ids
+        }
+        overall = {"total_spend": 0.0, "purchases": 0, "by_product_type": {}}
+        for customer_id, product_type, purchases, quantity, spend in self.store.spend_summary(
+            list(customers)
+        ):
+            for summary in (customers[customer_id], overall):
+                summary["total_spend"] += spend
+                summary["purchases"] += purchases
+                totals = summary["by_product_type"].setdefault(
+                    product_type, {"spend": 0.0, "purchases": 0, "quantity": 0}
+                )
+                totals["spend"] += spend
+                totals["purchases"] += purchases
+                totals["quantity"] += quantity
+        return {"customers": customers, "overall": overall}
+
+    def ticket_summary(self, customer_ids: List[str]) -> Dict:
+        """
+        Summarize the support tickets of customers from the store aggregates
+        Args:
+            customer_ids (list): customer IDs
+        Returns:
+            dict with, per customer, the ticket counts per status and per type and status, and
+            the same counts over all the customers ("overall")
+        """
+        customers = {
+            customer_id: {"by_status": {}, "by_type": {}} for customer_id in customer_ids
+        }
+        overall = {"by_status": {}, "by_type": {}}
+        for customer_id, ticket_type, status, tickets in self.store.ticket_summary(
+            list(customers)
+        ):
+            for summary in (customers[customer_id], overall):
+                summary["by_status"][status] = summary["by_status"].get(status, 0) + tickets
+                by_status = summary["by_type"].setdefault(ticket_type, {})
+                by_status[status] = by_status.get(status, 0) + tickets
+        return {"customers": customers, "overall": overall}
 
     def update_profile(
         self, customer_id: str, updates: Dict
@@ -117,13 +343,26 @@ class CustomerProfileManager:
         if not profile:
             return None
 
-        profile_dict = profile.to_dict()
+        profile_dict = profile.to_dict(include_histories=False)
         profile_dict.update(updates)
+        # the customer ID is the key of the profile in the store
+        profile_dict["customer_id"] = customer_id
         profile_dict["updated_at"] = datetime.now().isoformat()
 
-        updated_profile = CustomerProfile.from_dict(profile_dict)
-        self.profiles[customer_id] = updated_profile
-        self._save_profiles()
+        updated_profile = CustomerProfile.from_dict(
+            profile_dict, history_loader=self.store.get_history
+        )
+        # keep the histories already in memory, the others stay unloaded
+        for kind in history_tables:
+            if kind not in updates and profile.history_loaded(kind):
+                setattr(updated_profile, kind, getattr(profile, kind))
+        histories = any(kind in updates for kind in history_tables)
+        self._persist(
+            self.store.put_profile,
+            updated_profile.to_dict(include_histories=histories),
+            histories=histories,
+        )
+        self._cache_profile(updated_profile)
         return updated_profile
 
     def add_purchase(self, customer_id: str, purchase: Dict) -> bool:
@@ -137,9 +376,10 @@ class CustomerProfileManager:
         if "purchase_date" not in purchase:
             purchase["purchase_date"] = datetime.now().isoformat()
 
-        profile.purchase_history.append(purchase)
+        if profile.history_loaded("purchase_history"):
+            profile.purchase_history.append(purchase)
         profile.updated_at = datetime.now().isoformat()
-        self._save_profiles()
+        self._persist(self.store.add_purchase, customer_id, purchase, profile.updated_at)
         return True
 
     def add_support_ticket(self, customer_id: str, ticket: Dict) -> bool:
@@ -153,117 +393,194 @@ class CustomerProfileManager:
         if "created_at" not in ticket:
             ticket["created_at"] = datetime.now().isoformat()
 
-        profile.support_tickets.append(ticket)
+        if profile.history_loaded("support_tickets"):
+            profile.support_tickets.append(ticket)
         profile.updated_at = datetime.now().isoformat()
-        self._save_profiles()
+        self._persist(self.store.add_support_ticket, customer_id, ticket, profile.updated_at)
         return True
 
 
-def generate_synthetic_profiles(count: int = 10) -> List[CustomerProfile]:
-    """Generate synthetic customer profiles for testing"""
-    countries = ["USA", "Canada", "Australia", "UK", "Germany"]
-    states = {
-        "USA": ["California", "Texas", "New York", "Florida", "Washington"],
-        "Canada": ["Ontario", "Quebec", "British Columbia", "Alberta"],
-        "Australia": ["New South Wales", "Victoria", "Queensland"],
-        "UK": ["England", "Scotland", "Wales"],
-        "Germany": ["Bavaria", "Berlin", "Hesse"],
+countries = ["USA", "Canada", "Australia", "UK", "Germany"]
+states = {
+    "USA": ["California", "Texas", "New York", "Florida", "Washington"],
+    "Canada": ["Ontario", "Quebec", "British Columbia", "Alberta"],
+    "Australia": ["New South Wales", "Victoria", "Queensland"],
+    "UK": ["England", "Scotland", "Wales"],
+    "Germany": ["Bavaria", "Berlin", "Hesse"],
+}
+products = [
+    {"name": "SolarPanel Pro", "price": 1200, "type": "panel"},
+    {"name": "SolarPanel Lite", "price": 800, "type": "panel"},
+    {"name": "PowerWall Battery", "price": 5000, "type": "battery"},
+    {"name": "SolarInverter X1", "price": 1500, "type": "inverter"},
+    {"name": "EcoCharge Controller", "price": 300, "type": "controller"},
+]
+ticket_types = [
+    "Installation",
+    "Maintenance",
+    "Performance",
+    "Billing",
+    "Technical",
+]
+
+# Reference date of the synthetic data, so that the same index always gives the same profile
+synthetic_base_date = datetime(2025, 1, 1)
+
+
+def synthetic_profile(i: int, base_date: datetime = synthetic_base_date) -> Dict:
+    """
+    Build the synthetic profile number i as a dict. The result only depends on i and base_date,
+    and every date is computed with timedelta offsets before base_date
+    """
+    country = countries[i % len(countries)]
+    state = states[country][i % len(states[country])]
+
+    # Generate purchase history
+    purchase_count = (i % 3) + 1  # 1-3 purchases
+    purchases = []
+    for j in range(purchase_count):
+        product = products[(i + j) % len(products)]
+        purchase_date = base_date - timedelta(
+            days=((i + j) % 12) * 30 + (i * j) % 28, hours=(i + j) % 10
+        )
+        purchases.append(
+            {
+                "purchase_id": f"PUR{100+i}{j}",
+                "product_name": product["name"],
+                "product_type": product["type"],
+                "price": product["price"],
+                "quantity": (j % 2) + 1,
+                "purchase_date": purchase_date.isoformat(),
+            }
+        )
+
+    # Generate support tickets
+    ticket_count = i % 4  # 0-3 tickets
+    tickets = []
+    for j in range(ticket_count):
+        ticket_type = ticket_types[(i + j) % len(ticket_types)]
+        created_date = base_date - timedelta(days=((i + j) % 12) * 30 + (i * j) % 28)
+        tickets.append(
+            {
+                "ticket_id": f"TKT{100+i}{j}",
+                "type": ticket_type,
+                "status": "closed" if j % 2 == 0 else "open",
+                "subject": f"{ticket_type} issue with {products[(i+j) % len(products)]['name']}",
+                "created_at": created_date.isoformat(),
+                "last_updated": (created_date + timedelta(days=(i + j) % 14)).isoformat(),
+            }
+        )
+
+    # Generate preferences
+    preferences = {
+        "contact_preference": "email" if i % 2 == 0 else "phone",
+        "newsletter": i % 3 == 0,
+        "maintenance_reminder": i % 2 == 0,
     }
-    products = [
-        {"name": "SolarPanel Pro", "price": 1200, "type": "panel"},
-        {"name": "SolarPanel Lite", "price": 800, "type": "panel"},
-        {"name": "PowerWall Battery", "price": 5000, "type": "battery"},
-        {"name": "SolarInverter X1", "price": 1500, "type": "inverter"},
-        {"name": "EcoCharge Controller", "price": 300, "type": "controller"},
-    ]
-    ticket_types = [
-        "Installation",
-        "Maintenance",
-        "Performance",
-        "Billing",
-        "Technical",
-    ]
 
-    manager = CustomerProfileManager()
-    created_profiles = []
-
-    for i in range(count):
-        customer_id = f"CUST{100+i}"
-        name = f"Customer {i+1}"
-        email = f"customer{i+1}@example.com"
-        country = countries[i % len(countries)]
-        state = states[country][i % len(states[country])]
-
-        # Generate purchase history
-        purchase_count = (i % 3) + 1  # 1-3 purchases
-        purchases = []
-        for j in range(purchase_count):
-            product = products[(i + j) % len(products)]
-            purchase_date = (
-                datetime.now()
-                .replace(month=((i + j) % 12) + 1, day=((i * j) % 28) + 1)
-                .isoformat()
-            )
+    return {
+        "customer_id": f"CUST{100+i}",
+        "name": f"Customer {i+1}",
+        "email": f"customer{i+1}@example.com",
+        "country": country,
+        "state": state,
+        "purchase_history": purchases,
+        "support_tickets": tickets,
+        "preferences": preferences,
+        "created_at": (base_date - timedelta(days=400 - i % 30)).isoformat(),
+        "updated_at": base_date.isoformat(),
+    }
 
-            purchases.append(
-                {
-                    "purchase_id": f"PUR{100+i}{j}",
-                    "product_name": product["name"],
-                    "product_type": product["type"],
-                    "price": product["price"],
-                    "quantity": (j % 2) + 1,
-                    "purchase_date": purchase_date,
-                }
-            )
 
-        # Generate support tickets
-        ticket_count = i % 4  # 0-3 tickets
-        tickets = []
-        for j in range(ticket_count):
-            ticket_type = ticket_types[(i + j) % len(ticket_types)]
-            created_date = (
-                datetime.now()
-                .replace(month=((i + j) % 12) + 1, day=((i * j) % 28) + 1)
-                .isoformat()
-            )
+def iter_synthetic_profiles(
+    count: int, start: int = 0, base_date: datetime = synthetic_base_date
+) -> Iterator[Dict]:
+    """Stream the synthetic profiles start to start + count - 1 as dicts"""
+    for i in range(start, start + count):
+        yield synthetic_profile(i, base_date)
 
-            tickets.append(
-                {
-                    "ticket_id": f"TKT{100+i}{j}",
-                    "type": ticket_type,
-                    "status": "closed" if j % 2 == 0 else "open",
-                    "subject": f"{ticket_type} issue with {products[(i+j) % len(products)]['name']}",
-                    "created_at": created_date,
-                    "last_updated": datetime.now().isoformat(),
-                }
-            )
 
-        # Generate preferences
-        preferences = {
-            "contact_preference": "email" if i % 2 == 0 else "phone",
-            "newsletter": i % 3 == 0,
-            "maintenance_reminder": i % 2 == 0,
-        }
+def _synthetic_chunk(args) -> List[Dict]:
+    start, count, base_date = args
+    return list(iter_synthetic_profiles(count, start, base_date))
 
-        # Create profile
-        profile_data = {
-            "customer_id": customer_id,
-            "name": name,
-            "email": email,
-            "country": country,
-            "state": state,
-            "purchase_history": purchases,
-            "support_tickets": tickets,
-            "preferences": preferences,
-        }
 
-        profile = manager.create_profile(profile_data)
-        created_profiles.append(profile)
+def iter_synthetic_profiles_parallel(
+    count: int,
+    start: int = 0,
+    base_date: datetime = synthetic_base_date,
+    workers: int = None,
+    chunk_size: int = 10000,
+) -> Iterator[Dict]:
+    """Stream the same profiles as iter_synthetic_profiles, built in chunks by a process pool"""
+    chunks = [
+        (chunk_start, min(chunk_size, start + count - chunk_start), base_date)
+        for chunk_start in range(start, start + count, chunk_size)
+    ]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk in executor.map(_synthetic_chunk, chunks):
+            yield from chunk
+
+
+def bulk_generate_profiles(
+    count: int,
+    manager: "CustomerProfileManager" = None,
+    start: int = 0,
+    batch_size: int = 5000,
+    workers: int = 1,
+    base_date: datetime = synthetic_base_date,
+) -> int:
+    """
+    Generate a large number of deterministic synthetic profiles (e.g. millions for load tests),
+    streamed into the store through the bulk-load path without keeping them in memory
+    Args:
+        count (int): number of profiles
+        manager (CustomerProfileManager): manager of the target store, the default manager if None
+        start (int): index of the first profile, to append to or extend a previous run
+        batch_size (int): profiles written per transaction
+        workers (int): processes building the profiles, 1 to build them in this process
+        base_date (datetime): reference date of the purchases and tickets
+    Returns:
+        number of profiles written
+    """
+    manager = manager or CustomerProfileManager()
+    if workers == 1:
+        profiles = iter_synthetic_profiles(count, start, base_date)
+    else:
+        profiles = iter_synthetic_profiles_parallel(count, start, base_date, workers)
+    started_at = time.perf_counter()
+    written = manager.bulk_load(profiles, batch_size=batch_size)
+    elapsed = time.perf_counter() - started_at
+    print(
+        f"Generated {written} synthetic customer profiles in {elapsed:.1f}s "
+        f"({written / elapsed if elapsed else 0:.0f} profiles/s)"
+    )
+    return written
 
-    return created_profiles
+
+def generate_synthetic_profiles(count: int = 10) -> List[CustomerProfile]:
+    """Generate synthetic customer profiles for testing"""
+    manager = CustomerProfileManager()
+    manager.bulk_load(iter_synthetic_profiles(count))
+    return [manager.get_profile(f"CUST{100+i}") for i in range(count)]
 
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate synthetic customer profiles")
+    parser.add_argument("--count", type=int, default=10, help="Number of profiles")
+    parser.add_argument("--start", type=int, default=0, help="Index of the first profile")
+    parser.add_argument("--profiles-file", default="customer_profiles.json", help="Profiles file (the SQLite store is created next to it)")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Profiles written per transaction")
+    parser.add_argument("--workers", type=int, default=1, help="Processes building the profiles")
+    args = parser.parse_args()
+
     # Generate synthetic customer profiles for testing
-    profiles = generate_synthetic_profiles(10)
-    print(f"Generated {len(profiles)} synthetic customer profiles")
+    bulk_generate_profiles(
+        args.count,
+        CustomerProfileManager(args.profiles_file),
+        start=args.start,
+        batch_size=args.batch_size,
+        workers=args.workers,
+    )
@@ -0,0 +1,623 @@
+"""
+Storage backends for customer profiles
+
+The CustomerProfileManager writes through a store instead of re-serializing every profile to
+customer_profiles.json on each change:
+
+    - SQLiteProfileStore (default): one row per profile with JSON columns for the preferences, and
+      one row per purchase and per support ticket. Creating or updating a profile writes that profile
+      only, and adding a purchase or a ticket inserts a single row, each in its own transaction, so
+      an interrupted write never corrupts the store.
+      Normalized email, country and state columns are indexed, so lookups by email or location
+      do not need the profiles in memory, and histories are read one page at a time.
+      Spend per customer and product type, and ticket counts per customer, type and status are kept
+      in aggregate tables updated in the same transaction as the histories, so summaries over many
+      customers are a single grouped query instead of a scan of their histories.
+    - JSONProfileStore: the original single JSON file, rewritten atomically on every change.
+      Kept for compatibility and small demos.
+
+Both stores implement the same methods, so any object providing them can be passed to the manager:
+    get_profile, iter_ids, find_by_email, find_by_location, get_history, count_history,
+    spend_summary, ticket_summary, load_all, put_profile, put_many, add_purchase, add_support_ticket,
+    import_json, export_json, close
+
+Usage:
+    store = SQLiteProfileStore("customer_profiles.db")
+    store.import_json("customer_profiles.json")
+    manager = CustomerProfileManager(store=store)
+"""
+
+import copy
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional
+
+profile_columns = ["customer_id", "name", "email", "country", "state", "preferences", "created_at", "updated_at"]
+key_columns = ["email_key", "country_key", "state_key"]
+
+upsert_profile_sql = f"""
+    INSERT INTO profiles ({', '.join(profile_columns + key_columns)})
+    VALUES ({', '.join('?' * len(profile_columns + key_columns))})
+    ON CONFLICT(customer_id) DO UPDATE SET
+        name = excluded.name, email = excluded.email, country = excluded.country,
+        state = excluded.state, preferences = excluded.preferences,
+        created_at = excluded.created_at, updated_at = excluded.updated_at,
+        email_key = excluded.email_key, country_key = excluded.country_key, state_key = excluded.state_key
+"""
+
+# Profile dict key of each history and the table holding it
+history_tables = {"purchase_history": "purchases", "support_tickets": "support_tickets"}
+
+
+def normalize_email(email: str) -> str:
+    """Normalize an email address for lookups (case and surrounding whitespace insensitive)"""
+    return (email or "").strip().lower()
+
+
+def normalize_location(value: str) -> str:
+    """Normalize a country or state name for lookups"""
+    return " ".join((value or "").split()).casefold()
+
+
+def _write_json_atomically(path: str, data):
+    """Write JSON to a temporary file and move it over the target, so readers never see a partial file"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".profiles-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def read_json_profiles(path: str) -> Iterator[Dict]:
+    """Read the profile dicts of a customer_profiles.json file"""
+    with open(path, "r") as f:
+        profile_data = json.load(f)
+    for customer_id, data in profile_data.items():
+        yield {**data, "customer_id": data.get("customer_id", customer_id)}
+
+
+def purchase_spend(purchase: Dict) -> float:
+    """Amount spent on a purchase: price times quantity (1 when missing)"""
+    return float(purchase.get("price") or 0) * (purchase.get("quantity") or 1)
+
+
+def ticket_status(ticket: Dict) -> str:
+    """Normalized status of a support ticket ("open" when missing)"""
+    return str(ticket.get("status") or "open").lower()
+
+
+def _chunks(items: list, size: int = 500):
+    """Split a list of query parameters to stay below the SQLite variable limit"""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _page(items: list, offset: int, limit: Optional[int]) -> list:
+    return items[offset:] if limit is None else items[offset:offset + limit]
+
+
+class SQLiteProfileStore:
+    """
+    Customer profiles in a SQLite database (WAL journal), with one transaction per change
+    Args:
+        path (str): database file
+    """
+
+    def __init__(self, path: str = "customer_profiles.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS profiles (
+                    customer_id TEXT PRIMARY KEY,
+                    name TEXT,
+                    email TEXT,
+                    country TEXT,
+                    state TEXT,
+                    preferences TEXT,
+                    created_at TEXT,
+                    updated_at TEXT
+                );
+                CREATE TABLE IF NOT EXISTS purchases (
+                    customer_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (customer_id, seq)
+                );
+                CREATE TABLE IF NOT EXISTS support_tickets (
+                    customer_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (customer_id, seq)
+                );
+                """
+            )
+            self._add_key_columns()
+            self._create_aggregates()
+            self._conn.executescript(
+                """
+                CREATE INDEX IF NOT EXISTS profiles_email ON profiles (email_key);
+                CREATE INDEX IF NOT EXISTS profiles_location ON profiles (country_key, state_key);
+                """
+            )
+
+    def _add_key_columns(self):
+        """Add the normalized lookup columns to databases created without them, and fill them"""
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(profiles)")}
+        missing = [column for column in key_columns if column not in existing]
+        if not missing:
+            return
+        for column in missing:
+            self._conn.execute(f"ALTER TABLE profiles ADD COLUMN {column} TEXT")
+        rows = self._conn.execute("SELECT customer_id, email, country, state FROM profiles").fetchall()
+        self._conn.executemany(
+            "UPDATE profiles SET email_key = ?, country_key = ?, state_key = ? WHERE customer_id = ?",
+            [(*self._keys(email, country, state), customer_id) for customer_id, email, country, state in rows],
+        )
+
+    def _create_aggregates(self):
+        """Create the aggregate tables, and fill them from the histories of an existing database"""
+        existing = {row[0] for row in self._conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS purchase_totals (
+                customer_id TEXT NOT NULL,
+                product_type TEXT NOT NULL,
+                purchases INTEGER NOT NULL,
+                quantity INTEGER NOT NULL,
+                spend REAL NOT NULL,
+                PRIMARY KEY (customer_id, product_type)
+            );
+            CREATE TABLE IF NOT EXISTS ticket_counts (
+                customer_id TEXT NOT NULL,
+                ticket_type TEXT NOT NULL,
+                status TEXT NOT NULL,
+                tickets INTEGER NOT NULL,
+                PRIMARY KEY (customer_id, ticket_type, status)
+            );
+            """
+        )
+        if "purchase_totals" in existing and "ticket_counts" in existing:
+            return
+        for customer_id, data in self._conn.execute("SELECT customer_id, data FROM purchases").fetchall():
+            self._add_to_aggregates("purchases", customer_id, json.loads(data))
+        for customer_id, data in self._conn.execute("SELECT customer_id, data FROM support_tickets").fetchall():
+            self._add_to_aggregates("support_tickets", customer_id, json.loads(data))
+
+    def _add_to_aggregates(self, table: str, customer_id: str, item: Dict):
+        """Count one history entry in the aggregate tables (inside the caller's transaction)"""
+        if table == "purchases":
+            self._conn.execute(
+                """
+                INSERT INTO purchase_totals (customer_id, product_type, purchases, quantity, spend) VALUES (?, ?, 1, ?, ?)
+                ON CONFLICT(customer_id, product_type) DO UPDATE SET
+                    purchases = purchases + 1, quantity = quantity + excluded.quantity, spend = spend + excluded.spend
+                """,
+                (customer_id, item.get("product_type") or "unknown", item.get("quantity") or 1, purchase_spend(item)),
+            )
+        else:
+            self._conn.execute(
+                """
+                INSERT INTO ticket_counts (customer_id, ticket_type, status, tickets) VALUES (?, ?, ?, 1)
+                ON CONFLICT(customer_id, ticket_type, status) DO UPDATE SET tickets = tickets + 1
+                """,
+                (customer_id, item.get("type") or "unknown", ticket_status(item)),
+            )
+
+    @staticmethod
+    def _keys(email, country, state):
+        return normalize_email(email), normalize_location(country), normalize_location(state)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM profiles").fetchone()[0]
+
+    @classmethod
+    def _profile_row(cls, data: Dict):
+        return (
+            data["customer_id"],
+            data.get("name"),
+            data.get("email"),
+            data.get("country"),
+            data.get("state"),
+            json.dumps(data.get("preferences") or {}),
+            data.get("created_at"),
+            data.get("updated_at"),
+            *cls._keys(data.get("email"), data.get("country"), data.get("state")),
+        )
+
+    @staticmethod
+    def _profile_dict(row) -> Dict:
+        data = dict(zip(profile_columns, row))
+        data["preferences"] = json.loads(data["preferences"] or "{}")
+        return data
+
+    def get_profile(self, customer_id: str) -> Optional[Dict]:
+        """Return a profile dict without its purchase history and support tickets"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(profile_columns)} FROM profiles WHERE customer_id = ?", (customer_id,)
+            ).fetchone()
+        return self._profile_dict(row) if row else None
+
+    def iter_ids(self, chunk_size: int = 1000) -> Iterator[str]:
+        """Yield every customer ID in insertion order, reading `chunk_size` IDs at a time"""
+        last_rowid = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT rowid, customer_id FROM profiles WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                    (last_rowid, chunk_size),
+                ).fetchall()
+            if not rows:
+                return
+            for last_rowid, customer_id in rows:
+                yield customer_id
+
+    def find_by_email(self, email: str) -> Optional[str]:
+        """Return the customer ID of the first profile created with this email"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT customer_id FROM profiles WHERE email_key = ? ORDER BY rowid LIMIT 1", (normalize_email(email),)
+            ).fetchone()
+        return row[0] if row else None
+
+    def find_by_location(self, country: str, state: str = None) -> List[str]:
+        """Return the customer IDs of a country, or of a state of a country"""
+        query = "SELECT customer_id FROM profiles WHERE country_key = ?"
+        params = [normalize_location(country)]
+        if state is not None:
+            query += " AND state_key = ?"
+            params.append(normalize_location(state))
+        with self._lock:
+            return [customer_id for (customer_id,) in self._conn.execute(query + " ORDER BY rowid", params)]
+
+    def get_history(self, kind: str, customer_id: str, offset: int = 0, limit: int = None) -> List[Dict]:
+        """
+        Return a page of the purchase history or support tickets of a customer, oldest first
+        Args:
+            kind (str): "purchase_history" or "support_tickets"
+            customer_id (str): customer ID
+            offset (int): entries to skip
+            limit (int): maximum number of entries, all remaining entries if None
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT data FROM {history_tables[kind]} WHERE customer_id = ? ORDER BY seq LIMIT ? OFFSET ?",
+                (customer_id, -1 if limit is None else limit, offset),
+            ).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def count_history(self, kind: str, customer_id: str) -> int:
+        """Return the number of purchases or support tickets of a customer"""
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT COUNT(*) FROM {history_tables[kind]} WHERE customer_id = ?", (customer_id,)
+            ).fetchone()[0]
+
+    def _grouped(self, query: str, customer_ids: Optional[List[str]]) -> List[tuple]:
+        """Run an aggregate query for all customers, or for the given customers in chunks"""
+        with self._lock:
+            if customer_ids is None:
+                return self._conn.execute(query.format(where="")).fetchall()
+            rows = []
+            for chunk in _chunks(list(customer_ids)):
+                where = f"WHERE customer_id IN ({', '.join('?' * len(chunk))})"
+                rows += self._conn.execute(query.format(where=where), chunk).fetchall()
+            return rows
+
+    def spend_summary(self, customer_ids: List[str] = None) -> List[tuple]:
+        """
+        Return (customer_id, product_type, purchases, quantity, spend) rows from the aggregates
+        Args:
+            customer_ids (list): customers to summarize, all customers if None
+        """
+        return self._grouped(
+            "SELECT customer_id, product_type, purchases, quantity, spend FROM purchase_totals {where}",
+            customer_ids,
+        )
+
+    def ticket_summary(self, customer_ids: List[str] = None) -> List[tuple]:
+        """
+        Return (customer_id, ticket_type, status, tickets) rows from the aggregates
+        Args:
+            customer_ids (list): customers to summarize, all customers if None
+        """
+        return self._grouped(
+            "SELECT customer_id, ticket_type, status, tickets FROM ticket_counts {where}",
+            customer_ids,
+        )
+
+    def _histories(self, table: str) -> Dict[str, list]:
+        histories = {}
+        for customer_id, data in self._conn.execute(f"SELECT customer_id, data FROM {table} ORDER BY customer_id, seq"):
+            histories.setdefault(customer_id, []).append(json.loads(data))
+        return histories
+
+    def load_all(self) -> Iterator[Dict]:
+        """Yield every profile as a dict, with its purchase history and support tickets"""
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {', '.join(profile_columns)} FROM profiles ORDER BY rowid").fetchall()
+            purchases = self._histories("purchases")
+            tickets = self._histories("support_tickets")
+        for row in rows:
+            data = self._profile_dict(row)
+            data["purchase_history"] = purchases.get(data["customer_id"], [])
+            data["support_tickets"] = tickets.get(data["customer_id"], [])
+            yield data
+
+    def _write_profile(self, data: Dict, histories: bool):
+        self._conn.execute(upsert_profile_sql, self._profile_row(data))
+        if not histories:
+            return
+        customer_id = data["customer_id"]
+        for aggregate in ("purchase_totals", "ticket_counts"):
+            self._conn.execute(f"DELETE FROM {aggregate} WHERE customer_id = ?", (customer_id,))
+        for key, table in history_tables.items():
+            items = data.get(key) or []
+            self._conn.execute(f"DELETE FROM {table} WHERE customer_id = ?", (customer_id,))
+            self._conn.executemany(
+                f"INSERT INTO {table} (customer_id, seq, data) VALUES (?, ?, ?)",
+                [(customer_id, seq, json.dumps(item)) for seq, item in enumerate(items)],
+            )
+            for item in items:
+                self._add_to_aggregates(table, customer_id, item)
+
+    def put_profile(self, data: Dict, histories: bool = True):
+        """
+        Insert or replace one profile
+        Args:
+            data (dict): profile dict (CustomerProfile.to_dict())
+            histories (bool): also replace the purchase history and support tickets
+        """
+        with self._lock, self._conn:
+            self._write_profile(data, histories)
+
+    def put_many(self, profiles: Iterable[Dict], batch_size: int = 1000) -> int:
+        """
+        Insert or replace profiles in transactions of `batch_size` profiles
+        Returns:
+            number of profiles written
+        """
+        count = 0
+        batch = []
+        for data in profiles:
+            batch.append(data)
+            if len(batch) >= batch_size:
+                count += self._put_batch(batch)
+                batch = []
+        if batch:
+            count += self._put_batch(batch)
+        return count
+
+    def _put_batch(self, batch):
+        """Write a batch of profiles with one statement per table"""
+        # the last version of a profile repeated in the batch wins
+        batch = list({data["customer_id"]: data for data in batch}.values())
+        customer_ids = [data["customer_id"] for data in batch]
+        history_rows = {table: [] for table in history_tables.values()}
+        totals, counts = {}, {}
+        for data in batch:
+            customer_id = data["customer_id"]
+            for key, table in history_tables.items():
+                history_rows[table] += [
+                    (customer_id, seq, json.dumps(item)) for seq, item in enumerate(data.get(key) or [])
+                ]
+            for purchase in data.get("purchase_history") or []:
+                key = (customer_id, purchase.get("product_type") or "unknown")
+                purchases, quantity, spend = totals.get(key, (0, 0, 0.0))
+                totals[key] = (purchases + 1, quantity + (purchase.get("quantity") or 1), spend + purchase_spend(purchase))
+            for ticket in data.get("support_tickets") or []:
+                key = (customer_id, ticket.get("type") or "unknown", ticket_status(ticket))
+                counts[key] = counts.get(key, 0) + 1
+
+        with self._lock, self._conn:
+            self._conn.executemany(upsert_profile_sql, [self._profile_row(data) for data in batch])
+            for chunk in _chunks(customer_ids):
+                where = f"WHERE customer_id IN ({', '.join('?' * len(chunk))})"
+                for table in (*history_tables.values(), "purchase_totals", "ticket_counts"):
+                    self._conn.execute(f"DELETE FROM {table} {where}", chunk)
+            for table, rows in history_rows.items():
+                self._conn.executemany(f"INSERT INTO {table} (customer_id, seq, data) VALUES (?, ?, ?)", rows)
+            self._conn.executemany(
+                "INSERT INTO purchase_totals (customer_id, product_type, purchases, quantity, spend) VALUES (?, ?, ?, ?, ?)",
+                [(*key, *values) for key, values in totals.items()],
+            )
+            self._conn.executemany(
+                "INSERT INTO ticket_counts (customer_id, ticket_type, status, tickets) VALUES (?, ?, ?, ?)",
+                [(*key, tickets) for key, tickets in counts.items()],
+            )
+        return len(batch)
+
+    def _append(self, table: str, customer_id: str, item: Dict, updated_at: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"""
+                INSERT INTO {table} (customer_id, seq, data)
+                VALUES (?, (SELECT COALESCE(MAX(seq), -1) + 1 FROM {table} WHERE customer_id = ?), ?)
+                """,
+                (customer_id, customer_id, json.dumps(item)),
+            )
+            self._add_to_aggregates(table, customer_id, item)
+            self._conn.execute("UPDATE profiles SET updated_at = ? WHERE customer_id = ?", (updated_at, customer_id))
+
+    def add_purchase(self, customer_id: str, purchase: Dict, updated_at: str):
+        """Append a purchase to the history of a customer"""
+        self._append("purchases", customer_id, purchase, updated_at)
+
+    def add_support_ticket(self, customer_id: str, ticket: Dict, updated_at: str):
+        """Append a support ticket to the history of a customer"""
+        self._append("support_tickets", customer_id, ticket, updated_at)
+
+    def import_json(self, path: str) -> int:
+        """Import the profiles of a customer_profiles.json file"""
+        count = self.put_many(read_json_profiles(path))
+        print(f"Imported {count} customer profiles from {path}")
+        return count
+
+    def export_json(self, path: str):
+        """Export every profile to a file in the customer_profiles.json format"""
+        _write_json_atomically(path, {data["customer_id"]: data for data in self.load_all()})
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class JSONProfileStore:
+    """
+    Customer profiles in a single JSON file, rewritten atomically on every change.
+    The whole file is held in memory, with dict indexes for the email and location lookups,
+    and the summaries are computed from the histories of the requested customers
+    Args:
+        path (str): JSON file
+    """
+
+    def __init__(self, path: str = "customer_profiles.json"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._profiles = {}
+        # index key -> customer IDs, in insertion order (dicts used as ordered sets)
+        self._email_index: Dict[str, Dict[str, None]] = {}
+        self._location_index: Dict[tuple, Dict[str, None]] = {}
+        if os.path.exists(path):
+            try:
+                for data in read_json_profiles(path):
+                    self._set(data)
+            except Exception as e:
+                print(f"Error loading profiles: {str(e)}")
+
+    def __len__(self):
+        return len(self._profiles)
+
+    @staticmethod
+    def _index_keys(data: Dict):
+        country = normalize_location(data.get("country"))
+        return [
+            ("email", normalize_email(data.get("email"))),
+            ("location", (country, None)),
+            ("location", (country, normalize_location(data.get("state")))),
+        ]
+
+    def _index(self, name: str) -> Dict:
+        return self._email_index if name == "email" else self._location_index
+
+    def _set(self, data: Dict):
+        """Store a profile dict and update the indexes"""
+        existing = self._profiles.get(data["customer_id"])
+        if existing:
+            for name, key in self._index_keys(existing):
+                customer_ids = self._index(name).get(key, {})
+                customer_ids.pop(data["customer_id"], None)
+                if not customer_ids:
+                    self._index(name).pop(key, None)
+        self._profiles[data["customer_id"]] = data
+        for name, key in self._index_keys(data):
+            self._index(name).setdefault(key, {})[data["customer_id"]] = None
+
+    def _flush(self):
+        _write_json_atomically(self.path, self._profiles)
+
+    def get_profile(self, customer_id: str) -> Optional[Dict]:
+        data = self._profiles.get(customer_id)
+        if data is None:
+            return None
+        return {k: v for k, v in data.items() if k not in history_tables}
+
+    def iter_ids(self) -> Iterator[str]:
+        yield from list(self._profiles)
+
+    def find_by_email(self, email: str) -> Optional[str]:
+        return next(iter(self._email_index.get(normalize_email(email), {})), None)
+
+    def find_by_location(self, country: str, state: str = None) -> List[str]:
+        key = (normalize_location(country), None if state is None else normalize_location(state))
+        return list(self._location_index.get(key, {}))
+
+    def get_history(self, kind: str, customer_id: str, offset: int = 0, limit: int = None) -> List[Dict]:
+        data = self._profiles.get(customer_id) or {}
+        return _page(data.get(kind) or [], offset, limit)
+
+    def count_history(self, kind: str, customer_id: str) -> int:
+        return len((self._profiles.get(customer_id) or {}).get(kind) or [])
+
+    def _selected(self, customer_ids: Optional[List[str]]) -> List[Dict]:
+        ids = self._profiles if customer_ids is None else customer_ids
+        return [self._profiles[customer_id] for customer_id in ids if customer_id in self._profiles]
+
+    def spend_summary(self, customer_ids: List[str] = None) -> List[tuple]:
+        totals = {}
+        for data in self._selected(customer_ids):
+            for purchase in data.get("purchase_history") or []:
+                key = (data["customer_id"], purchase.get("product_type") or "unknown")
+                purchases, quantity, spend = totals.get(key, (0, 0, 0.0))
+                totals[key] = (purchases + 1, quantity + (purchase.get("quantity") or 1), spend + purchase_spend(purchase))
+        return [(*key, *values) for key, values in totals.items()]
+
+    def ticket_summary(self, customer_ids: List[str] = None) -> List[tuple]:
+        counts = {}
+        for data in self._selected(customer_ids):
+            for ticket in data.get("support_tickets") or []:
+                key = (data["customer_id"], ticket.get("type") or "unknown", ticket_status(ticket))
+                counts[key] = counts.get(key, 0) + 1
+        return [(*key, tickets) for key, tickets in counts.items()]
+
+    def load_all(self) -> Iterator[Dict]:
+        yield from list(self._profiles.values())
+
+    def put_profile(self, data: Dict, histories: bool = True):
+        # the store owns its dicts: the caller (e.g. CustomerProfile.to_dict) may keep and append
+        # to the same history lists, which would then be stored twice by add_purchase
+        data = copy.deepcopy(data)
+        with self._lock:
+            if not histories:
+                existing = self._profiles.get(data["customer_id"]) or {}
+                data = {**data, **{key: existing.get(key, []) for key in history_tables}}
+            self._set(data)
+            self._flush()
+
+    def put_many(self, profiles: Iterable[Dict], batch_size: int = 1000) -> int:
+        with self._lock:
+            count = 0
+            for data in profiles:
+                self._set(copy.deepcopy(data))
+                count += 1
+            self._flush()
+        return count
+
+    def _append(self, key: str, customer_id: str, item: Dict, updated_at: str):
+        with self._lock:
+            data = self._profiles[customer_id]
+            data[key] = [*data.get(key, []), copy.deepcopy(item)]
+            data["updated_at"] = updated_at
+            self._flush()
+
+    def add_purchase(self, customer_id: str, purchase: Dict, updated_at: str):
+        self._append("purchase_history", customer_id, purchase, updated_at)
+
+    def add_support_ticket(self, customer_id: str, ticket: Dict, updated_at: str):
+        self._append("support_tickets", customer_id, ticket, updated_at)
+
+    def import_json(self, path: str) -> int:
+        return self.put_many(read_json_profiles(path))
+
+    def export_json(self, path: str):
+        with self._lock:
+            _write_json_atomically(path, self._profiles)
+
+    def close(self):
+        pass
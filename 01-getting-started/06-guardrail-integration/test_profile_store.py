@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Regression test of the customer profile stores: a purchase or ticket added to a new profile must be
+stored once, whichever store backs the CustomerProfileManager.
+
+Usage:
+    python test_profile_store.py
+    python -m pytest test_profile_store.py
+"""
+
+import os
+import tempfile
+
+from customer_profiles import CustomerProfileManager
+from profile_store import JSONProfileStore, SQLiteProfileStore
+
+stores = {
+    "json": lambda directory: JSONProfileStore(os.path.join(directory, "customer_profiles.json")),
+    "sqlite": lambda directory: SQLiteProfileStore(os.path.join(directory, "customer_profiles.db")),
+}
+
+
+def check_histories_stored_once(store_name):
+    with tempfile.TemporaryDirectory() as directory:
+        store = stores[store_name](directory)
+        manager = CustomerProfileManager(store=store)
+        profile = manager.create_profile({
+            "name": "Jane Doe",
+            "email": "jane.doe@example.com",
+            "country": "US",
+            "state": "WA",
+        })
+        customer_id = profile.customer_id
+
+        manager.add_purchase(customer_id, {"product_type": "router", "quantity": 1, "price": 100.0})
+        manager.add_purchase(customer_id, {"product_type": "router", "quantity": 1, "price": 50.0})
+        manager.add_support_ticket(customer_id, {"type": "technical", "status": "open"})
+
+        assert store.count_history("purchase_history", customer_id) == 2, store_name
+        assert store.count_history("support_tickets", customer_id) == 1, store_name
+        assert len(profile.purchase_history) == 2, store_name
+        [(_, product_type, purchases, _, _)] = store.spend_summary([customer_id])
+        assert (product_type, purchases) == ("router", 2), store_name
+        store.close()
+
+
+def test_json_store_histories_stored_once():
+    check_histories_stored_once("json")
+
+
+def test_sqlite_store_histories_stored_once():
+    check_histories_stored_once("sqlite")
+
+
+if __name__ == "__main__":
+    for store_name in stores:
+        check_histories_stored_once(store_name)
+        print(f"✅ {store_name} store: purchases and tickets stored once")
@@ -0,0 +1,117 @@
+"""
+Persistent cache of evaluation scores.
+
+Running evaluate_traces over overlapping lookback windows would score the same traces again and
+pay the evaluator LLM cost again. Scores are stored in a local SQLite database keyed by
+(trace id, metric name, metric definition hash, evaluator model id): changing a metric definition,
+its rubrics or the evaluator model invalidates the cached scores of that metric only.
+
+Usage:
+    cache = EvaluationCache(evaluator_model="anthropic.claude-3-5-sonnet-20241022-v2:0")
+    cached = cache.get_many(trace_ids, metric)   # {trace_id: score}
+    cache.put_many(metric, {trace_id: score})
+"""
+
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+
+# SQLite limits the number of bound parameters per statement
+sqlite_batch_size = 500
+
+
+def metric_fingerprint(metric):
+    """
+    Return a short hash of everything that changes the scores of a metric: its class, name and
+    definition (AspectCritic definition, RubricsScore rubrics, FactualCorrectness mode...)
+    Args:
+        metric: RAGAS metric
+    """
+    definition = {"class": type(metric).__name__, "name": metric.name}
+    for attribute in ("definition", "rubrics", "mode", "strictness", "atomicity", "coverage"):
+        value = getattr(metric, attribute, None)
+        if value is not None:
+            definition[attribute] = value
+    encoded = json.dumps(definition, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+class EvaluationCache:
+    """
+    SQLite cache of metric scores, safe to use from several threads
+    Args:
+        evaluator_model (str): model id of the evaluator LLM
+        path (str): SQLite database file
+    """
+
+    def __init__(self, evaluator_model: str, path: str = "evaluation_results/evaluation_cache.sqlite"):
+        self.evaluator_model = evaluator_model
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                """CREATE TABLE IF NOT EXISTS scores (
+                    trace_id TEXT NOT NULL,
+                    metric_name TEXT NOT NULL,
+                    metric_hash TEXT NOT NULL,
+                    evaluator_model TEXT NOT NULL,
+                    value REAL NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (trace_id, metric_name, metric_hash, evaluator_model)
+                )"""
+            )
+        self.stats = {"hits": 0, "misses": 0, "writes": 0}
+
+    def get_many(self, trace_ids, metric):
+        """
+        Return the cached scores of a metric for the given traces
+        Args:
+            trace_ids (list): trace ids
+            metric: RAGAS metric
+        Returns:
+            dict mapping trace id to score, for the traces found in the cache
+        """
+        metric_hash = metric_fingerprint(metric)
+        unique_ids = list(dict.fromkeys(trace_ids))
+        found = {}
+        with self._lock:
+            for start in range(0, len(unique_ids), sqlite_batch_size):
+                batch = unique_ids[start:start + sqlite_batch_size]
+                rows = self._connection.execute(
+                    f"""SELECT trace_id, value FROM scores
+                        WHERE metric_name = ? AND metric_hash = ? AND evaluator_model = ?
+                        AND trace_id IN ({",".join("?" * len(batch))})""",
+                    [metric.name, metric_hash, self.evaluator_model, *batch],
+                ).fetchall()
+                found.update(rows)
+            self.stats["hits"] += len(found)
+            self.stats["misses"] += len(unique_ids) - len(found)
+        return found
+
+    def put_many(self, metric, scores):
+        """
+        Store metric scores. NaN scores (failed evaluations) are not cached
+        Args:
+            metric: RAGAS metric
+            scores (dict): trace id to score
+        """
+        metric_hash = metric_fingerprint(metric)
+        now = time.time()
+        rows = [
+            (trace_id, metric.name, metric_hash, self.evaluator_model, float(value), now)
+            for trace_id, value in scores.items()
+            if value is not None and not math.isnan(float(value))
+        ]
+        with self._lock, self._connection:
+            self._connection.executemany("INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self.stats["writes"] += len(rows)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
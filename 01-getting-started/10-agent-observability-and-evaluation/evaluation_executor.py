@@ -0,0 +1,278 @@
+"""
+Parallel, rate-limited RAGAS evaluation.
+
+A single `ragas.evaluate` call over all the samples and metrics sends bursts of requests to the
+evaluator LLM and gets throttled by Bedrock. This module:
+    - shards the samples and evaluates every (shard, metric) pair as a job in a bounded worker pool
+    - enforces a token-bucket rate limit on every evaluator LLM call (RateLimitedLLMWrapper)
+    - retries throttled calls with exponential backoff
+    - records per metric the LLM calls, throttled retries, input/output tokens and wall time,
+      so batch runs can be sized (UsageTracker.report)
+    - optionally skips the (trace, metric) cells already scored in an EvaluationCache
+
+Usage:
+    usage = UsageTracker()
+    evaluator_llm = RateLimitedLLMWrapper(bedrock_llm, TokenBucket(requests_per_minute=60), usage)
+    metric = AspectCritic(name="...", llm=evaluator_llm, definition="...")
+    df = evaluate_in_parallel(samples, [metric], shard_size=5, max_workers=4)
+    print(usage.report())
+"""
+
+import asyncio
+import copy
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from ragas import evaluate
+from ragas.dataset_schema import EvaluationDataset
+from ragas.llms import LangchainLLMWrapper
+
+# Error messages returned by Bedrock when requests are throttled
+throttling_markers = ("ThrottlingException", "Too many requests", "TooManyRequests", "Rate exceeded", "ServiceUnavailable")
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `requests_per_minute` tokens are added per minute, up to `burst`
+    Args:
+        requests_per_minute (float): sustained request rate
+        burst (int): maximum number of requests sent back to back
+    """
+
+    def __init__(self, requests_per_minute: float = 60, burst: int = 5):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """
+        Take a token and return 0, or return how long to wait before retrying
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        while (wait := self._reserve()) > 0:
+            time.sleep(wait)
+
+    async def aacquire(self):
+        while (wait := self._reserve()) > 0:
+            await asyncio.sleep(wait)
+
+
+class UsageTracker:
+    """
+    Thread-safe per-metric accounting of evaluator LLM usage
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = defaultdict(lambda: defaultdict(float))
+
+    def add(self, metric_name: str, **values):
+        with self._lock:
+            for key, value in values.items():
+                self._stats[metric_name][key] += value
+
+    def report(self) -> pd.DataFrame:
+        """
+        Return one row per metric with the LLM calls, throttled retries, tokens, LLM time and wall time
+        """
+        columns = ["llm_calls", "throttled", "failed_calls", "input_tokens", "output_tokens", "llm_seconds", "wall_seconds", "samples"]
+        with self._lock:
+            df = pd.DataFrame.from_dict({name: dict(stats) for name, stats in self._stats.items()}, orient="index")
+        df = df.reindex(columns=columns).fillna(0)
+        if not df.empty:
+            df.loc["total"] = df.sum()
+            df["tokens_per_sample"] = (df["input_tokens"] + df["output_tokens"]) / df["samples"].where(df["samples"] > 0)
+        return df
+
+
+def _is_throttling(error: Exception) -> bool:
+    text = f"{type(error).__name__} {error}"
+    return any(marker in text for marker in throttling_markers)
+
+
+def _token_usage(result):
+    """
+    Return (input_tokens, output_tokens) from a LangChain LLMResult
+    """
+    usage = (result.llm_output or {}).get("usage") or {}
+    input_tokens = usage.get("prompt_tokens", usage.get("input_tokens", 0))
+    output_tokens = usage.get("completion_tokens", usage.get("output_tokens", 0))
+    if not input_tokens and not output_tokens:
+        for generations in result.generations:
+            for generation in generations:
+                metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                input_tokens += metadata.get("input_tokens", 0)
+                output_tokens += metadata.get("output_tokens", 0)
+    return input_tokens or 0, output_tokens or 0
+
+
+class RateLimitedLLMWrapper(LangchainLLMWrapper):
+    """
+    RAGAS LLM wrapper that waits for the token bucket before every call, retries throttled calls
+    with exponential backoff and records the usage of each call under the current metric name
+    Args:
+        langchain_llm: LangChain chat model (e.g. ChatBedrock)
+        rate_limiter (TokenBucket): shared rate limiter
+        usage (UsageTracker): shared usage tracker
+        max_retries (int): retries of a throttled call
+        initial_backoff (float): first backoff interval in seconds
+    """
+
+    def __init__(self, langchain_llm, rate_limiter: TokenBucket, usage: UsageTracker, max_retries: int = 6, initial_backoff: float = 2.0, **kwargs):
+        super().__init__(langchain_llm, **kwargs)
+        self.rate_limiter = rate_limiter
+        self.usage = usage
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.metric_name = "unattributed"
+
+    def bind(self, metric_name: str):
+        """
+        Return a copy of the wrapper that records its usage under `metric_name`.
+        The rate limiter and the usage tracker are shared with the original
+        """
+        bound = copy.copy(self)
+        bound.metric_name = metric_name
+        return bound
+
+    def _record(self, result, started_at):
+        input_tokens, output_tokens = _token_usage(result)
+        self.usage.add(
+            self.metric_name,
+            llm_calls=1,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            llm_seconds=time.perf_counter() - started_at,
+        )
+        return result
+
+    def _should_retry(self, error, attempt):
+        if not _is_throttling(error) or attempt == self.max_retries:
+            self.usage.add(self.metric_name, failed_calls=1)
+            return False
+        self.usage.add(self.metric_name, throttled=1)
+        return True
+
+    def generate_text(self, *args, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            started_at = time.perf_counter()
+            try:
+                return self._record(super().generate_text(*args, **kwargs), started_at)
+            except Exception as e:
+                if not self._should_retry(e, attempt):
+                    raise
+                time.sleep(self.initial_backoff * 2 ** attempt)
+
+    async def agenerate_text(self, *args, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.aacquire()
+            started_at = time.perf_counter()
+            try:
+                return self._record(await super().agenerate_text(*args, **kwargs), started_at)
+            except Exception as e:
+                if not self._should_retry(e, attempt):
+                    raise
+                await asyncio.sleep(self.initial_backoff * 2 ** attempt)
+
+
+def _bind_metric(metric):
+    """
+    Copy a metric so that its LLM calls are attributed to it in the usage tracker
+    """
+    bound = copy.copy(metric)
+    if isinstance(getattr(metric, "llm", None), RateLimitedLLMWrapper):
+        bound.llm = metric.llm.bind(metric.name)
+    return bound
+
+
+def _evaluate_job(shard, metric, run_config):
+    """
+    Evaluate one metric on a shard of samples and return its scores as a list
+    """
+    started_at = time.perf_counter()
+    dataset = EvaluationDataset(samples=shard)
+    kwargs = {"run_config": run_config} if run_config is not None else {}
+    result = evaluate(dataset=dataset, metrics=[_bind_metric(metric)], show_progress=False, **kwargs)
+    df = result.to_pandas()
+    input_columns = set(dataset.to_pandas().columns)
+    column = metric.name if metric.name in df.columns else [c for c in df.columns if c not in input_columns][0]
+    elapsed = time.perf_counter() - started_at
+    llm = getattr(metric, "llm", None)
+    if isinstance(llm, RateLimitedLLMWrapper):
+        llm.usage.add(metric.name, wall_seconds=elapsed, samples=len(shard))
+    return df[column].tolist()
+
+
+def evaluate_in_parallel(samples, metrics, shard_size: int = 5, max_workers: int = 4, run_config=None, trace_ids=None, cache=None):
+    """
+    Evaluate samples with RAGAS metrics, running every (shard, metric) pair as a separate job.
+    With a cache, only the (sample, metric) cells missing from the cache are evaluated
+    Args:
+        samples (list): SingleTurnSample or MultiTurnSample objects (all of the same type)
+        metrics (list): RAGAS metrics
+        shard_size (int): number of samples per job
+        max_workers (int): number of concurrent jobs
+        run_config (ragas.RunConfig): optional run configuration passed to every ragas.evaluate call
+        trace_ids (list): trace id of every sample, required with a cache
+        cache (EvaluationCache): cache of previously computed scores
+    Returns:
+        DataFrame in the same format as EvaluationResult.to_pandas(): one row per sample with the
+        sample columns followed by one column per metric (NaN where a job failed)
+    """
+    if not samples:
+        return pd.DataFrame()
+    if cache is not None and (trace_ids is None or len(trace_ids) != len(samples)):
+        raise ValueError("trace_ids must give the trace id of every sample when a cache is used")
+
+    # scores[metric name] holds one value per sample, filled from the cache then by the jobs
+    scores = {metric.name: [float("nan")] * len(samples) for metric in metrics}
+    jobs = []
+    for metric in metrics:
+        cached = cache.get_many(trace_ids, metric) if cache is not None else {}
+        missing = []
+        for index in range(len(samples)):
+            if cache is not None and trace_ids[index] in cached:
+                scores[metric.name][index] = cached[trace_ids[index]]
+            else:
+                missing.append(index)
+        jobs += [(metric, missing[i:i + shard_size]) for i in range(0, len(missing), shard_size)]
+
+    cells = len(samples) * len(metrics)
+    evaluated = sum(len(indexes) for _, indexes in jobs)
+    print(f"Evaluating {evaluated}/{cells} sample x metric cells ({cells - evaluated} cached) in {len(jobs)} jobs with {max_workers} workers")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            (metric, indexes, executor.submit(_evaluate_job, [samples[i] for i in indexes], metric, run_config))
+            for metric, indexes in jobs
+        ]
+        for metric, indexes, future in futures:
+            try:
+                values = future.result()
+            except Exception as e:
+                print(f"Evaluation of {metric.name} failed on samples {indexes[0]}-{indexes[-1]}: {e}")
+                continue
+            for index, value in zip(indexes, values):
+                scores[metric.name][index] = value
+            if cache is not None:
+                cache.put_many(metric, {trace_ids[i]: value for i, value in zip(indexes, values)})
+
+    df = EvaluationDataset(samples=samples).to_pandas().reset_index(drop=True)
+    for metric_name, values in scores.items():
+        df[metric_name] = values
+    return df
@@ -0,0 +1,275 @@
+"""
+Columnar store of evaluation results with historical trend queries.
+
+Every evaluation run appends its scores, one row per (trace, metric), to a Parquet dataset
+partitioned by date and metric:
+
+    evaluation_results/scores/date=2025-05-23/metric=Brand%20Voice%20Metric/part-<run_id>-<uid>-0.parquet
+
+Appends only add files; compact_results merges the many small files of a partition (one per
+evaluation batch) into one, and queries only read the partitions matching their date range and
+metrics, so they stay fast across months of runs. The query functions return pandas DataFrames:
+    - rolling_means: rolling mean of every metric over time
+    - compare_runs: per-metric difference between two runs, flagging regressions
+    - tag_slices: mean score per trace tag and metric
+
+Usage:
+    append_results(records, run_id, evaluator_model, trace_tags)
+    compact_results(dates=["2025-05-23"])
+    print(compare_runs())
+"""
+
+import glob
+import os
+import re
+import uuid
+from datetime import datetime, timezone
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+default_store_path = "evaluation_results/scores"
+
+schema = pa.schema([
+    ("run_id", pa.string()),
+    ("run_timestamp", pa.timestamp("us", tz="UTC")),
+    ("trace_id", pa.string()),
+    ("value", pa.float64()),
+    ("evaluator_model", pa.string()),
+    ("tags", pa.list_(pa.string())),
+    ("date", pa.string()),
+    ("metric", pa.string()),
+])
+partitioning = ds.partitioning(pa.schema([("date", pa.string()), ("metric", pa.string())]), flavor="hive")
+
+
+def append_results(records: pd.DataFrame, run_id: str, evaluator_model: str = None, trace_tags=None, run_timestamp: datetime = None, path: str = default_store_path):
+    """
+    Append the scores of an evaluation run to the dataset
+    Args:
+        records (DataFrame): scores with trace_id, name and value columns (see score_export.scores_to_records)
+        run_id (str): identifier of the run, unique across runs
+        evaluator_model (str): model id of the evaluator LLM
+        trace_tags (dict): trace id to list of Langfuse tags
+        run_timestamp (datetime): time of the run, defaults to now
+        path (str): root directory of the dataset
+    """
+    if records.empty:
+        return
+    run_timestamp = pd.Timestamp(run_timestamp or datetime.now(timezone.utc))
+    run_timestamp = run_timestamp.tz_convert("UTC") if run_timestamp.tzinfo else run_timestamp.tz_localize("UTC")
+    trace_tags = trace_tags or {}
+    df = pd.DataFrame({
+        "run_id": run_id,
+        "run_timestamp": run_timestamp,
+        "trace_id": records["trace_id"].astype(object).where(records["trace_id"].notna(), None).to_numpy(),
+        "value": records["value"].astype(float).to_numpy(),
+        "evaluator_model": evaluator_model,
+        "tags": [list(trace_tags.get(trace_id) or []) for trace_id in records["trace_id"]],
+        "date": run_timestamp.strftime("%Y-%m-%d"),
+        "metric": records["name"].to_numpy(),
+    })
+    table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+    ds.write_dataset(
+        table,
+        path,
+        format="parquet",
+        partitioning=partitioning,
+        # a unique file name per call, so that appends never replace existing files
+        basename_template=f"part-{run_id}-{uuid.uuid4().hex[:8]}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+    print(f"Appended {len(df)} scores of run {run_id} to {path}")
+
+
+def compact_results(path: str = default_store_path, dates=None, min_files: int = 2):
+    """
+    Merge the Parquet files of each partition into a single file. Every evaluation batch appends
+    one small file per metric, which makes queries open many files; run this after a run (or
+    periodically) to keep one file per date and metric. Do not run it while results are appended
+    Args:
+        path (str): root directory of the dataset
+        dates (list): only compact the partitions of these dates (e.g. the date of the run)
+        min_files (int): compact the partitions having at least this many files
+    Returns:
+        number of files removed
+    """
+    removed = 0
+    date_dirs = sorted(glob.glob(os.path.join(path, "date=*")))
+    if dates is not None:
+        wanted = {f"date={d}" for d in dates}
+        date_dirs = [d for d in date_dirs if os.path.basename(d) in wanted]
+    for partition in (m for d in date_dirs for m in sorted(glob.glob(os.path.join(d, "metric=*")))):
+        files = sorted(glob.glob(os.path.join(partition, "*.parquet")))
+        if len(files) < min_files:
+            continue
+        table = pa.concat_tables([pq.read_table(f) for f in files]).sort_by("run_timestamp")
+        # written under a hidden name (ignored by dataset reads) and renamed once complete
+        tmp_path = os.path.join(partition, f".compacted-{uuid.uuid4().hex[:8]}.parquet")
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, os.path.join(partition, f"part-compacted-{uuid.uuid4().hex[:8]}-0.parquet"))
+        for f in files:
+            os.remove(f)
+        removed += len(files) - 1
+    if removed:
+        print(f"Compacted {path}: {removed} files removed")
+    return removed
+
+
+def load_results(path: str = default_store_path, metrics=None, start_date=None, end_date=None, columns=None) -> pd.DataFrame:
+    """
+    Load scores from the dataset, reading only the partitions of the requested metrics and dates
+    Args:
+        path (str): root directory of the dataset
+        metrics (list): metric names to load, all metrics if None
+        start_date (str or date): first date to load (inclusive)
+        end_date (str or date): last date to load (inclusive)
+        columns (list): columns to load, all columns if None
+    """
+    if not os.path.isdir(path):
+        return pd.DataFrame(columns=schema.names)
+    dataset = ds.dataset(path, format="parquet", partitioning=partitioning, schema=schema)
+    expression = None
+    conditions = []
+    if metrics:
+        conditions.append(ds.field("metric").isin(list(metrics)))
+    if start_date:
+        conditions.append(ds.field("date") >= str(start_date))
+    if end_date:
+        conditions.append(ds.field("date") <= str(end_date))
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return dataset.to_table(columns=columns, filter=expression).to_pandas()
+
+
+def _run_means(df: pd.DataFrame) -> pd.DataFrame:
+    return (
+        df.groupby(["metric", "run_id", "run_timestamp"], observed=True)["value"]
+        .agg(["mean", "count"])
+        .reset_index()
+        .sort_values("run_timestamp")
+    )
+
+
+def rolling_means(window: str = "7D", path: str = default_store_path, metrics=None, start_date=None, end_date=None) -> pd.DataFrame:
+    """
+    Rolling mean of every metric over time, computed from the per-run means
+    Args:
+        window (str): pandas time window, e.g. "7D" or "30D"
+        path (str): root directory of the dataset
+        metrics (list): metric names, all metrics if None
+        start_date (str or date): first date (inclusive)
+        end_date (str or date): last date (inclusive)
+    Returns:
+        DataFrame with metric, run_id, run_timestamp, run mean, sample count and rolling mean
+    """
+    df = load_results(path, metrics, start_date, end_date, columns=["metric", "run_id", "run_timestamp", "value"])
+    if df.empty:
+        return df
+    runs = _run_means(df)
+    # weight every run by its number of samples so that small runs do not dominate the trend
+    runs["weighted"] = runs["mean"] * runs["count"]
+    rolled = (
+        runs.set_index("run_timestamp")
+        .groupby("metric", observed=True)[["weighted", "count"]]
+        .rolling(window)
+        .sum()
+        .reset_index()
+    )
+    runs = runs.merge(rolled, on=["metric", "run_timestamp"], suffixes=("", "_window"))
+    runs["rolling_mean"] = runs["weighted_window"] / runs["count_window"]
+    return runs[["metric", "run_id", "run_timestamp", "mean", "count", "rolling_mean"]]
+
+
+def compare_runs(baseline_run: str = None, candidate_run: str = None, threshold: float = 0.05, path: str = default_store_path, start_date=None) -> pd.DataFrame:
+    """
+    Compare the per-metric means of two runs. By default the two most recent runs are compared
+    Args:
+        baseline_run (str): run id of the baseline, defaults to the second most recent run
+        candidate_run (str): run id of the candidate, defaults to the most recent run
+        threshold (float): drop of the mean flagged as a regression
+        path (str): root directory of the dataset
+        start_date (str or date): only consider runs from this date (limits the partitions read)
+    Returns:
+        DataFrame with one row per metric: baseline and candidate means, delta and regression flag
+    """
+    df = load_results(path, start_date=start_date, columns=["metric", "run_id", "run_timestamp", "value"])
+    if df.empty:
+        return df
+    runs = df.groupby("run_id")["run_timestamp"].max().sort_values()
+    if len(runs) < 2 and not (baseline_run and candidate_run):
+        print("At least two runs are needed for a comparison")
+        return pd.DataFrame()
+    candidate_run = candidate_run or runs.index[-1]
+    baseline_run = baseline_run or runs.index[runs.index != candidate_run][-1]
+
+    means = (
+        df[df["run_id"].isin([baseline_run, candidate_run])]
+        .pivot_table(index="metric", columns="run_id", values="value", aggfunc="mean")
+        .reindex(columns=[baseline_run, candidate_run])
+    )
+    means.columns = ["baseline", "candidate"]
+    means["delta"] = means["candidate"] - means["baseline"]
+    # rounded so that a drop of exactly the threshold (e.g. -0.05000000000000004) is not flagged
+    means["regression"] = means["delta"].round(9) < -threshold
+    print(f"Compared run {candidate_run} with baseline {baseline_run}: {int(means['regression'].sum())} regressions")
+    return means.sort_values("delta").reset_index()
+
+
+def tag_slices(path: str = default_store_path, metrics=None, start_date=None, end_date=None, run_id: str = None) -> pd.DataFrame:
+    """
+    Mean score and sample count per trace tag and metric
+    Args:
+        path (str): root directory of the dataset
+        metrics (list): metric names, all metrics if None
+        start_date (str or date): first date (inclusive)
+        end_date (str or date): last date (inclusive)
+        run_id (str): restrict to a single run
+    Returns:
+        DataFrame indexed by tag with one (mean, count) column pair per metric
+    """
+    df = load_results(path, metrics, start_date, end_date, columns=["metric", "run_id", "tags", "value"])
+    if run_id:
+        df = df[df["run_id"] == run_id]
+    if df.empty:
+        return df
+    exploded = df.explode("tags").dropna(subset=["tags"])
+    return exploded.pivot_table(index="tags", columns="metric", values="value", aggfunc=["mean", "count"])
+
+
+def import_csv_results(csv_dir: str = "evaluation_results", path: str = default_store_path):
+    """
+    Import the CSV files written by save_results_to_csv into the dataset, one run per timestamp.
+    The CSV files do not contain trace ids, so the imported rows have none
+    Args:
+        csv_dir (str): directory holding rag_evaluation_*.csv and conversation_evaluation_*.csv
+        path (str): root directory of the dataset
+    """
+    files = glob.glob(os.path.join(csv_dir, "rag_evaluation_*.csv")) + glob.glob(os.path.join(csv_dir, "conversation_evaluation_*.csv"))
+    input_columns = ["user_input", "retrieved_contexts", "response", "reference"]
+    for csv_file in sorted(files):
+        match = re.search(r"(rag|conversation)_evaluation_(\d{8}_\d{6})\.csv$", csv_file)
+        if not match:
+            continue
+        kind, timestamp = match.groups()
+        df = pd.read_csv(csv_file)
+        scores = df.drop(columns=[c for c in input_columns if c in df.columns]).apply(pd.to_numeric, errors="coerce")
+        records = scores.melt(var_name="name", value_name="value").dropna(subset=["value"])
+        if kind == "rag":
+            records["name"] = "rag_" + records["name"]
+        records["trace_id"] = None
+        append_results(
+            records,
+            run_id=f"csv-{timestamp}",
+            run_timestamp=datetime.strptime(timestamp, "%Y%m%d_%H%M%S").replace(tzinfo=timezone.utc),
+            path=path,
+        )
+
+
+if __name__ == "__main__":
+    import_csv_results()
+    compact_results()
+    print(compare_runs())
+    print(rolling_means())
@@ -0,0 +1,102 @@
+"""
+Bulk export of evaluation scores to Langfuse.
+
+Instead of one `langfuse.score` call per DataFrame cell, the results DataFrame is turned into score
+records in one vectorized pass (melt) and the records are sent through the Langfuse batch
+ingestion API, `batch_size` scores per request, with several requests in flight at once.
+The ingestion API reports the outcome of every event, so failed writes are collected and
+returned instead of being printed one by one.
+
+Score ids are derived from the trace id and the score name, so exporting the same scores again
+(e.g. cached scores of an overlapping lookback window) updates them instead of duplicating them.
+"""
+
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import pandas as pd
+
+# Namespace of the deterministic score ids
+score_id_namespace = uuid.UUID("5f1f6d8e-3c1b-4a8e-9f43-8a1d2c6b7e10")
+
+
+def scores_to_records(df: pd.DataFrame, trace_ids, input_columns, prefix: str = "", fill_na=None) -> pd.DataFrame:
+    """
+    Turn an evaluation results DataFrame into one score record per (trace, metric)
+    Args:
+        df (DataFrame): evaluation results, one row per sample
+        trace_ids (list): trace id of every row
+        input_columns (list): sample columns that are not scores
+        prefix (str): prefix added to the score names
+        fill_na (float): value used for missing scores, None to skip them
+    Returns:
+        DataFrame with trace_id, name, value and id columns
+    """
+    scores = df.drop(columns=[c for c in input_columns if c in df.columns])
+    scores = scores.apply(pd.to_numeric, errors="coerce")
+    scores.insert(0, "trace_id", list(trace_ids))
+    records = scores.melt(id_vars="trace_id", var_name="name", value_name="value")
+    records["name"] = prefix + records["name"]
+    if fill_na is None:
+        records = records.dropna(subset=["value"])
+    else:
+        records["value"] = records["value"].fillna(fill_na)
+    records["id"] = [
+        str(uuid.uuid5(score_id_namespace, f"{trace_id}/{name}"))
+        for trace_id, name in zip(records["trace_id"], records["name"])
+    ]
+    return records.reset_index(drop=True)
+
+
+def _ingestion_api(langfuse):
+    # Langfuse v3 exposes the generated API client as `api`, v2 as `client`
+    return getattr(langfuse, "api", None) or langfuse.client
+
+
+def _send_batch(langfuse, batch: pd.DataFrame):
+    """
+    Send one batch of score records and return the ids and error messages of the failed ones
+    """
+    timestamp = datetime.now(timezone.utc).isoformat()
+    events = [
+        {
+            "id": str(uuid.uuid4()),
+            "timestamp": timestamp,
+            "type": "score-create",
+            "body": {"id": score_id, "traceId": trace_id, "name": name, "value": float(value)},
+        }
+        for score_id, trace_id, name, value in zip(batch["id"], batch["trace_id"], batch["name"], batch["value"])
+    ]
+    try:
+        response = _ingestion_api(langfuse).ingestion.batch(batch=events)
+    except Exception as e:
+        return {score_id: str(e) for score_id in batch["id"]}
+    event_to_score = {event["id"]: event["body"]["id"] for event in events}
+    return {event_to_score.get(error.id, error.id): f"{error.status}: {error.message}" for error in response.errors}
+
+
+def export_scores(langfuse, records: pd.DataFrame, batch_size: int = 100, max_workers: int = 4) -> pd.DataFrame:
+    """
+    Send score records to Langfuse in concurrent batches
+    Args:
+        langfuse: Langfuse client
+        records (DataFrame): output of scores_to_records
+        batch_size (int): scores per ingestion request
+        max_workers (int): number of requests in flight
+    Returns:
+        DataFrame of the records that could not be written, with an `error` column
+    """
+    if records.empty:
+        return records.assign(error=pd.Series(dtype=str))
+    batches = [records.iloc[i:i + batch_size] for i in range(0, len(records), batch_size)]
+    failed = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for errors in executor.map(lambda batch: _send_batch(langfuse, batch), batches):
+            failed.update(errors)
+
+    failures = records[records["id"].isin(failed)].assign(error=lambda d: d["id"].map(failed))
+    print(f"Exported {len(records) - len(failures)}/{len(records)} scores to Langfuse in {len(batches)} batches")
+    if not failures.empty:
+        print(f"{len(failures)} scores could not be written, e.g. {failures['error'].iloc[0]}")
+    return failures
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Regression test of the incremental trace evaluation: runs limited to max_traces must not move the
+checkpoint past traces they did not evaluate.
+
+Runs without Langfuse: a fake client serves the traces page by page, newest first unless asked
+otherwise, like the Langfuse API. The loop below mirrors evaluate_traces in agent.py (iter_traces,
+islice to max_traces, checkpoint.advance as traces are read, checkpoint.save at the end of the run).
+
+Usage:
+    python test_trace_checkpoint.py
+    python -m pytest test_trace_checkpoint.py
+"""
+
+import itertools
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from trace_loader import TraceCheckpoint, iter_traces
+
+
+class FakeLangfuse:
+    """Serves a fixed list of traces through the fetch_traces API of the Langfuse client"""
+
+    def __init__(self, traces):
+        self.traces = traces
+
+    def fetch_traces(self, page=1, limit=50, from_timestamp=None, to_timestamp=None, order_by=None, tags=None):
+        traces = [t for t in self.traces if from_timestamp <= t.timestamp <= to_timestamp]
+        traces.sort(key=lambda t: t.timestamp, reverse=order_by != "timestamp.asc")
+        total_pages = max(1, -(-len(traces) // limit))
+        return SimpleNamespace(
+            data=traces[(page - 1) * limit:page * limit],
+            meta=SimpleNamespace(total_pages=total_pages),
+        )
+
+
+def run_evaluation(langfuse, checkpoint_path, window, max_traces):
+    """One scheduled run of the evaluation, returning the ids of the evaluated traces"""
+    checkpoint = TraceCheckpoint(path=checkpoint_path)
+    traces = iter_traces(langfuse, window[0], window[1], page_size=2, checkpoint=checkpoint, max_retries=0)
+    evaluated = []
+    for trace in itertools.islice(traces, max_traces):
+        checkpoint.advance(trace)
+        evaluated.append(trace.id)
+    checkpoint.save()
+    return evaluated
+
+
+def test_limited_runs_evaluate_every_trace():
+    start = datetime(2025, 6, 1, tzinfo=timezone.utc)
+    langfuse = FakeLangfuse([
+        SimpleNamespace(id=f"trace-{i}", timestamp=start + timedelta(minutes=i)) for i in range(3)
+    ])
+    window = (start - timedelta(hours=1), start + timedelta(hours=1))
+    with tempfile.TemporaryDirectory() as directory:
+        checkpoint_path = os.path.join(directory, "trace_checkpoint.json")
+        runs = [run_evaluation(langfuse, checkpoint_path, window, max_traces=1) for _ in range(4)]
+
+    evaluated = [trace_id for run in runs for trace_id in run]
+    assert sorted(evaluated) == ["trace-0", "trace-1", "trace-2"], runs
+    assert runs[-1] == [], "all the traces were evaluated, the last run must find none"
+
+
+if __name__ == "__main__":
+    test_limited_runs_evaluate_every_trace()
+    print("✅ Limited runs evaluate every trace exactly once")
@@ -0,0 +1,208 @@
+"""
+Latency, token and cost analytics of the agent traces.
+
+The evaluation scores answer quality only. This module computes the operational side from the
+same traces (Langfuse traces or replayed span exports) and their observations:
+    - end-to-end latency percentiles (p50/p95/p99)
+    - time spent in model calls vs tool calls
+    - tokens per turn (one agent invocation is one trace) and model calls per turn
+    - cost per turn and per session, from the token usage and a price table
+and compares two groups of traces, selected by tags or by model id.
+
+Usage:
+    df = collect_trace_metrics((trace, observations) for ...)
+    print(latency_report(df))
+    print(compare_groups(df, {"tags": ["Agent-SDK", "v1"]}, {"tags": ["Agent-SDK", "v2"]}))
+"""
+
+import numpy as np
+import pandas as pd
+
+# USD per 1000 tokens (input, output). Check the Amazon Bedrock pricing page for your region
+model_prices = {
+    "anthropic.claude-3-5-sonnet-20241022-v2:0": (0.003, 0.015),
+    "anthropic.claude-3-7-sonnet-20250219-v1:0": (0.003, 0.015),
+    "anthropic.claude-3-5-haiku-20241022-v1:0": (0.0008, 0.004),
+    "amazon.nova-pro-v1:0": (0.0008, 0.0032),
+    "amazon.nova-lite-v1:0": (0.00006, 0.00024),
+}
+
+
+def _price(model_id):
+    if not model_id:
+        return None
+    for prefix in ("us.", "eu.", "apac."):
+        if model_id.startswith(prefix):
+            model_id = model_id[len(prefix):]
+            break
+    return model_prices.get(model_id)
+
+
+def _usage(observation):
+    """
+    Return (input_tokens, output_tokens) of a Langfuse or replayed observation
+    """
+    usage = getattr(observation, "usage", None)
+    if usage is None:
+        return 0, 0
+    if not isinstance(usage, dict):
+        usage = {"input": getattr(usage, "input", None), "output": getattr(usage, "output", None)}
+    return int(usage.get("input") or 0), int(usage.get("output") or 0)
+
+
+def _duration(observation):
+    start, end = getattr(observation, "start_time", None), getattr(observation, "end_time", None)
+    if start is None or end is None:
+        return 0.0
+    return (end - start).total_seconds()
+
+
+def _attributes(item):
+    metadata = getattr(item, "metadata", None)
+    return metadata.get("attributes") or {} if isinstance(metadata, dict) else {}
+
+
+def _operation(observation):
+    attributes = _attributes(observation)
+    name = str(getattr(observation, "name", "") or "")
+    if attributes.get("gen_ai.operation.name") == "execute_tool" or name.startswith(("execute_tool", "Tool:")):
+        return "tool"
+    # Langfuse also makes the invoke_agent span a GENERATION (it carries the model id and the total
+    # usage): only the chat spans ("Model invoke" in older Strands versions) are model calls
+    if attributes.get("gen_ai.operation.name") == "chat" or name in ("chat", "Model invoke"):
+        return "model"
+    return "other"
+
+
+def trace_metrics(trace, observations):
+    """
+    Compute the latency, time split, token and cost figures of one trace
+    Args:
+        trace: Langfuse trace or ReplayTrace
+        observations (list): observations of the trace
+    Returns:
+        dict with one value per figure
+    """
+    observations = observations or []
+    model_seconds = tool_seconds = 0.0
+    input_tokens = output_tokens = model_calls = tool_calls = 0
+    cost = 0.0
+    priced = True
+    model_id = None
+    for obs in observations:
+        operation = _operation(obs)
+        if operation == "tool":
+            tool_seconds += _duration(obs)
+            tool_calls += 1
+        elif operation == "model":
+            model_seconds += _duration(obs)
+            model_calls += 1
+            obs_input, obs_output = _usage(obs)
+            input_tokens += obs_input
+            output_tokens += obs_output
+            obs_model = getattr(obs, "model", None)
+            model_id = model_id or obs_model
+            price = _price(obs_model)
+            if price is None:
+                priced = False
+            else:
+                cost += obs_input / 1000 * price[0] + obs_output / 1000 * price[1]
+
+    model_id = model_id or _attributes(trace).get("gen_ai.request.model")
+    # Without model observations, fall back to the usage accumulated on the agent span
+    if model_calls == 0:
+        input_tokens, output_tokens = _usage(trace)
+        price = _price(model_id)
+        priced = price is not None
+        cost = input_tokens / 1000 * price[0] + output_tokens / 1000 * price[1] if priced else 0.0
+
+    latency = getattr(trace, "latency", None)
+    if latency is None and observations:
+        starts = [o.start_time for o in observations if getattr(o, "start_time", None)]
+        ends = [o.end_time for o in observations if getattr(o, "end_time", None)]
+        latency = (max(ends) - min(starts)).total_seconds() if starts and ends else None
+    return {
+        "trace_id": trace.id,
+        "session_id": getattr(trace, "session_id", None),
+        "timestamp": getattr(trace, "timestamp", None),
+        "tags": list(getattr(trace, "tags", None) or []),
+        "model_id": model_id,
+        "latency_s": latency,
+        "model_s": model_seconds,
+        "tool_s": tool_seconds,
+        "model_calls": model_calls,
+        "tool_calls": tool_calls,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "total_tokens": input_tokens + output_tokens,
+        "cost_usd": cost if priced else np.nan,
+    }
+
+
+def collect_trace_metrics(traces_with_observations) -> pd.DataFrame:
+    """
+    Build one row of metrics per trace from a stream of (trace, observations) pairs
+    """
+    return pd.DataFrame([trace_metrics(trace, observations) for trace, observations in traces_with_observations])
+
+
+def latency_report(df: pd.DataFrame) -> pd.Series:
+    """
+    Summarize trace metrics: latency percentiles, model vs tool time, tokens per turn and cost per session
+    Args:
+        df (DataFrame): output of collect_trace_metrics
+    """
+    if df.empty:
+        return pd.Series(dtype=float)
+    latency = df["latency_s"].dropna()
+    busy = df["model_s"].sum() + df["tool_s"].sum()
+    sessions = df.assign(session_id=df["session_id"].fillna(df["trace_id"])).groupby("session_id")["cost_usd"].sum(min_count=1)
+    return pd.Series({
+        "traces": len(df),
+        "sessions": len(sessions),
+        "latency_p50_s": latency.quantile(0.50),
+        "latency_p95_s": latency.quantile(0.95),
+        "latency_p99_s": latency.quantile(0.99),
+        "model_time_share": df["model_s"].sum() / busy if busy else np.nan,
+        "tool_time_share": df["tool_s"].sum() / busy if busy else np.nan,
+        "model_s_per_turn": df["model_s"].mean(),
+        "tool_s_per_turn": df["tool_s"].mean(),
+        "model_calls_per_turn": df["model_calls"].mean(),
+        "input_tokens_per_turn": df["input_tokens"].mean(),
+        "output_tokens_per_turn": df["output_tokens"].mean(),
+        "tokens_per_turn_p95": df["total_tokens"].quantile(0.95),
+        "cost_per_turn_usd": df["cost_usd"].mean(),
+        "cost_per_session_usd": sessions.mean(),
+        "cost_per_session_p95_usd": sessions.quantile(0.95),
+    })
+
+
+def _select(df: pd.DataFrame, group: dict) -> pd.DataFrame:
+    """
+    Select the traces having all the tags of group["tags"] and/or the model id group["model_id"]
+    """
+    mask = pd.Series(True, index=df.index)
+    if group.get("tags"):
+        wanted = set(group["tags"])
+        mask &= df["tags"].map(lambda tags: wanted.issubset(tags))
+    if group.get("model_id"):
+        mask &= df["model_id"] == group["model_id"]
+    return df[mask]
+
+
+def compare_groups(df: pd.DataFrame, group_a: dict, group_b: dict, names=("A", "B")) -> pd.DataFrame:
+    """
+    Compare the latency report of two groups of traces
+    Args:
+        df (DataFrame): output of collect_trace_metrics
+        group_a (dict): {"tags": [...]} and/or {"model_id": "..."}
+        group_b (dict): same for the second group
+        names (tuple): column names of the two groups
+    Returns:
+        DataFrame with one row per figure, the value of each group, the difference and the relative change
+    """
+    a, b = names
+    table = pd.DataFrame({a: latency_report(_select(df, group_a)), b: latency_report(_select(df, group_b))})
+    table["delta"] = table[b] - table[a]
+    table["change_pct"] = 100 * table["delta"] / table[a].where(table[a] != 0)
+    return table
@@ -0,0 +1,291 @@
+"""
+Trace loading helpers for the evaluation pipeline.
+
+Fetching the observations of every trace with one `fetch_observations(trace_id=...)` call per trace
+makes evaluation runtime grow with one serial round trip per trace. The helpers below load the
+observations of many traces at once:
+    - bulk mode pages through all observations started in the time window covered by the traces
+      (the pages after the first one are fetched concurrently) and groups them by trace id
+    - per-trace mode fetches the observations of each trace concurrently in a bounded worker pool
+Every Langfuse call is retried with exponential backoff, so rate limiting (HTTP 429) or transient
+errors do not drop a trace from the evaluation.
+
+Traces are streamed with iter_traces, which walks every page of the lookback window and skips the
+traces already covered by a local TraceCheckpoint, and consumed in bounded batches with batched().
+"""
+
+import json
+import os
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+# Maximum page size accepted by the Langfuse public API
+observations_page_size = 100
+# Traces whose observations are prefetched together. Independent of the evaluation batch size and
+# above the bulk_threshold of fetch_observations_for_traces, so streaming pipelines use the bulk
+# time window fetch rather than one request per trace
+trace_prefetch_size = 100
+
+
+def with_retry(fn, max_retries: int = 5, initial_delay: float = 1.0, max_delay: float = 30.0):
+    """
+    Call `fn` and retry it with exponential backoff and jitter when it raises
+    Args:
+        fn (callable): function without arguments to call
+        max_retries (int): number of retries after the first attempt
+        initial_delay (float): first backoff interval in seconds
+        max_delay (float): maximum backoff interval in seconds
+    Returns:
+        the result of `fn`
+    """
+    delay = initial_delay
+    for attempt in range(max_retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == max_retries:
+                raise
+            sleep_for = min(delay, max_delay) * (0.5 + random.random())
+            print(f"Langfuse call failed ({e}), retrying in {sleep_for:.1f}s")
+            time.sleep(sleep_for)
+            delay *= 2
+
+
+def fetch_trace_observations(langfuse, trace_id: str, max_retries: int = 5):
+    """
+    Fetch all the observations of a single trace, following pagination
+    Args:
+        langfuse: Langfuse client
+        trace_id (str): id of the trace
+        max_retries (int): retries per Langfuse call
+    Returns:
+        list of observations
+    """
+    observations = []
+    page = 1
+    while True:
+        response = with_retry(
+            lambda: langfuse.fetch_observations(trace_id=trace_id, page=page, limit=observations_page_size),
+            max_retries=max_retries,
+        )
+        observations.extend(response.data)
+        if page >= response.meta.total_pages:
+            return observations
+        page += 1
+
+
+def fetch_observations_by_window(langfuse, from_time, to_time, max_workers: int = 8, max_retries: int = 5):
+    """
+    Page through every observation started in a time window and group them by trace id.
+    The first page gives the number of pages, the remaining pages are fetched concurrently
+    Args:
+        langfuse: Langfuse client
+        from_time (datetime): start of the window
+        to_time (datetime): end of the window
+        max_workers (int): maximum number of concurrent page requests
+        max_retries (int): retries per Langfuse call
+    Returns:
+        dict mapping trace id to its list of observations
+    """
+    def fetch_page(page):
+        return with_retry(
+            lambda: langfuse.fetch_observations(
+                from_start_time=from_time,
+                to_start_time=to_time,
+                page=page,
+                limit=observations_page_size,
+            ),
+            max_retries=max_retries,
+        )
+
+    first = fetch_page(1)
+    pages = [first.data]
+    if first.meta.total_pages > 1:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pages += [response.data for response in executor.map(fetch_page, range(2, first.meta.total_pages + 1))]
+
+    by_trace = defaultdict(list)
+    for page in pages:
+        for obs in page:
+            by_trace[obs.trace_id].append(obs)
+    print(f"Fetched {sum(len(p) for p in pages)} observations in {first.meta.total_pages} pages")
+    return by_trace
+
+
+def fetch_observations_for_traces(langfuse, traces, max_workers: int = 8, bulk_threshold: int = 20, window_padding_minutes: int = 10, max_retries: int = 5):
+    """
+    Fetch the observations of many traces with as few serial round trips as possible.
+    With at least `bulk_threshold` traces, observations are paged in bulk over the time window
+    spanned by the traces; traces that have no observation in the bulk result (e.g. long-running
+    traces whose spans started after the window) and smaller batches are fetched per trace,
+    concurrently
+    Args:
+        langfuse: Langfuse client
+        traces (list): Langfuse traces
+        max_workers (int): size of the worker pool
+        bulk_threshold (int): minimum number of traces for which the bulk window fetch is used
+        window_padding_minutes (int): added after the latest trace timestamp to catch late spans
+        max_retries (int): retries per Langfuse call
+    Returns:
+        dict mapping trace id to its list of observations
+    """
+    observations = {}
+    if not traces:
+        return observations
+
+    timestamps = [t.timestamp for t in traces if getattr(t, "timestamp", None) is not None]
+    if len(traces) >= bulk_threshold and timestamps:
+        wanted = {t.id for t in traces}
+        try:
+            by_trace = fetch_observations_by_window(
+                langfuse,
+                min(timestamps),
+                max(timestamps) + timedelta(minutes=window_padding_minutes),
+                max_workers=max_workers,
+                max_retries=max_retries,
+            )
+            observations = {trace_id: obs for trace_id, obs in by_trace.items() if trace_id in wanted}
+        except Exception as e:
+            print(f"Bulk observation fetch failed, falling back to per-trace fetch: {e}")
+
+    missing = [t.id for t in traces if t.id not in observations]
+    if missing:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                trace_id: executor.submit(fetch_trace_observations, langfuse, trace_id, max_retries)
+                for trace_id in missing
+            }
+            for trace_id, future in futures.items():
+                try:
+                    observations[trace_id] = future.result()
+                except Exception as e:
+                    print(f"Error fetching observations for trace {trace_id}: {e}")
+                    observations[trace_id] = []
+    print(f"Loaded observations for {len(observations)}/{len(traces)} traces ({len(missing)} fetched per trace)")
+    return observations
+
+
+class TraceCheckpoint:
+    """
+    High-water mark of the traces already evaluated, persisted in a local JSON file so scheduled
+    runs only evaluate new traces. One mark is kept per tag filter. The ids of the traces sharing
+    the latest timestamp are kept too, so a trace is neither skipped nor evaluated twice when
+    several traces have the same timestamp
+    Args:
+        path (str): JSON file holding the checkpoints
+        tags (list): tag filter of the run, used as checkpoint key
+    """
+
+    def __init__(self, path: str = "evaluation_results/trace_checkpoint.json", tags=None):
+        self.path = path
+        self.key = ",".join(sorted(tags)) if tags else "*"
+        self.high_water_mark = None
+        self.ids_at_mark = set()
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                state = json.load(f).get(self.key)
+            if state:
+                self.high_water_mark = datetime.fromisoformat(state["high_water_mark"])
+                self.ids_at_mark = set(state["ids_at_mark"])
+
+    def is_new(self, trace):
+        """
+        Return True if the trace was not covered by a previous run
+        """
+        if self.high_water_mark is None:
+            return True
+        if trace.timestamp == self.high_water_mark:
+            return trace.id not in self.ids_at_mark
+        return trace.timestamp > self.high_water_mark
+
+    def advance(self, trace):
+        """
+        Move the high-water mark past a processed trace (in memory, see save)
+        """
+        if self.high_water_mark is None or trace.timestamp > self.high_water_mark:
+            self.high_water_mark = trace.timestamp
+            self.ids_at_mark = {trace.id}
+        elif trace.timestamp == self.high_water_mark:
+            self.ids_at_mark.add(trace.id)
+
+    def save(self):
+        """
+        Persist the high-water mark. Call it once the traces were fully evaluated
+        """
+        if self.high_water_mark is None:
+            return
+        state = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                state = json.load(f)
+        state[self.key] = {
+            "high_water_mark": self.high_water_mark.isoformat(),
+            "ids_at_mark": sorted(self.ids_at_mark),
+        }
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.path)
+        print(f"Saved trace checkpoint {self.high_water_mark.isoformat()} to {self.path}")
+
+
+def iter_traces(langfuse, from_time, to_time, tags=None, page_size: int = 50, checkpoint=None, max_retries: int = 5):
+    """
+    Stream every trace of a time window, oldest first, walking all the pages of the Langfuse API.
+    The window end is fixed by the caller, so traces created during the walk do not shift the pages.
+    Langfuse returns the newest traces first by default: the oldest first order makes a consumer that
+    stops early (e.g. max_traces) leave the checkpoint before the traces it did not read
+    Args:
+        langfuse: Langfuse client
+        from_time (datetime): start of the window
+        to_time (datetime): end of the window
+        tags (list): only return traces with these tags
+        page_size (int): traces per API page
+        checkpoint (TraceCheckpoint): skip the traces covered by previous runs
+        max_retries (int): retries per Langfuse call
+    Yields:
+        Langfuse traces
+    """
+    if checkpoint is not None and checkpoint.high_water_mark is not None:
+        from_time = max(from_time, checkpoint.high_water_mark)
+    filters = {"tags": tags} if tags else {}
+    seen = set()
+    page = 1
+    while True:
+        response = with_retry(
+            lambda: langfuse.fetch_traces(
+                page=page,
+                limit=page_size,
+                from_timestamp=from_time,
+                to_timestamp=to_time,
+                order_by="timestamp.asc",
+                **filters,
+            ),
+            max_retries=max_retries,
+        )
+        for trace in response.data:
+            if trace.id in seen or (checkpoint is not None and not checkpoint.is_new(trace)):
+                continue
+            seen.add(trace.id)
+            yield trace
+        if page >= response.meta.total_pages:
+            return
+        page += 1
+
+
+def batched(iterable, size: int):
+    """
+    Group an iterable into lists of at most `size` items without materializing it
+    """
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
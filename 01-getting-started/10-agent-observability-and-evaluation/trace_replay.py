@@ -0,0 +1,278 @@
+"""
+Offline trace source for the evaluation pipeline.
+
+The Strands agent emits OpenTelemetry spans (an `invoke_agent` root span, `execute_event_loop_cycle`,
+`chat` and `execute_tool <name>` children). enable_span_file_export writes them to a local JSONL
+file as they end, and iter_replay_traces reads such files back as trace objects with the same
+attributes the pipeline reads from Langfuse traces and observations (id, timestamp, input, output,
+metadata, tags, observations with name/input/output/usage/start and end times).
+The evaluation can then run offline and deterministically, without a Langfuse host and without
+waiting for the traces to be ingested:
+
+    traces = iter_replay_traces(["traces/spans.jsonl"])
+    components = extract_span_components(trace, trace.observations)
+
+Supported files (one JSON document per line, .jsonl or .json):
+    - spans serialized by the OpenTelemetry SDK (ReadableSpan.to_json), as written by
+      enable_span_file_export or the Strands console exporter
+    - OTLP/JSON export requests ({"resourceSpans": [...]}), as written by the OpenTelemetry
+      Collector file exporter
+"""
+
+import glob
+import json
+import os
+from datetime import datetime, timezone
+
+# Span attribute holding the Langfuse tags set through Agent(trace_attributes=...)
+tags_attribute = "langfuse.tags"
+
+
+def enable_span_file_export(path: str):
+    """
+    Write every span of the process to a JSONL file, in addition to the configured exporters.
+    Call it before running the agent
+    Args:
+        path (str): JSONL file the spans are appended to
+    """
+    from opentelemetry import trace as trace_api
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import ConsoleSpanExporter, SimpleSpanProcessor
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    provider = trace_api.get_tracer_provider()
+    if not isinstance(provider, TracerProvider):
+        provider = TracerProvider()
+        trace_api.set_tracer_provider(provider)
+    span_file = open(path, "a", buffering=1, encoding="utf-8")
+    provider.add_span_processor(SimpleSpanProcessor(
+        ConsoleSpanExporter(out=span_file, formatter=lambda span: span.to_json(indent=None) + "\n")
+    ))
+    print(f"Exporting agent spans to {path}")
+
+
+def _otlp_value(value: dict):
+    """
+    Convert an OTLP/JSON AnyValue to a Python value
+    """
+    if "arrayValue" in value:
+        return [_otlp_value(v) for v in value["arrayValue"].get("values", [])]
+    if "kvlistValue" in value:
+        return {kv["key"]: _otlp_value(kv["value"]) for kv in value["kvlistValue"].get("values", [])}
+    if "intValue" in value:
+        return int(value["intValue"])
+    for key in ("stringValue", "doubleValue", "boolValue", "bytesValue"):
+        if key in value:
+            return value[key]
+    return None
+
+
+def _otlp_attributes(attributes):
+    return {kv["key"]: _otlp_value(kv.get("value", {})) for kv in attributes or []}
+
+
+def _from_unix_nano(value):
+    return datetime.fromtimestamp(int(value) / 1e9, tz=timezone.utc)
+
+
+def _from_iso(value):
+    return datetime.fromisoformat(value.replace("Z", "+00:00")) if value else None
+
+
+def _normalize_hex_id(value):
+    if not value:
+        return None
+    return value[2:] if value.startswith("0x") else value
+
+
+def parse_span_line(line: str):
+    """
+    Parse one line of a span export into normalized span dicts
+    Returns:
+        list of dicts with trace_id, span_id, parent_id, name, start_time, end_time, attributes, events
+    """
+    document = json.loads(line)
+    if "resourceSpans" in document:
+        spans = []
+        for resource_spans in document["resourceSpans"]:
+            for scope_spans in resource_spans.get("scopeSpans", resource_spans.get("instrumentationLibrarySpans", [])):
+                for span in scope_spans.get("spans", []):
+                    spans.append({
+                        "trace_id": span["traceId"],
+                        "span_id": span["spanId"],
+                        "parent_id": span.get("parentSpanId") or None,
+                        "name": span["name"],
+                        "start_time": _from_unix_nano(span["startTimeUnixNano"]),
+                        "end_time": _from_unix_nano(span["endTimeUnixNano"]),
+                        "attributes": _otlp_attributes(span.get("attributes")),
+                        "events": [
+                            {"name": e["name"], "attributes": _otlp_attributes(e.get("attributes"))}
+                            for e in span.get("events", [])
+                        ],
+                    })
+        return spans
+    return [{
+        "trace_id": _normalize_hex_id(document["context"]["trace_id"]),
+        "span_id": _normalize_hex_id(document["context"]["span_id"]),
+        "parent_id": _normalize_hex_id(document.get("parent_id")),
+        "name": document["name"],
+        "start_time": _from_iso(document.get("start_time")),
+        "end_time": _from_iso(document.get("end_time")),
+        "attributes": document.get("attributes") or {},
+        "events": [{"name": e["name"], "attributes": e.get("attributes") or {}} for e in document.get("events", [])],
+    }]
+
+
+def _message_text(value):
+    """
+    Return the text of a serialized Strands message content (a JSON list of content blocks)
+    """
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return value
+    if isinstance(value, list):
+        texts = [_message_text(block) for block in value]
+        return "\n".join(t for t in texts if t)
+    if isinstance(value, dict):
+        if "text" in value:
+            return value["text"]
+        if "content" in value:
+            return _message_text(value["content"])
+        if "toolResult" in value:
+            return _message_text(value["toolResult"].get("content"))
+        return json.dumps(value)
+    return "" if value is None else str(value)
+
+
+def _event_attribute(span, event_name: str, attribute: str):
+    for event in span["events"]:
+        if event["name"] == event_name and attribute in event["attributes"]:
+            return event["attributes"][attribute]
+    return None
+
+
+class ReplayObservation:
+    """
+    A child span, exposed with the attributes of a Langfuse observation
+    """
+
+    def __init__(self, span):
+        attributes = span["attributes"]
+        self.id = span["span_id"]
+        self.trace_id = span["trace_id"]
+        self.parent_observation_id = span["parent_id"]
+        self.name = span["name"]
+        self.type = "GENERATION" if attributes.get("gen_ai.operation.name") == "chat" else "SPAN"
+        self.start_time = span["start_time"]
+        self.end_time = span["end_time"]
+        self.metadata = {"attributes": attributes}
+        if attributes.get("gen_ai.operation.name") == "execute_tool":
+            tool_input = _event_attribute(span, "gen_ai.tool.message", "content")
+            self.input = json.loads(tool_input) if isinstance(tool_input, str) and tool_input.startswith(("{", "[")) else tool_input
+        else:
+            self.input = _event_attribute(span, "gen_ai.user.message", "content")
+        output = _event_attribute(span, "gen_ai.choice", "message")
+        self.output = _message_text(output) if output is not None else None
+        self.usage = {
+            "input": attributes.get("gen_ai.usage.input_tokens", attributes.get("gen_ai.usage.prompt_tokens")),
+            "output": attributes.get("gen_ai.usage.output_tokens", attributes.get("gen_ai.usage.completion_tokens")),
+            "total": attributes.get("gen_ai.usage.total_tokens"),
+        }
+        self.model = attributes.get("gen_ai.request.model")
+
+    @property
+    def latency(self):
+        if self.start_time and self.end_time:
+            return (self.end_time - self.start_time).total_seconds()
+        return None
+
+
+class ReplayTrace:
+    """
+    The spans of one agent invocation, exposed with the attributes of a Langfuse trace
+    Args:
+        root (dict): the root (invoke_agent) span
+        spans (list): the other spans of the trace
+    """
+
+    def __init__(self, root, spans):
+        attributes = dict(root["attributes"])
+        # Langfuse exposes the agent tools under `agent.tools`, newer Strands versions emit `gen_ai.agent.tools`
+        tools = attributes.get("agent.tools", attributes.get("gen_ai.agent.tools"))
+        if isinstance(tools, str):
+            try:
+                tools = json.loads(tools)
+            except ValueError:
+                tools = [tools]
+        if tools is not None:
+            attributes["agent.tools"] = tools
+        self.id = root["trace_id"]
+        self.name = root["name"]
+        self.timestamp = root["start_time"]
+        self.end_time = root["end_time"]
+        self.input = _message_text(_event_attribute(root, "gen_ai.user.message", "content") or attributes.get("gen_ai.prompt"))
+        output = _event_attribute(root, "gen_ai.choice", "message") or attributes.get("gen_ai.completion")
+        self.output = _message_text(output) if output is not None else None
+        tags = attributes.get(tags_attribute) or []
+        self.tags = json.loads(tags) if isinstance(tags, str) else list(tags)
+        self.session_id = attributes.get("session.id")
+        self.user_id = attributes.get("user.id")
+        self.metadata = {"attributes": attributes}
+        self.usage = ReplayObservation(root).usage
+        self.observations = sorted((ReplayObservation(s) for s in spans), key=lambda o: o.start_time or self.timestamp)
+
+    @property
+    def latency(self):
+        if self.timestamp and self.end_time:
+            return (self.end_time - self.timestamp).total_seconds()
+        return None
+
+
+def list_span_files(paths):
+    """
+    Expand files, directories and glob patterns into the list of span export files
+    """
+    files = []
+    for path in [paths] if isinstance(paths, str) else paths:
+        if os.path.isdir(path):
+            files += sorted(glob.glob(os.path.join(path, "*.jsonl")) + glob.glob(os.path.join(path, "*.json")))
+        else:
+            files += sorted(glob.glob(path))
+    return files
+
+
+def iter_replay_traces(paths, tags=None, from_time=None, to_time=None):
+    """
+    Stream the traces of span export files. A trace is yielded as soon as its root span is read
+    (exporters write a span when it ends, so the root span comes after its children), which keeps
+    only the traces in progress in memory
+    Args:
+        paths (list): span export files, directories or glob patterns
+        tags (list): only yield traces having all these tags
+        from_time (datetime): only yield traces started at or after this time
+        to_time (datetime): only yield traces started at or before this time
+    Yields:
+        ReplayTrace objects
+    """
+    pending = {}
+    for path in list_span_files(paths):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                for span in parse_span_line(line):
+                    if span["parent_id"] is not None:
+                        pending.setdefault(span["trace_id"], []).append(span)
+                        continue
+                    trace = ReplayTrace(span, pending.pop(span["trace_id"], []))
+                    if tags and not set(tags).issubset(trace.tags):
+                        continue
+                    if from_time and trace.timestamp < from_time:
+                        continue
+                    if to_time and trace.timestamp > to_time:
+                        continue
+                    yield trace
+    if pending:
+        print(f"Ignored {len(pending)} incomplete traces without a root span")
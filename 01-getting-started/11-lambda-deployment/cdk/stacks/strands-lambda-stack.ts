@@ -73,7 +73,7 @@ export class StrandsLambdaStack extends Stack {
 
     restaurantFunction.addToRolePolicy(
       new iam.PolicyStatement({
-        actions: ["bedrock:Retrieve"],
+        actions: ["bedrock:Retrieve", "bedrock:ListDataSources", "bedrock:ListIngestionJobs"],
         resources: [
           `arn:aws:bedrock:${process.env.CDK_DEFAULT_REGION}:${process.env.CDK_DEFAULT_ACCOUNT}:knowledge-base/${knowledgeBaseId.stringValue}`,
         ],
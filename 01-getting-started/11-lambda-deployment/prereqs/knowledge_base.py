@@ -25,6 +25,15 @@ import random
 import yaml
 import os
 import argparse
+from teardown import (
+    TeardownStep,
+    run_teardown,
+    wait_for_data_source_deleted,
+    wait_for_knowledge_base_deleted,
+    wait_for_collection_deleted,
+    empty_and_delete_bucket,
+    delete_role_and_policies,
+)
 
 valid_embedding_models = [
     "cohere.embed-multilingual-v3",
@@ -941,63 +950,79 @@ class KnowledgeBasesForAmazonBedrock:
         bucket_name = ds_details["dataSource"]["dataSourceConfiguration"][
             "s3Configuration"
         ]["bucketArn"].replace("arn:aws:s3:::", "")
-        try:
+
+        # Independent deletions run concurrently, each step starting as soon as the
+        # resources it depends on are gone (see teardown.py)
+        def delete_data_source():
             self.bedrock_agent_client.delete_data_source(
                 dataSourceId=ds_id, knowledgeBaseId=kb_id
             )
+            wait_for_data_source_deleted(self.bedrock_agent_client, kb_id, ds_id)
             print("Data Source deleted successfully!")
-        except Exception as e:
-            print(e)
-        try:
+
+        def delete_knowledge_base():
             self.bedrock_agent_client.delete_knowledge_base(knowledgeBaseId=kb_id)
+            wait_for_knowledge_base_deleted(self.bedrock_agent_client, kb_id)
             print("Knowledge Base deleted successfully!")
-        except Exception as e:
-            print(e)
+
+        def delete_index():
+            self.oss_client.indices.delete(index=index_name)
+            print("OpenSource Serveless Index deleted successfully!")
+
+        def delete_collection():
+            self.aoss_client.delete_collection(id=collection_id)
+            wait_for_collection_deleted(self.aoss_client, collection_id)
+            print("OpenSource Collection Index deleted successfully!")
+
+        def delete_access_policy():
+            self.aoss_client.delete_access_policy(type="data", name=access_policy_name)
+            print("OpenSource Serveless access policy deleted successfully!")
+
+        def delete_network_policy():
+            self.aoss_client.delete_security_policy(
+                type="network", name=network_policy_name
+            )
+            print("OpenSource Serveless network policy deleted successfully!")
+
+        def delete_encryption_policy():
+            self.aoss_client.delete_security_policy(
+                type="encryption", name=encryption_policy_name
+            )
+            print("OpenSource Serveless encryption policy deleted successfully!")
+
+        def delete_bucket():
+            self.delete_s3(bucket_name)
+            print("Knowledge Base S3 bucket deleted successfully!")
+
+        def delete_roles():
+            self.delete_iam_roles_and_policies(kb_role)
+            print("Knowledge Base Roles and Policies deleted successfully!")
+
+        steps = [
+            TeardownStep("data_source", delete_data_source),
+            TeardownStep("knowledge_base", delete_knowledge_base, ["data_source"]),
+        ]
         if delete_aoss:
-            try:
-                self.oss_client.indices.delete(index=index_name)
-                print("OpenSource Serveless Index deleted successfully!")
-            except Exception as e:
-                print(e)
-            try:
-                self.aoss_client.delete_collection(id=collection_id)
-                print("OpenSource Collection Index deleted successfully!")
-            except Exception as e:
-                print(e)
-            try:
-                self.aoss_client.delete_access_policy(
-                    type="data", name=access_policy_name
-                )
-                print("OpenSource Serveless access policy deleted successfully!")
-            except Exception as e:
-                print(e)
-            try:
-                self.aoss_client.delete_security_policy(
-                    type="network", name=network_policy_name
-                )
-                print("OpenSource Serveless network policy deleted successfully!")
-            except Exception as e:
-                print(e)
-            try:
-                self.aoss_client.delete_security_policy(
-                    type="encryption", name=encryption_policy_name
-                )
-                print("OpenSource Serveless encryption policy deleted successfully!")
-            except Exception as e:
-                print(e)
+            collection_deps = ["knowledge_base"]
+            if self.oss_client is not None:
+                steps.append(TeardownStep("index", delete_index, ["knowledge_base"]))
+                collection_deps = ["index"]
+            steps += [
+                TeardownStep("collection", delete_collection, collection_deps),
+                TeardownStep("access_policy", delete_access_policy, ["knowledge_base"]),
+                TeardownStep("network_policy", delete_network_policy, ["collection"]),
+                TeardownStep("encryption_policy", delete_encryption_policy, ["collection"]),
+            ]
         if delete_s3_bucket:
-            try:
-                self.delete_s3(bucket_name)
-                print("Knowledge Base S3 bucket deleted successfully!")
-            except Exception as e:
-                print(e)
+            steps.append(TeardownStep("s3_bucket", delete_bucket, ["data_source"]))
         if delete_iam_roles_and_policies:
-            try:
-                self.delete_iam_roles_and_policies(kb_role)
-                print("Knowledge Base Roles and Policies deleted successfully!")
-            except Exception as e:
-                print(e)
-        print("Resources deleted successfully!")
+            steps.append(TeardownStep("iam_roles", delete_roles, ["knowledge_base"]))
+        results = run_teardown(steps)
+        failed = [name for name, (status, _, _) in results.items() if status != "ok"]
+        if failed:
+            print(f"Resources deleted with errors in: {failed}")
+        else:
+            print("Resources deleted successfully!")
 
     def delete_iam_roles_and_policies(self, kb_execution_role_name: str):
         """
@@ -1005,18 +1030,7 @@ class KnowledgeBasesForAmazonBedrock:
         Args:
             kb_execution_role_name: knowledge base execution role
         """
-        attached_policies = self.iam_client.list_attached_role_policies(
-            RoleName=kb_execution_role_name, MaxItems=100
-        )
-        policies_arns = []
-        for policy in attached_policies["AttachedPolicies"]:
-            policies_arns.append(policy["PolicyArn"])
-        for policy in policies_arns:
-            self.iam_client.detach_role_policy(
-                RoleName=kb_execution_role_name, PolicyArn=policy
-            )
-            self.iam_client.delete_policy(PolicyArn=policy)
-        self.iam_client.delete_role(RoleName=kb_execution_role_name)
+        delete_role_and_policies(self.iam_client, kb_execution_role_name)
         return 0
 
     def delete_s3(self, bucket_name: str):
@@ -1027,11 +1041,7 @@ class KnowledgeBasesForAmazonBedrock:
             bucket_name: bucket name
 
         """
-        objects = self.s3_client.list_objects(Bucket=bucket_name)
-        if "Contents" in objects:
-            for obj in objects["Contents"]:
-                self.s3_client.delete_object(Bucket=bucket_name, Key=obj["Key"])
-        self.s3_client.delete_bucket(Bucket=bucket_name)
+        empty_and_delete_bucket(self.s3_client, bucket_name)
 
 
 if __name__ == "__main__":
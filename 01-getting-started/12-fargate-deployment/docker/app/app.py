@@ -1,6 +1,7 @@
+import asyncio
 import logging
 import os
-from strands_tools import retrieve, current_time
+from strands_tools import current_time
 from strands import Agent
 from strands.models import BedrockModel
 from fastapi import FastAPI, HTTPException
@@ -16,6 +17,10 @@ from create_booking import create_booking
 from delete_booking import delete_booking
 from get_booking import get_booking_details
 from search_receipt import search_receipt
+import cached_retrieve
+from guardrail_prefilter import GuardrailPrefilter
+from guardrail_cache import GuardrailDecisionCache, cached_apply_guardrail, is_blocked
+from stream_guardrail import StreamingOutputGuard, apply_guardrail_check, prefilter_check
 
 
 # Set up logging
@@ -58,6 +63,47 @@ def load_guardrail_config():
 
 GUARDRAIL_CONFIG = load_guardrail_config()
 
+# Local pre-filter: rejects clear guardrail violations (e.g. SSNs, denied words) before any Bedrock
+# call and masks the PII the guardrail anonymizes. The Bedrock guardrail still checks everything else.
+# It mirrors the guardrail, so it only runs when a guardrail is configured
+GUARDRAIL_PREFILTER_ENABLED = (
+    os.environ.get("GUARDRAIL_PREFILTER", "true").lower() == "true" and bool(GUARDRAIL_CONFIG)
+)
+guardrail_prefilter = GuardrailPrefilter.from_file() if GUARDRAIL_PREFILTER_ENABLED else None
+logger.debug("Guardrail pre-filter enabled: %s", GUARDRAIL_PREFILTER_ENABLED)
+
+# Standalone guardrail pre-check: prompts go through apply_guardrail before the agent, with the
+# decisions cached per (guardrail id, version, source, content hash), so a repeated blocked prompt
+# is answered without any Bedrock call. Disabled by default (the model call applies the guardrail)
+GUARDRAIL_PRECHECK_ENABLED = os.environ.get("GUARDRAIL_PRECHECK", "false").lower() == "true"
+guardrail_decision_cache = GuardrailDecisionCache()
+
+# Streaming output checks: /invoke-streaming releases the response sentence by sentence once checked,
+# and cuts it at the first blocked sentence instead of waiting for the guardrail of the complete
+# response. Holding text back until a sentence is complete delays the first byte, so the checks are
+# opt-in: "off" (default) streams the chunks unchecked, "prefilter" uses the local pre-filter,
+# "bedrock" adds apply_guardrail on each sentence (source=OUTPUT, through the decision cache)
+GUARDRAIL_STREAM_CHECK = os.environ.get("GUARDRAIL_STREAM_CHECK", "off").lower()
+bedrock_runtime = (
+    boto3.client('bedrock-runtime', region_name=AWS_REGION)
+    if GUARDRAIL_CONFIG and (GUARDRAIL_PRECHECK_ENABLED or GUARDRAIL_STREAM_CHECK == "bedrock") else None
+)
+logger.debug("Guardrail pre-check enabled: %s", GUARDRAIL_PRECHECK_ENABLED and bedrock_runtime is not None)
+
+stream_checks = []
+if GUARDRAIL_STREAM_CHECK in ("prefilter", "bedrock") and guardrail_prefilter is not None:
+    stream_checks.append(prefilter_check(guardrail_prefilter))
+if GUARDRAIL_STREAM_CHECK == "bedrock" and bedrock_runtime is not None:
+    stream_checks.append(apply_guardrail_check(
+        bedrock_runtime, guardrail_decision_cache,
+        GUARDRAIL_CONFIG['guardrail_id'], GUARDRAIL_CONFIG['guardrail_version']
+    ))
+output_guard = (
+    StreamingOutputGuard(stream_checks, "Response has been filtered for inappropriate content.")
+    if stream_checks else None
+)
+logger.debug("Streaming output guardrail checks: %s", GUARDRAIL_STREAM_CHECK if output_guard else "off")
+
 app = FastAPI(title="Restaurant Assistant API")
 
 logger.debug("FastAPI app initialized. Bucket name: %s", BUCKET_NAME)
@@ -131,7 +177,7 @@ def get_agent_object(key: str):
             messages=state["messages"],
             system_prompt=state["system_prompt"],
             tools=[
-                retrieve, current_time, get_booking_details,
+                cached_retrieve.retrieve_tool, current_time, get_booking_details,
                 create_booking, delete_booking, search_receipt
             ],
         )
@@ -197,7 +243,7 @@ def create_agent():
         model=model,
         system_prompt=system_prompt,
         tools=[
-            retrieve, current_time, get_booking_details,
+            cached_retrieve.retrieve_tool, current_time, get_booking_details,
             create_booking, delete_booking, search_receipt
         ],
     )
@@ -217,12 +263,88 @@ def parse_answer_from_response(response_text: str) -> str:
         return answer_match.group(1).strip()
     return response_text.strip()
 
+def prefilter_prompt(prompt: str, session_id: str):
+    """
+    Run the local guardrail pre-filter on a prompt.
+    Returns the prompt to send to the agent (with anonymized PII masked) and the blocked message,
+    or None when the prompt can go to the agent
+    """
+    if guardrail_prefilter is None:
+        return prompt, None
+    result = guardrail_prefilter.check(prompt, source="INPUT")
+    types = [m["type"] for m in result["matches"]]
+    if result["blocked"]:
+        logger.info("Prompt blocked by the guardrail pre-filter for session_id %s: %s", session_id, types)
+        return prompt, result["outputs"][0]["text"]
+    if result["action"] == "GUARDRAIL_INTERVENED":
+        logger.debug("Prompt anonymized by the guardrail pre-filter for session_id %s: %s", session_id, types)
+        return result["text"], None
+    return prompt, None
+
+def precheck_prompt(prompt: str, session_id: str):
+    """
+    Check a prompt with apply_guardrail (through the decision cache) before invoking the agent.
+    Returns the prompt to send to the agent (anonymized by the guardrail if needed) and the blocked
+    message, or None when the prompt can go to the agent. Errors let the prompt through: the model
+    call still applies the guardrail
+    """
+    if not GUARDRAIL_PRECHECK_ENABLED or bedrock_runtime is None:
+        return prompt, None
+    try:
+        response, hit = cached_apply_guardrail(
+            bedrock_runtime, guardrail_decision_cache,
+            GUARDRAIL_CONFIG['guardrail_id'], GUARDRAIL_CONFIG['guardrail_version'], "INPUT", prompt
+        )
+    except Exception as e:
+        logger.warning("Guardrail pre-check failed for session_id %s: %s", session_id, e)
+        return prompt, None
+    outputs = response.get("outputs") or [{}]
+    if is_blocked(response):
+        logger.info("Prompt blocked by the guardrail pre-check for session_id %s (cached: %s)", session_id, hit)
+        return prompt, outputs[0].get("text", "Sorry, I cannot process that request.")
+    if response.get("action") == "GUARDRAIL_INTERVENED" and outputs[0].get("text"):
+        logger.debug("Prompt anonymized by the guardrail pre-check for session_id %s (cached: %s)", session_id, hit)
+        return outputs[0]["text"], None
+    return prompt, None
+
+def screen_prompt(prompt: str, session_id: str):
+    """
+    Run the local pre-filter, then the guardrail pre-check, on a prompt.
+    Both are blocking (the pre-check calls Bedrock): call it from a worker thread
+    """
+    prompt, blocked_message = prefilter_prompt(prompt, session_id)
+    if blocked_message:
+        return prompt, blocked_message
+    return precheck_prompt(prompt, session_id)
+
 @app.get('/health')
 def health_check():
     """Health check endpoint for the load balancer."""
     # logger.debug("Health check endpoint called.")
     return {"status": "healthy"}
 
+@app.get('/metrics/retrieve-cache')
+def retrieve_cache_metrics():
+    """Hit ratios and counters of the Knowledge Base retrieval cache."""
+    return cached_retrieve.cache_metrics()
+
+@app.get('/metrics/guardrail-prefilter')
+def guardrail_prefilter_metrics():
+    """Counters of the local guardrail pre-filter."""
+    return guardrail_prefilter.stats if guardrail_prefilter else {"enabled": False}
+
+@app.get('/metrics/guardrail-cache')
+def guardrail_cache_metrics():
+    """Hit ratio and counters of the guardrail pre-check decision cache."""
+    if bedrock_runtime is None:
+        return {"enabled": False}
+    return guardrail_decision_cache.metrics()
+
+@app.get('/metrics/guardrail-stream')
+def guardrail_stream_metrics():
+    """Counters of the streaming output guardrail checks."""
+    return output_guard.stats if output_guard else {"enabled": False}
+
 @app.post('/invoke/{session_id}')
 async def invoke(session_id: str, request: PromptRequest):
     """Endpoint to get information."""
@@ -231,6 +353,13 @@ async def invoke(session_id: str, request: PromptRequest):
     if not prompt:
         logger.debug("No prompt provided in /invoke endpoint for session_id: %s", session_id)
         raise HTTPException(status_code=400, detail="No prompt provided")
+    prompt, blocked_message = await asyncio.to_thread(screen_prompt, prompt, session_id)
+    if blocked_message:
+        return {
+            "answer": blocked_message,
+            "session_id": session_id,
+            "timestamp": datetime.now().isoformat()
+        }
     try:
         agent = get_agent_object(key=f"sessions/{session_id}.json")
         if not agent:
@@ -260,6 +389,7 @@ async def invoke(session_id: str, request: PromptRequest):
         parsed_answer = parse_answer_from_response(content)
         
         put_agent_object(key=f"sessions/{session_id}.json", agent=agent)
+        cached_retrieve.log_cache_metrics()
         logger.debug("Agent response for session_id %s: %s", session_id, content)
         
         # Return JSON response
@@ -272,25 +402,43 @@ async def invoke(session_id: str, request: PromptRequest):
         logger.error("Error in /invoke endpoint for session_id %s: %s", session_id, e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+async def stream_agent_text(agent, prompt: str, session_id: str):
+    """Yield the text chunks the agent streams for a prompt"""
+    async for item in agent.stream_async(prompt):
+        if "data" in item:
+            logger.debug("Streaming chunk for session_id %s: %s", session_id, item['data'])
+            yield item['data']
+
 async def run_agent_and_stream_response(prompt: str, session_id:str):
     """
     A helper function to yield summary text chunks one by one as they come in, allowing the web server to emit
-    them to caller live
+    them to caller live. With the streaming output checks, text is released sentence by sentence once checked,
+    and a blocked response ends with the blocked message: the turn is then saved with the message the client got
     """
     logger.debug("run_agent_and_stream_response called for session_id: %s", session_id)
     agent = get_agent_object(key=f"sessions/{session_id}.json")
     if not agent:
         logger.debug("No existing agent found for streaming session_id: %s, creating new agent.", session_id)
         agent = create_agent()
+    turn_start = len(agent.messages)
+    blocked = []
     try:
         logger.debug("Starting async streaming for session_id: %s with prompt: %s", session_id, prompt)
-        async for item in agent.stream_async(prompt):
-            if "data" in item:
-                logger.debug("Streaming chunk for session_id %s: %s", session_id, item['data'])
-                yield item['data']
+        chunks = stream_agent_text(agent, prompt, session_id)
+        if output_guard is not None:
+            chunks = output_guard.guard(chunks, on_blocked=lambda sentence, message: blocked.append(message))
+        async for text in chunks:
+            yield text
     finally:
+        if blocked:
+            logger.info("Streamed response cut by the output guardrail checks for session_id %s", session_id)
+            # drop the partial response (and any tool calls of the turn) from the conversation
+            del agent.messages[turn_start:]
+            agent.messages.append({"role": "user", "content": [{"text": prompt}]})
+            agent.messages.append({"role": "assistant", "content": [{"text": blocked[0]}]})
         logger.debug("Saving agent state after streaming for session_id: %s", session_id)
         put_agent_object(key=f"sessions/{session_id}.json", agent=agent)
+        cached_retrieve.log_cache_metrics()
             
 @app.post('/invoke-streaming/{session_id}')
 async def get_invoke_streaming(session_id: str, request: PromptRequest):
@@ -301,6 +449,9 @@ async def get_invoke_streaming(session_id: str, request: PromptRequest):
         if not prompt:
             logger.debug("No prompt provided in /invoke-streaming endpoint for session_id: %s", session_id)
             raise HTTPException(status_code=400, detail="No prompt provided")
+        prompt, blocked_message = await asyncio.to_thread(screen_prompt, prompt, session_id)
+        if blocked_message:
+            return StreamingResponse(iter([blocked_message]), media_type="text/plain")
         logger.debug("Starting streaming response for session_id: %s with prompt: %s", session_id, prompt)
         return StreamingResponse(
             run_agent_and_stream_response(prompt, session_id),
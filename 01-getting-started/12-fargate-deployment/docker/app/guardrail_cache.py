@@ -0,0 +1,214 @@
+"""
+Cache of Amazon Bedrock apply_guardrail decisions.
+
+The same prompts ("hi", "what's on the menu?") and the same canned responses go through the same
+guardrail version over and over, and every apply_guardrail call is a billed remote round trip.
+A guardrail version is immutable for a given text, so its decision can be reused: this module keeps
+a bounded TTL + LRU cache of apply_guardrail responses keyed by
+(guardrail id, guardrail version, source, SHA-256 of the content).
+
+The TTL bounds how long a decision of the DRAFT version, which can be edited in place, is reused.
+Creating or updating a guardrail must call invalidate(guardrail_id): prereqs/guardrail.py does it
+in create_guardrail. The cache can be persisted to a JSON file (path=...) so the guardrail tooling
+keeps its decisions between runs; the service keeps it in memory.
+
+Usage:
+    cache = GuardrailDecisionCache(ttl_seconds=3600)
+    response, hit = cached_apply_guardrail(bedrock_runtime, cache, guardrail_id, "DRAFT", "INPUT", text)
+    is_blocked(response)
+    cache.invalidate(guardrail_id)
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+CACHE_TTL_SECONDS = int(os.environ.get("GUARDRAIL_CACHE_TTL_SECONDS", "3600"))
+CACHE_MAX_ENTRIES = int(os.environ.get("GUARDRAIL_CACHE_MAX_ENTRIES", "10000"))
+
+# Parts of an apply_guardrail response that depend on the call, not on the decision
+_UNCACHED_FIELDS = ("ResponseMetadata", "usage", "guardrailCoverage")
+
+
+def content_hash(content) -> str:
+    """SHA-256 of an apply_guardrail content list (or of a plain text)"""
+    if isinstance(content, str):
+        content = [{"text": {"text": content}}]
+    return hashlib.sha256(json.dumps(content, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def is_blocked(response: dict) -> bool:
+    """
+    Whether an apply_guardrail response rejects the content (as opposed to only anonymizing PII):
+    True when any policy assessment has the BLOCKED action
+    """
+    if response.get("action") != "GUARDRAIL_INTERVENED":
+        return False
+    pending = list(response.get("assessments", []))
+    while pending:
+        item = pending.pop()
+        if isinstance(item, dict):
+            if item.get("action") == "BLOCKED":
+                return True
+            pending.extend(item.values())
+        elif isinstance(item, list):
+            pending.extend(item)
+    return False
+
+
+class GuardrailDecisionCache:
+    """
+    Thread-safe TTL + LRU cache of apply_guardrail responses
+    Args:
+        ttl_seconds (int): how long a decision is reused
+        max_entries (int): entries kept, the least recently used are evicted first
+        path (str): optional JSON file the cache is loaded from and saved to
+    """
+
+    def __init__(self, ttl_seconds=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES, path=None):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.path = path
+        # key -> (stored_at epoch seconds, response); wall clock time so persisted entries expire too
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "invalidations": 0}
+        if path and os.path.exists(path):
+            self.load()
+
+    @staticmethod
+    def make_key(guardrail_id: str, guardrail_version: str, source: str, content) -> tuple:
+        return (guardrail_id, str(guardrail_version), source, content_hash(content))
+
+    def get(self, guardrail_id, guardrail_version, source, content):
+        """
+        Return the cached response for the content, or None on a miss
+        """
+        key = self.make_key(guardrail_id, guardrail_version, source, content)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            stored_at, response = entry
+            if now - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return copy.deepcopy(response)
+
+    def put(self, guardrail_id, guardrail_version, source, content, response: dict):
+        """
+        Store the decision part of an apply_guardrail response
+        """
+        key = self.make_key(guardrail_id, guardrail_version, source, content)
+        decision = {k: copy.deepcopy(v) for k, v in response.items() if k not in _UNCACHED_FIELDS}
+        with self._lock:
+            self._entries[key] = (time.time(), decision)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def invalidate(self, guardrail_id=None) -> int:
+        """
+        Drop the decisions of a guardrail (all versions), or of every guardrail when no id is given
+        Returns:
+            number of entries removed
+        """
+        with self._lock:
+            if guardrail_id is None:
+                removed = len(self._entries)
+                self._entries.clear()
+            else:
+                keys = [key for key in self._entries if key[0] == guardrail_id]
+                for key in keys:
+                    del self._entries[key]
+                removed = len(keys)
+            self.stats["invalidations"] += 1
+        logger.debug("Invalidated %d guardrail decisions of %s", removed, guardrail_id or "all guardrails")
+        return removed
+
+    def load(self):
+        """Load the unexpired entries of the JSON file"""
+        try:
+            with open(self.path, "r") as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Could not load guardrail decision cache %s: %s", self.path, e)
+            return
+        now = time.time()
+        with self._lock:
+            for key, stored_at, response in entries:
+                if now - stored_at <= self.ttl_seconds:
+                    self._entries[tuple(key)] = (stored_at, response)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def save(self):
+        """Write the unexpired entries to the JSON file (atomically)"""
+        if not self.path:
+            return
+        now = time.time()
+        with self._lock:
+            entries = [[list(key), stored_at, response] for key, (stored_at, response) in self._entries.items()
+                       if now - stored_at <= self.ttl_seconds]
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".guardrail-cache-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def metrics(self) -> dict:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "entries": len(self._entries),
+                "hit_ratio": self.stats["hits"] / lookups if lookups else 0.0,
+            }
+
+
+def cached_apply_guardrail(client, cache, guardrail_id, guardrail_version, source, text):
+    """
+    Call apply_guardrail on a text through the decision cache
+    Args:
+        client: bedrock-runtime client
+        cache (GuardrailDecisionCache): decision cache, or None to always call Bedrock
+        guardrail_id (str): guardrail identifier
+        guardrail_version (str): guardrail version ("DRAFT" or a number)
+        source (str): "INPUT" or "OUTPUT"
+        text (str): text to check
+    Returns:
+        (apply_guardrail response, True when it came from the cache)
+    """
+    content = [{"text": {"text": text}}]
+    if cache is not None:
+        response = cache.get(guardrail_id, guardrail_version, source, content)
+        if response is not None:
+            return response, True
+    response = client.apply_guardrail(
+        guardrailIdentifier=guardrail_id,
+        guardrailVersion=str(guardrail_version),
+        source=source,
+        content=content,
+    )
+    if cache is not None:
+        cache.put(guardrail_id, guardrail_version, source, content, response)
+    return response, False
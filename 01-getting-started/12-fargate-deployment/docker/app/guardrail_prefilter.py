@@ -0,0 +1,205 @@
+"""
+Local pre-filter for the Amazon Bedrock guardrail of the restaurant assistant.
+
+The guardrail is evaluated by Bedrock inside the model call, so a prompt carrying e.g. a social
+security number costs a full model round trip before it is rejected. This module runs the parts of
+the guardrail policy that can be decided locally, with compiled regular expressions, in
+microseconds and before any remote call:
+    - sensitive information: the PII types of sensitiveInformationPolicyConfig that have a reliable
+      pattern (SSN, credit/debit card with Luhn check, bank account number, email, phone) and the
+      custom regexes. BLOCK entities reject the text, ANONYMIZE entities are masked as {TYPE}
+    - word policy: the configured words and phrases, matched as whole words (case insensitive)
+    - denied topics: optional high-precision keywords per topic (localPrefilter.deniedTopicKeywords)
+
+All the phrases of a policy are compiled into a single alternation, so the cost does not grow with
+the number of phrases the way a loop of `in` tests would. Only clear violations are decided
+locally: anything the pre-filter lets through is still evaluated by the Bedrock guardrail, which
+stays authoritative (content filters, semantic topic detection, NAME entities, profanity list).
+
+The policy is read from guardrail_policy.json, the same file prereqs/guardrail.py creates the
+guardrail from, so both stay in sync.
+
+Usage:
+    prefilter = GuardrailPrefilter.from_file()
+    result = prefilter.check("My SSN is 123-45-6789")
+    result["blocked"], result["outputs"][0]["text"]
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLICY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "guardrail_policy.json")
+
+# Section of the policy file used by the pre-filter only (not sent to create_guardrail)
+LOCAL_SECTION = "localPrefilter"
+
+# Patterns of the PII entity types that can be detected reliably without a model
+pii_patterns = {
+    "US_SOCIAL_SECURITY_NUMBER": r"\b(?!000|666|9\d\d)\d{3}-(?!00)\d{2}-(?!0000)\d{4}\b",
+    "CREDIT_DEBIT_CARD_NUMBER": r"(?<!\d)(?:\d[ -]?){12,18}\d(?!\d)",
+    "US_BANK_ACCOUNT_NUMBER": r"(?i)\b(?:bank\s+)?(?:account|acct)\s*(?:number|no\.?|#)?\s*(?:is\s+)?[:#]?\s*\d{6,17}\b",
+    "EMAIL": r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b",
+    "PHONE": r"(?<![\w-])(?:\+?1[\s.-]?)?\(?\d{3}\)?[\s.-]?\d{3}[\s.-]?\d{4}(?![\w-])",
+}
+
+
+def load_guardrail_policy(path: str = DEFAULT_POLICY_FILE, include_local: bool = False) -> dict:
+    """
+    Load the guardrail policy (the create_guardrail arguments except the name)
+    Args:
+        path (str): policy JSON file
+        include_local (bool): keep the localPrefilter section, which create_guardrail does not accept
+    """
+    with open(path, "r") as f:
+        policy = json.load(f)
+    if not include_local:
+        policy.pop(LOCAL_SECTION, None)
+    return policy
+
+
+def luhn_valid(number: str) -> bool:
+    """Luhn checksum of a card number (separators are ignored)"""
+    digits = [int(d) for d in number if d.isdigit()]
+    checksum = 0
+    for i, digit in enumerate(reversed(digits)):
+        if i % 2 == 1:
+            digit *= 2
+            if digit > 9:
+                digit -= 9
+        checksum += digit
+    return len(digits) >= 13 and checksum % 10 == 0
+
+
+def _phrase_pattern(phrases):
+    """Compile phrases into one case-insensitive whole-word alternation (longest phrases first)"""
+    alternatives = [
+        r"\s+".join(re.escape(word) for word in phrase.split())
+        for phrase in sorted(set(phrases), key=len, reverse=True)
+        if phrase.strip()
+    ]
+    if not alternatives:
+        return None
+    return re.compile(r"(?<!\w)(?:" + "|".join(alternatives) + r")(?!\w)", re.IGNORECASE)
+
+
+class GuardrailPrefilter:
+    """
+    Compiled local matchers for a guardrail policy
+    Args:
+        policy (dict): guardrail policy in the create_guardrail format, optionally with a
+            localPrefilter section: {"deniedTopicKeywords": {topic name: [phrases]}}
+    """
+
+    def __init__(self, policy: dict):
+        self.blocked_input_message = policy.get("blockedInputMessaging", "Sorry, I cannot process that request.")
+        self.blocked_output_message = policy.get("blockedOutputsMessaging", "Sorry, I cannot provide that information.")
+
+        # (entity type, compiled pattern, action, validator)
+        self.entities = []
+        self.unsupported_entities = []
+        sensitive = policy.get("sensitiveInformationPolicyConfig", {})
+        for entity in sensitive.get("piiEntitiesConfig", []):
+            pattern = pii_patterns.get(entity["type"])
+            if pattern is None:
+                self.unsupported_entities.append(entity["type"])
+                continue
+            validator = luhn_valid if entity["type"] == "CREDIT_DEBIT_CARD_NUMBER" else None
+            self.entities.append((entity["type"], re.compile(pattern), entity["action"], validator))
+        for regex in sensitive.get("regexesConfig", []):
+            self.entities.append((regex["name"], re.compile(regex["pattern"]), regex["action"], None))
+        # blocking entities first, so a blocked text is rejected without masking it
+        self.entities.sort(key=lambda entity: entity[2] != "BLOCK")
+
+        words = [w["text"] for w in policy.get("wordPolicyConfig", {}).get("wordsConfig", [])]
+        self.word_pattern = _phrase_pattern(words)
+
+        self.topic_patterns = {}
+        self.topic_names = {}
+        keywords = policy.get(LOCAL_SECTION, {}).get("deniedTopicKeywords", {})
+        for topic, phrases in keywords.items():
+            for phrase in phrases:
+                self.topic_names[" ".join(phrase.lower().split())] = topic
+        self.topic_pattern = _phrase_pattern(self.topic_names)
+
+        self._lock = threading.Lock()
+        self.stats = {"checked": 0, "blocked": 0, "anonymized": 0}
+        if self.unsupported_entities:
+            logger.debug("Guardrail pre-filter leaves %s to Bedrock", ", ".join(self.unsupported_entities))
+
+    @classmethod
+    def from_file(cls, path: str = DEFAULT_POLICY_FILE) -> "GuardrailPrefilter":
+        return cls(load_guardrail_policy(path, include_local=True))
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def check(self, text: str, source: str = "INPUT") -> dict:
+        """
+        Check a text against the local part of the policy
+        Args:
+            text (str): user prompt (source="INPUT") or model response (source="OUTPUT")
+            source (str): "INPUT" or "OUTPUT", selects the blocked message
+        Returns:
+            dict shaped like an apply_guardrail response:
+                action: "GUARDRAIL_INTERVENED" or "NONE"
+                blocked (bool): the text must be rejected
+                text (str): the text with the anonymized entities masked
+                outputs: [{"text": blocked message or masked text}] when the pre-filter intervened
+                matches: [{"policy", "type", "action", "start", "end"}] (matched values are not included)
+        """
+        self._count("checked")
+        matches = []
+
+        for pattern, policy_name, type_of in (
+            (self.word_pattern, "wordPolicy", lambda m: "CUSTOM_WORD"),
+            (self.topic_pattern, "topicPolicy", lambda m: self.topic_names.get(" ".join(m.group(0).lower().split()))),
+        ):
+            if pattern is None:
+                continue
+            match = pattern.search(text)
+            if match:
+                matches.append({"policy": policy_name, "type": type_of(match), "action": "BLOCKED", "start": match.start(), "end": match.end()})
+
+        masked_spans = []
+        if not matches:
+            for entity_type, pattern, action, validator in self.entities:
+                for match in pattern.finditer(text):
+                    if validator and not validator(match.group(0)):
+                        continue
+                    matches.append({
+                        "policy": "sensitiveInformationPolicy",
+                        "type": entity_type,
+                        "action": "BLOCKED" if action == "BLOCK" else "ANONYMIZED",
+                        "start": match.start(),
+                        "end": match.end(),
+                    })
+                    if action == "BLOCK":
+                        break
+                    masked_spans.append((match.start(), match.end(), entity_type))
+                if matches and matches[-1]["action"] == "BLOCKED":
+                    break
+
+        blocked = any(m["action"] == "BLOCKED" for m in matches)
+        if blocked:
+            self._count("blocked")
+            message = self.blocked_input_message if source == "INPUT" else self.blocked_output_message
+            return {"action": "GUARDRAIL_INTERVENED", "blocked": True, "text": text, "outputs": [{"text": message}], "matches": matches}
+
+        if masked_spans:
+            self._count("anonymized")
+            parts, position = [], 0
+            for start, end, entity_type in sorted(masked_spans):
+                if start < position:
+                    continue  # overlaps an entity already masked
+                parts += [text[position:start], "{" + entity_type + "}"]
+                position = end
+            masked = "".join(parts) + text[position:]
+            return {"action": "GUARDRAIL_INTERVENED", "blocked": False, "text": masked, "outputs": [{"text": masked}], "matches": matches}
+
+        return {"action": "NONE", "blocked": False, "text": text, "outputs": [], "matches": []}
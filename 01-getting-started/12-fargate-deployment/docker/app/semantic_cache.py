@@ -0,0 +1,249 @@
+"""
+Semantic cache for Knowledge Base retrieval results.
+
+Many restaurant questions are paraphrases of each other ("what's on the Nonna menu",
+"show me Nonna's menu"). This cache embeds incoming queries locally, looks up the nearest
+recent query with the same retrieval parameters and, when the cosine similarity is above a
+threshold, serves the passages that were retrieved for it.
+
+Vectors are kept in a fixed-size NumPy matrix with LRU eviction, so a lookup is a single
+matrix-vector product over at most `capacity` rows.
+
+Embeddings are computed with a feature-hashing embedder (word unigrams/bigrams and character
+trigrams) that needs no model download. Set SEMANTIC_CACHE_MODEL to the name of a
+sentence-transformers model to use it instead, if the package is installed.
+
+A bag-of-words embedding scores long questions that differ in a single word (another restaurant,
+"pizza" instead of "pasta") well above the threshold. With the hashing embedder, a hit is therefore
+only served when every content word found in only one of the two queries is a spelling variant
+("menu" / "menus") of a word found only in the other.
+
+Configuration (environment variables):
+    SEMANTIC_CACHE_THRESHOLD: minimum cosine similarity to serve a cached result (default 0.9)
+    SEMANTIC_CACHE_CAPACITY: maximum number of cached queries (default 512)
+    SEMANTIC_CACHE_MODEL: optional sentence-transformers model name
+"""
+
+import copy
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+from collections import deque
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", 0.9))
+SEMANTIC_CACHE_CAPACITY = int(os.environ.get("SEMANTIC_CACHE_CAPACITY", 512))
+SEMANTIC_CACHE_MODEL = os.environ.get("SEMANTIC_CACHE_MODEL")
+
+# Words that carry no meaning for menu questions, dropped before embedding
+stop_words = {
+    "a", "an", "the", "is", "are", "was", "what", "whats", "what's", "which", "on", "in", "at", "of",
+    "for", "to", "me", "my", "i", "you", "your", "can", "could", "please", "do", "does", "tell",
+    "show", "give", "about", "there", "any", "some", "s",
+}
+
+
+def _trigrams(word: str) -> set:
+    padded = f"#{word}#"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def same_content_words(words, other_words, min_overlap: float = 0.75) -> bool:
+    """
+    Whether two queries have the same content words up to spelling variants: each word found in only
+    one of them must share at least min_overlap of its character trigrams (relative to the shorter
+    word) with a word found only in the other
+    Args:
+        words (frozenset): content words of the first query
+        other_words (frozenset): content words of the second query
+        min_overlap (float): trigram overlap of two variants of a word
+    """
+    only, other_only = words - other_words, other_words - words
+
+    def has_variant(word, candidates):
+        trigrams = _trigrams(word)
+        return any(
+            len(trigrams & _trigrams(c)) / min(len(trigrams), len(_trigrams(c))) >= min_overlap
+            for c in candidates
+        )
+
+    return all(has_variant(w, other_only) for w in only) and all(has_variant(w, only) for w in other_only)
+
+
+class HashingEmbedder:
+    """
+    Deterministic local embedder based on feature hashing
+    """
+
+    def __init__(self, dimensions: int = 512):
+        self.dimensions = dimensions
+
+    def content_words(self, text: str) -> frozenset:
+        """Words of a query that carry its meaning, checked by the cache before serving a hit"""
+        return frozenset(self._words(text))
+
+    def _words(self, text: str):
+        return [w for w in re.findall(r"\w+", text.lower()) if w not in stop_words]
+
+    def _features(self, text: str):
+        words = self._words(text)
+        features = list(words)
+        features += [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for word in words:
+            padded = f"#{word}#"
+            features += [padded[i:i + 3] for i in range(len(padded) - 2)]
+        return features
+
+    def __call__(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature in self._features(text):
+            h = zlib.crc32(feature.encode("utf-8"))
+            vector[h % self.dimensions] += 1.0 if (h >> 31) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+def default_embedder():
+    """
+    Return the sentence-transformers model named by SEMANTIC_CACHE_MODEL if available,
+    otherwise the hashing embedder
+    """
+    if SEMANTIC_CACHE_MODEL:
+        try:
+            from sentence_transformers import SentenceTransformer
+
+            model = SentenceTransformer(SEMANTIC_CACHE_MODEL)
+            logger.info("Semantic cache using sentence-transformers model %s", SEMANTIC_CACHE_MODEL)
+            return lambda text: model.encode(text, normalize_embeddings=True).astype(np.float32)
+        except ImportError:
+            logger.warning("sentence-transformers is not installed, falling back to the hashing embedder")
+    return HashingEmbedder()
+
+
+class SemanticCache:
+    """
+    Nearest-neighbour cache of retrieval results over recent query embeddings
+    """
+
+    def __init__(self, embed_fn=None, capacity=SEMANTIC_CACHE_CAPACITY, threshold=SEMANTIC_CACHE_THRESHOLD, ttl_seconds=300):
+        self.embed_fn = embed_fn or default_embedder()
+        # embedders without semantics (HashingEmbedder) give the content words a hit must share
+        self.content_words_fn = getattr(self.embed_fn, "content_words", None)
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._vectors = None
+        self._param_hashes = np.zeros(capacity, dtype=np.int64)
+        self._stored_at = np.zeros(capacity, dtype=np.float64)
+        self._last_used = np.zeros(capacity, dtype=np.int64)
+        self._valid = np.zeros(capacity, dtype=bool)
+        self._results = [None] * capacity
+        self._words = [None] * capacity
+        self._latencies = np.zeros(capacity, dtype=np.float64)
+        self._tick = 0
+        self._similarities = deque(maxlen=10000)
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "latency_saved_ms": 0.0}
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.asarray(self.embed_fn(text), dtype=np.float32)
+        if self._vectors is None:
+            self._vectors = np.zeros((self.capacity, vector.shape[0]), dtype=np.float32)
+        return vector
+
+    def lookup(self, text: str, params: str):
+        """
+        Return the cached result of the most similar query with the same parameters, or None
+        Args:
+            text (str): the query
+            params (str): serialized retrieval parameters (Knowledge Base id, filters, ...)
+        """
+        vector = self._embed(text)
+        words = self.content_words_fn(text) if self.content_words_fn else None
+        param_hash = zlib.crc32(params.encode("utf-8"))
+        with self._lock:
+            now = time.monotonic()
+            self._valid &= (now - self._stored_at) <= self.ttl_seconds
+            candidates = np.flatnonzero(self._valid & (self._param_hashes == param_hash))
+            if candidates.size == 0:
+                self.stats["misses"] += 1
+                return None
+            similarities = self._vectors[candidates] @ vector
+            self._similarities.append(float(similarities.max()))
+            # most similar query above the threshold whose content words match
+            slot = None
+            for i in np.argsort(-similarities):
+                if similarities[i] < self.threshold:
+                    break
+                if words is None or same_content_words(words, self._words[candidates[i]]):
+                    slot = int(candidates[i])
+                    break
+            if slot is None:
+                self.stats["misses"] += 1
+                return None
+            self._tick += 1
+            self._last_used[slot] = self._tick
+            self.stats["hits"] += 1
+            self.stats["latency_saved_ms"] += float(self._latencies[slot])
+            return copy.deepcopy(self._results[slot])
+
+    def add(self, text: str, params: str, result, latency_ms: float):
+        """
+        Cache a retrieval result, evicting the least recently used query when the cache is full
+        Args:
+            text (str): the query
+            params (str): serialized retrieval parameters
+            result: the retrieval result to cache
+            latency_ms (float): how long the remote retrieval took, reported as saved on hits
+        """
+        vector = self._embed(text)
+        words = self.content_words_fn(text) if self.content_words_fn else None
+        with self._lock:
+            free = np.flatnonzero(~self._valid)
+            if free.size:
+                slot = int(free[0])
+            else:
+                slot = int(np.argmin(self._last_used))
+                self.stats["evictions"] += 1
+            self._tick += 1
+            self._vectors[slot] = vector
+            self._param_hashes[slot] = zlib.crc32(params.encode("utf-8"))
+            self._stored_at[slot] = time.monotonic()
+            self._last_used[slot] = self._tick
+            self._latencies[slot] = latency_ms
+            self._results[slot] = copy.deepcopy(result)
+            self._words[slot] = words
+            self._valid[slot] = True
+
+    def clear(self):
+        with self._lock:
+            self._valid[:] = False
+            self._results = [None] * self.capacity
+            self._words = [None] * self.capacity
+
+    def metrics(self) -> dict:
+        """
+        Return hit/miss counters, the latency saved and the distribution of best-match similarities
+        """
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            similarities = np.asarray(self._similarities)
+            histogram, edges = np.histogram(similarities, bins=10, range=(0.0, 1.0))
+            return {
+                **self.stats,
+                "entries": int(self._valid.sum()),
+                "hit_ratio": self.stats["hits"] / lookups if lookups else 0.0,
+                "similarity_percentiles": {
+                    f"p{p}": float(np.percentile(similarities, p)) if similarities.size else None
+                    for p in (50, 90, 99)
+                },
+                "similarity_histogram": {
+                    f"{edges[i]:.1f}-{edges[i + 1]:.1f}": int(count) for i, count in enumerate(histogram)
+                },
+            }
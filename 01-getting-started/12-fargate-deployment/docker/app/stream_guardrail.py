@@ -0,0 +1,179 @@
+"""
+Incremental output guardrail checks for streamed agent responses.
+
+The Bedrock guardrail of the model (guardrail_redact_output) judges the response once it is
+complete: a response it blocks may already have been streamed to the client, and with a blocked
+response the user waits for the whole generation to get the blocked message. This module checks
+the response while it is generated instead:
+    - the streamed chunks are buffered up to a sentence boundary (or MAX_BUFFER_CHARS)
+    - each sentence is checked in its own task, in parallel with the generation of the next ones
+    - sentences are released to the client in order, once their check passed (with the PII the
+      guardrail anonymizes masked), so no blocked text is ever sent
+    - the first blocked sentence ends the stream with the blocked message and stops the generation
+
+A check is an async callable taking the sentence and returning a verdict dict
+{"blocked": bool, "text": text to send, "message": blocked message}. prefilter_check (local,
+microseconds) and apply_guardrail_check (Bedrock apply_guardrail with source=OUTPUT, through the
+decision cache) are provided.
+
+Usage:
+    guard = StreamingOutputGuard([prefilter_check(prefilter)], blocked_message)
+    async for text in guard.guard(agent_text_chunks, on_blocked=lambda sentence, message: ...):
+        yield text
+"""
+
+import asyncio
+import logging
+import os
+import re
+import threading
+
+from guardrail_cache import cached_apply_guardrail, is_blocked
+
+logger = logging.getLogger(__name__)
+
+MAX_BUFFER_CHARS = int(os.environ.get("GUARDRAIL_STREAM_MAX_BUFFER_CHARS", "400"))
+
+# End of a sentence (punctuation, closing quotes/brackets and the following whitespace) or of a line
+SENTENCE_END = re.compile(r"[.!?]+[\"')\]]*\s+|\n+")
+
+
+def split_sentences(buffer: str, max_chars: int = MAX_BUFFER_CHARS):
+    """
+    Split the complete sentences off a buffer of streamed text
+    Args:
+        buffer (str): text streamed so far and not yet checked
+        max_chars (int): length after which text without a sentence end is released anyway (cut at
+            the last whitespace), so a long run without punctuation is not held back
+    Returns:
+        (list of sentences, each with its trailing whitespace, remaining buffer)
+    """
+    sentences, position = [], 0
+    for match in SENTENCE_END.finditer(buffer):
+        sentences.append(buffer[position:match.end()])
+        position = match.end()
+    rest = buffer[position:]
+    while len(rest) > max_chars:
+        cut = rest.rfind(" ", 0, max_chars) + 1 or max_chars
+        sentences.append(rest[:cut])
+        rest = rest[cut:]
+    return sentences, rest
+
+
+def prefilter_check(prefilter):
+    """Check of a sentence with the local guardrail pre-filter"""
+    async def check(text):
+        result = prefilter.check(text, source="OUTPUT")
+        return {"blocked": result["blocked"], "text": result["text"], "message": result["outputs"][0]["text"] if result["blocked"] else None}
+    return check
+
+
+def apply_guardrail_check(client, cache, guardrail_id, guardrail_version):
+    """
+    Check of a sentence with Bedrock apply_guardrail (source=OUTPUT) through the decision cache.
+    The call runs in a worker thread. A failed call lets the sentence through: the guardrail of the
+    model still judges the complete response
+    """
+    async def check(text):
+        try:
+            response, _ = await asyncio.to_thread(
+                cached_apply_guardrail, client, cache, guardrail_id, guardrail_version, "OUTPUT", text
+            )
+        except Exception as e:
+            logger.warning("Streaming output guardrail check failed: %s", e)
+            return {"blocked": False, "text": text, "message": None}
+        outputs = response.get("outputs") or [{}]
+        if is_blocked(response):
+            return {"blocked": True, "text": text, "message": outputs[0].get("text")}
+        if response.get("action") == "GUARDRAIL_INTERVENED" and outputs[0].get("text"):
+            # keep the whitespace the sentence ended with, the masked text may not
+            return {"blocked": False, "text": outputs[0]["text"] + text[len(text.rstrip()):], "message": None}
+        return {"blocked": False, "text": text, "message": None}
+    return check
+
+
+class StreamingOutputGuard:
+    """
+    Sentence-level output guardrail of a stream of text chunks
+    Args:
+        checks (list): async checks applied in order to each sentence (the next check gets the text
+            returned by the previous one)
+        blocked_message (str): message sent instead of a blocked sentence when the check gives none
+        max_buffer_chars (int): see split_sentences
+    """
+
+    def __init__(self, checks, blocked_message, max_buffer_chars=MAX_BUFFER_CHARS):
+        self.checks = checks
+        self.blocked_message = blocked_message
+        self.max_buffer_chars = max_buffer_chars
+        self._lock = threading.Lock()
+        self.stats = {"streams": 0, "sentences_checked": 0, "sentences_anonymized": 0, "streams_cut": 0}
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    async def _check(self, text):
+        verdict = {"blocked": False, "text": text, "message": None}
+        for check in self.checks:
+            verdict = await check(verdict["text"])
+            if verdict["blocked"]:
+                break
+        self._count("sentences_checked")
+        if not verdict["blocked"] and verdict["text"] != text:
+            self._count("sentences_anonymized")
+        return verdict
+
+    async def guard(self, chunks, on_blocked=None):
+        """
+        Yield the checked text of a stream of chunks, ending with the blocked message at the first
+        blocked sentence. The chunk stream is consumed by a separate task, so generation continues
+        while sentences are checked, and is closed before the guard returns when it stops early.
+        Args:
+            chunks: async iterator of text chunks
+            on_blocked (callable): called with the blocked sentence and the message sent instead of
+                it when the stream is cut
+        """
+        self._count("streams")
+        # check tasks in sentence order, None once the chunk stream is exhausted
+        pending = asyncio.Queue()
+
+        async def produce():
+            buffer = ""
+            try:
+                async for chunk in chunks:
+                    sentences, buffer = split_sentences(buffer + chunk, self.max_buffer_chars)
+                    for sentence in sentences:
+                        pending.put_nowait(asyncio.create_task(self._check(sentence)))
+                if buffer:
+                    pending.put_nowait(asyncio.create_task(self._check(buffer)))
+            finally:
+                pending.put_nowait(None)
+                aclose = getattr(chunks, "aclose", None)
+                if aclose:
+                    await aclose()
+
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                task = await pending.get()
+                if task is None:
+                    break
+                verdict = await task
+                if verdict["blocked"]:
+                    self._count("streams_cut")
+                    message = verdict["message"] or self.blocked_message
+                    if on_blocked:
+                        on_blocked(verdict["text"], message)
+                    yield message
+                    return
+                yield verdict["text"]
+            await producer  # surface the errors of the chunk stream
+        finally:
+            producer.cancel()
+            while not pending.empty():
+                task = pending.get_nowait()
+                if task is not None:
+                    task.cancel()
+            # the generation must be stopped before the caller saves the agent state
+            await asyncio.gather(producer, return_exceptions=True)
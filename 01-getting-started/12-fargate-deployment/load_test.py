@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+Load test of the Restaurant Assistant API with local stand-ins of the AWS services
+
+Measures the throughput and latency of the serving path of docker/app/app.py (session state load,
+agent event loop, tool calls, streaming, session state save) without calling Amazon Bedrock,
+Amazon S3 or Amazon DynamoDB:
+    - the Bedrock model is replaced by a fake model streaming canned tokens with a configurable
+      time to first token and inter-token delay, and optionally calling the get_booking_details tool
+    - the S3 client of the app is replaced by an in-memory bucket
+    - the DynamoDB table and SSM parameter used by the booking tools are replaced by in-memory stand-ins
+
+The app runs in-process under Uvicorn on a local port and is driven by concurrent sessions, each
+sending `--turns` prompts in sequence to /invoke and/or /invoke-streaming. The report gives, per
+endpoint, the requests per second, time to first byte (TTFB) and latency percentiles (p50/p95/p99).
+Results can be saved and compared with a baseline, failing when the serving path regresses.
+
+Usage:
+    pip install -r docker/requirements.txt httpx
+    python load_test.py --sessions 20 --turns 5
+    python load_test.py --sessions 50 --first-token-ms 300 --token-ms 20 --output baseline.json
+    python load_test.py --sessions 50 --first-token-ms 300 --token-ms 20 --baseline baseline.json --max-regression 0.2
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import logging
+import os
+import random
+import socket
+import sys
+import threading
+import time
+import uuid
+
+import boto3
+import httpx
+from botocore.exceptions import ClientError
+
+# The app reads its configuration at import time
+os.environ.setdefault("AGENT_BUCKET", "load-test-bucket")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("KNOWLEDGE_BASE_ID", "LOADTEST")
+os.environ.pop("GUARDRAIL_ID", None)
+os.environ["RETRIEVE_SEMANTIC_CACHE"] = "false"
+
+# Add the app directory to path so we can import the app and its tools
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "docker", "app"))
+
+BOOKINGS_TABLE = "load-test-bookings"
+
+# Settings of the stand-ins, overridden from the command line
+settings = {
+    "first_token_latency": 0.2,
+    "token_interval": 0.01,
+    "storage_latency": 0.0,
+    "tool_call_ratio": 0.0,
+    "answer": (
+        "<answer>Hello, I am Restaurant Helper. The Nonna restaurant is open every day from noon to "
+        "11pm and serves fresh pasta, wood-fired pizza and seasonal desserts. Would you like me to "
+        "book a table for you?</answer>"
+    ),
+}
+
+
+class InMemoryS3:
+    """
+    Stand-in of the S3 client calls of the app (get_object and put_object), thread-safe
+    """
+
+    def __init__(self):
+        self._objects = {}
+        self._lock = threading.Lock()
+
+    def get_object(self, Bucket, Key, **kwargs):
+        time.sleep(settings["storage_latency"])
+        with self._lock:
+            body = self._objects.get((Bucket, Key))
+        if body is None:
+            raise ClientError({"Error": {"Code": "NoSuchKey", "Message": "The specified key does not exist."}}, "GetObject")
+        return {"Body": io.BytesIO(body), "ContentLength": len(body)}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        time.sleep(settings["storage_latency"])
+        with self._lock:
+            self._objects[(Bucket, Key)] = Body if isinstance(Body, bytes) else Body.encode("utf-8")
+        return {"ETag": uuid.uuid4().hex, "ResponseMetadata": {"HTTPStatusCode": 200}}
+
+
+class InMemoryTable:
+    """
+    Stand-in of a DynamoDB Table resource keyed by its key attributes
+    """
+
+    def __init__(self, key_names):
+        self.key_names = key_names
+        self._items = {}
+        self._lock = threading.Lock()
+
+    def _key(self, item):
+        return tuple(item[name] for name in self.key_names)
+
+    def get_item(self, Key, **kwargs):
+        time.sleep(settings["storage_latency"])
+        with self._lock:
+            item = self._items.get(self._key(Key))
+        response = {"ResponseMetadata": {"HTTPStatusCode": 200}}
+        if item is not None:
+            response["Item"] = dict(item)
+        return response
+
+    def put_item(self, Item, **kwargs):
+        time.sleep(settings["storage_latency"])
+        with self._lock:
+            self._items[self._key(Item)] = dict(Item)
+        return {"ResponseMetadata": {"HTTPStatusCode": 200}}
+
+    def delete_item(self, Key, **kwargs):
+        time.sleep(settings["storage_latency"])
+        with self._lock:
+            self._items.pop(self._key(Key), None)
+        return {"ResponseMetadata": {"HTTPStatusCode": 200}}
+
+
+class InMemoryDynamoDB:
+    def __init__(self):
+        self.tables = {BOOKINGS_TABLE: InMemoryTable(["booking_id", "restaurant_name"])}
+
+    def Table(self, name):
+        return self.tables[name]
+
+
+class InMemorySSM:
+    def get_parameter(self, Name, **kwargs):
+        return {"Parameter": {"Name": Name, "Value": BOOKINGS_TABLE}}
+
+
+s3_stand_in = InMemoryS3()
+dynamodb_stand_in = InMemoryDynamoDB()
+ssm_stand_in = InMemorySSM()
+dynamodb_stand_in.Table(BOOKINGS_TABLE).put_item(Item={
+    "booking_id": "b1234567", "restaurant_name": "Nonna", "date": "2025-06-01",
+    "name": "Ana", "hour": "19:00", "num_guests": 4,
+})
+
+_boto3_client = boto3.client
+_boto3_resource = boto3.resource
+
+
+def _client(service_name, *args, **kwargs):
+    stand_ins = {"s3": s3_stand_in, "ssm": ssm_stand_in}
+    if service_name in stand_ins:
+        return stand_ins[service_name]
+    return _boto3_client(service_name, *args, **kwargs)
+
+
+def _resource(service_name, *args, **kwargs):
+    if service_name == "dynamodb":
+        return dynamodb_stand_in
+    return _boto3_resource(service_name, *args, **kwargs)
+
+
+boto3.client = _client
+boto3.resource = _resource
+
+from strands.models.model import Model  # noqa: E402
+
+import app as restaurant_app  # noqa: E402
+
+
+class FakeStreamingModel(Model):
+    """
+    Model streaming a canned answer word by word, with the latency profile given in `settings`.
+    With a tool_call_ratio > 0, a share of the user turns first request the get_booking_details tool
+    """
+
+    def __init__(self, **model_config):
+        self.config = model_config
+        self._random = random.Random(0)
+
+    def update_config(self, **model_config):
+        self.config.update(model_config)
+
+    def get_config(self):
+        return self.config
+
+    async def structured_output(self, output_model, prompt, system_prompt=None, **kwargs):
+        # Canned instance of output_model: the defaults of its fields, an empty value for the required ones
+        await asyncio.sleep(settings["first_token_latency"])
+        empty_values = {str: "", int: 0, float: 0.0, bool: False, list: [], dict: {}}
+        values = {
+            name: empty_values.get(field.annotation)
+            for name, field in output_model.model_fields.items()
+            if field.is_required()
+        }
+        yield {"output": output_model.model_construct(**values)}
+
+    def _should_call_tool(self, messages):
+        last = messages[-1] if messages else {}
+        is_user_prompt = last.get("role") == "user" and any("text" in content for content in last.get("content", []))
+        return is_user_prompt and self._random.random() < settings["tool_call_ratio"]
+
+    async def stream(self, messages, tool_specs=None, system_prompt=None, **kwargs):
+        started_at = time.perf_counter()
+        await asyncio.sleep(settings["first_token_latency"])
+        yield {"messageStart": {"role": "assistant"}}
+        if self._should_call_tool(messages):
+            yield {"contentBlockStart": {"start": {"toolUse": {"toolUseId": f"tooluse_{uuid.uuid4().hex[:12]}", "name": "get_booking_details"}}}}
+            yield {"contentBlockDelta": {"delta": {"toolUse": {"input": json.dumps({"booking_id": "b1234567", "restaurant_name": "Nonna"})}}}}
+            yield {"contentBlockStop": {}}
+            stop_reason, output_tokens = "tool_use", 20
+        else:
+            words = settings["answer"].split(" ")
+            yield {"contentBlockStart": {"start": {}}}
+            for i, word in enumerate(words):
+                if i:
+                    await asyncio.sleep(settings["token_interval"])
+                yield {"contentBlockDelta": {"delta": {"text": word if i == 0 else " " + word}}}
+            yield {"contentBlockStop": {}}
+            stop_reason, output_tokens = "end_turn", len(words)
+        yield {"messageStop": {"stopReason": stop_reason}}
+        input_tokens = sum(len(json.dumps(m.get("content", []))) // 4 for m in messages)
+        yield {
+            "metadata": {
+                "usage": {"inputTokens": input_tokens, "outputTokens": output_tokens, "totalTokens": input_tokens + output_tokens},
+                "metrics": {"latencyMs": int((time.perf_counter() - started_at) * 1000)},
+            }
+        }
+
+
+restaurant_app.BedrockModel = FakeStreamingModel
+
+
+def percentile(values, q):
+    """
+    Percentile with linear interpolation between the closest ranks
+    Args:
+        values (list): sample values
+        q (float): percentile in [0, 100]
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+async def send_prompt(client, endpoint, session_id, prompt):
+    """
+    Send one prompt and return its status, time to first byte and latency in seconds
+    """
+    started_at = time.perf_counter()
+    ttfb = None
+    async with client.stream("POST", f"/{endpoint}/{session_id}", json={"prompt": prompt}) as response:
+        async for chunk in response.aiter_bytes():
+            if ttfb is None and chunk:
+                ttfb = time.perf_counter() - started_at
+    latency = time.perf_counter() - started_at
+    return {"endpoint": endpoint, "status": response.status_code, "ttfb": ttfb if ttfb is not None else latency, "latency": latency}
+
+
+async def run_session(client, endpoint, turns, results):
+    session_id = f"load-test-{uuid.uuid4().hex[:12]}"
+    for turn in range(turns):
+        try:
+            results.append(await send_prompt(client, endpoint, session_id, f"Question {turn}: what is on the menu at Nonna?"))
+        except httpx.HTTPError as e:
+            results.append({"endpoint": endpoint, "status": None, "error": str(e)})
+
+
+async def run_load(base_url, endpoints, sessions, turns, timeout):
+    """
+    Warm up every endpoint, then run `sessions` concurrent sessions per endpoint
+    Returns:
+        dict of endpoint to its report
+    """
+    limits = httpx.Limits(max_connections=sessions * len(endpoints) + 1)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        for endpoint in endpoints:
+            await send_prompt(client, endpoint, "load-test-warmup", "Hello")
+
+        reports = {}
+        for endpoint in endpoints:
+            results = []
+            started_at = time.perf_counter()
+            await asyncio.gather(*(run_session(client, endpoint, turns, results) for _ in range(sessions)))
+            reports[endpoint] = summarize(results, time.perf_counter() - started_at)
+        return reports
+
+
+def summarize(results, elapsed):
+    ok = [r for r in results if r.get("status") == 200]
+    ttfb = [r["ttfb"] * 1000 for r in ok]
+    latency = [r["latency"] * 1000 for r in ok]
+    return {
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "duration_s": round(elapsed, 3),
+        "rps": round(len(ok) / elapsed, 2) if elapsed else None,
+        **{f"ttfb_p{q}_ms": round(percentile(ttfb, q), 1) if ttfb else None for q in (50, 95, 99)},
+        **{f"latency_p{q}_ms": round(percentile(latency, q), 1) if latency else None for q in (50, 95, 99)},
+    }
+
+
+def print_report(reports):
+    columns = ["requests", "errors", "rps", "ttfb_p50_ms", "ttfb_p95_ms", "ttfb_p99_ms", "latency_p50_ms", "latency_p95_ms", "latency_p99_ms"]
+    print(f"{'endpoint':<18}" + "".join(f"{c:>16}" for c in columns))
+    for endpoint, report in reports.items():
+        print(f"{endpoint:<18}" + "".join(f"{str(report[c]):>16}" for c in columns))
+
+
+def find_regressions(reports, baseline, max_regression):
+    """
+    Compare RPS and p99 latencies with a baseline report
+    Returns:
+        list of regression messages
+    """
+    regressions = []
+    for endpoint, report in reports.items():
+        base = baseline.get(endpoint)
+        if not base:
+            continue
+        if base.get("rps") and report["rps"] is not None and report["rps"] < base["rps"] * (1 - max_regression):
+            regressions.append(f"{endpoint}: rps {report['rps']} < baseline {base['rps']}")
+        for key in ("ttfb_p99_ms", "latency_p99_ms"):
+            if base.get(key) and report[key] is not None and report[key] > base[key] * (1 + max_regression):
+                regressions.append(f"{endpoint}: {key} {report[key]} > baseline {base[key]}")
+        if report["errors"] > base.get("errors", 0):
+            regressions.append(f"{endpoint}: {report['errors']} errors, baseline {base.get('errors', 0)}")
+    return regressions
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port):
+    """
+    Run the app under Uvicorn in a background thread and wait until it accepts connections
+    """
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(restaurant_app.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("Uvicorn server failed to start")
+        time.sleep(0.05)
+    return server, thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test of the Restaurant Assistant API with a fake model and in-memory AWS stand-ins")
+    parser.add_argument("--sessions", type=int, default=10, help="Concurrent sessions per endpoint")
+    parser.add_argument("--turns", type=int, default=3, help="Prompts sent in sequence by every session")
+    parser.add_argument("--endpoints", default="invoke,invoke-streaming", help="Comma separated endpoints to test")
+    parser.add_argument("--first-token-ms", type=float, default=200, help="Time to first token of the fake model")
+    parser.add_argument("--token-ms", type=float, default=10, help="Delay between two tokens of the fake model")
+    parser.add_argument("--storage-ms", type=float, default=0, help="Latency of every in-memory S3 and DynamoDB call")
+    parser.add_argument("--tool-call-ratio", type=float, default=0.0, help="Share of turns calling the get_booking_details tool")
+    parser.add_argument("--timeout", type=float, default=120, help="Request timeout in seconds")
+    parser.add_argument("--app-log-level", default="WARNING", help="Log level of the app (it logs at DEBUG by default)")
+    parser.add_argument("--output", help="Write the report to this JSON file")
+    parser.add_argument("--baseline", help="Compare the report with this JSON file and exit with 1 on regression")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Tolerated relative regression of rps and p99 latencies")
+    args = parser.parse_args()
+
+    settings.update(
+        first_token_latency=args.first_token_ms / 1000,
+        token_interval=args.token_ms / 1000,
+        storage_latency=args.storage_ms / 1000,
+        tool_call_ratio=args.tool_call_ratio,
+    )
+    logging.getLogger().setLevel(args.app_log_level)
+    logging.getLogger("restaurant-assistant").setLevel(args.app_log_level)
+
+    endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    port = free_port()
+    server, thread = start_server(port)
+    print(f"🚀 Load testing {', '.join(endpoints)} with {args.sessions} sessions x {args.turns} turns on port {port}")
+    try:
+        reports = asyncio.run(run_load(f"http://127.0.0.1:{port}", endpoints, args.sessions, args.turns, args.timeout))
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+
+    print_report(reports)
+    report = {"settings": vars(args), **reports}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"📄 Report written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = find_regressions(reports, baseline, args.max_regression)
+        for regression in regressions:
+            print(f"❌ {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"✅ No regression above {args.max_regression:.0%} compared with {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Regression test runner of the restaurant assistant guardrail
+
+Runs the cases of guardrail_test_cases.yaml through apply_guardrail concurrently, with a cap on the
+calls per second (apply_guardrail has a per-account TPS quota), and reports:
+    - a confusion matrix of the expected vs actual outcome (block / anonymize / allow)
+    - the block precision and recall, and the failed cases
+    - the p50/p95 apply_guardrail latency per policy type of the cases
+
+Two backends:
+    - bedrock: the guardrail of prereqs_config.yaml (or --guardrail-id/--guardrail-version)
+    - local: a stub answering like apply_guardrail from the local pre-filter of docker/app, with no
+      AWS call, so the runner can gate CI. Cases marked `local: false` (content filters, semantic
+      topics, NAME entities) need Bedrock and are skipped
+
+The exit code is 1 when a case fails, so the runner can be used as a CI step.
+
+Usage:
+    python guardrail_regression.py --backend local
+    python guardrail_regression.py --backend bedrock --concurrency 8 --rate 5 --output report.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+
+from guardrail import TEST_CASES_FILE, decision, load_config, load_test_cases
+from guardrail_prefilter import GuardrailPrefilter, pii_patterns
+
+OUTCOMES = ("block", "anonymize", "allow")
+
+
+class RateLimiter:
+    """
+    Spaces the calls of all the threads at least 1/rate seconds apart
+    Args:
+        rate (float): calls per second, 0 for no limit
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class LocalGuardrailBackend:
+    """
+    Stand-in of the bedrock-runtime client answering apply_guardrail from the local pre-filter
+    Args:
+        latency_ms (float): simulated latency of each call
+    """
+
+    def __init__(self, latency_ms=0.0):
+        self.prefilter = GuardrailPrefilter.from_file()
+        self.latency_ms = latency_ms
+
+    def apply_guardrail(self, guardrailIdentifier, guardrailVersion, source, content):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        text = " ".join(item["text"]["text"] for item in content if "text" in item)
+        result = self.prefilter.check(text, source=source)
+        return {
+            "action": result["action"],
+            "outputs": result["outputs"],
+            "assessments": [self._assessment(result["matches"], text)] if result["matches"] else [],
+        }
+
+    @staticmethod
+    def _assessment(matches, text):
+        """Convert the pre-filter matches to an apply_guardrail assessment"""
+        assessment = {}
+        for m in matches:
+            value = text[m["start"]:m["end"]]
+            if m["policy"] == "wordPolicy":
+                assessment.setdefault("wordPolicy", {"customWords": []})["customWords"].append(
+                    {"match": value, "action": m["action"]})
+            elif m["policy"] == "topicPolicy":
+                assessment.setdefault("topicPolicy", {"topics": []})["topics"].append(
+                    {"name": m["type"], "type": "DENY", "action": m["action"]})
+            elif m["type"] in pii_patterns:
+                sensitive = assessment.setdefault("sensitiveInformationPolicy", {})
+                sensitive.setdefault("piiEntities", []).append({"type": m["type"], "match": value, "action": m["action"]})
+            else:
+                sensitive = assessment.setdefault("sensitiveInformationPolicy", {})
+                sensitive.setdefault("regexes", []).append({"name": m["type"], "match": value, "action": m["action"]})
+        return assessment
+
+
+def percentile(values, q):
+    """
+    Percentile with linear interpolation between the closest ranks
+    Args:
+        values (list): sample values
+        q (float): percentile in [0, 100]
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def run_case(client, limiter, guardrail_id, guardrail_version, case):
+    """
+    Evaluate one case
+    Returns:
+        dict with the case name, policy, expected and actual outcome, latency and error
+    """
+    limiter.wait()
+    result = {"name": case["name"], "policy": case["policy"], "expected": case["expected"],
+              "actual": None, "latency_ms": None, "error": None}
+    start = time.perf_counter()
+    try:
+        response = client.apply_guardrail(
+            guardrailIdentifier=guardrail_id,
+            guardrailVersion=str(guardrail_version),
+            source=case["source"],
+            content=[{"text": {"text": case["text"]}}],
+        )
+        result["latency_ms"] = (time.perf_counter() - start) * 1000
+        result["actual"] = decision(response)
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+
+def run_cases(client, cases, guardrail_id, guardrail_version, concurrency=4, rate=0.0):
+    """
+    Evaluate the cases concurrently
+    Args:
+        client: bedrock-runtime client or LocalGuardrailBackend
+        cases (list): output of load_test_cases
+        concurrency (int): calls in flight
+        rate (float): maximum calls per second, 0 for no limit
+    Returns:
+        list of case results, in the order of the cases
+    """
+    limiter = RateLimiter(rate)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(lambda case: run_case(client, limiter, guardrail_id, guardrail_version, case), cases))
+
+
+def summarize(results, skipped=0):
+    """
+    Build the report of a run: confusion matrix, block precision/recall, latency per policy type
+    """
+    evaluated = [r for r in results if r["error"] is None]
+    matrix = {expected: {actual: 0 for actual in OUTCOMES} for expected in OUTCOMES}
+    for r in evaluated:
+        matrix[r["expected"]][r["actual"]] += 1
+
+    true_blocks = matrix["block"]["block"]
+    predicted_blocks = sum(matrix[expected]["block"] for expected in OUTCOMES)
+    expected_blocks = sum(matrix["block"].values())
+
+    latencies = defaultdict(list)
+    for r in evaluated:
+        latencies[r["policy"]].append(r["latency_ms"])
+        latencies["all"].append(r["latency_ms"])
+    latency = {
+        policy: {
+            "calls": len(values),
+            "p50_ms": round(percentile(values, 50), 1),
+            "p95_ms": round(percentile(values, 95), 1),
+        }
+        for policy, values in sorted(latencies.items(), key=lambda item: (item[0] == "all", item[0]))
+    }
+
+    return {
+        "cases": len(results) + skipped,
+        "evaluated": len(evaluated),
+        "skipped": skipped,
+        "errors": [{"name": r["name"], "error": r["error"]} for r in results if r["error"] is not None],
+        "passed": sum(r["expected"] == r["actual"] for r in evaluated),
+        "failed": [r for r in evaluated if r["expected"] != r["actual"]],
+        "confusion_matrix": matrix,
+        "block_precision": true_blocks / predicted_blocks if predicted_blocks else None,
+        "block_recall": true_blocks / expected_blocks if expected_blocks else None,
+        "latency": latency,
+    }
+
+
+def print_report(report):
+    print(f"\n📊 {report['evaluated']}/{report['cases']} cases evaluated "
+          f"({report['skipped']} skipped, {len(report['errors'])} errors), {report['passed']} passed")
+
+    print("\n  Confusion matrix (rows: expected, columns: actual)")
+    print("  " + " " * 12 + "".join(f"{actual:>11}" for actual in OUTCOMES))
+    for expected in OUTCOMES:
+        print(f"  {expected:<12}" + "".join(f"{report['confusion_matrix'][expected][actual]:>11}" for actual in OUTCOMES))
+    for metric in ("block_precision", "block_recall"):
+        value = report[metric]
+        print(f"  {metric}: {value:.2f}" if value is not None else f"  {metric}: n/a")
+
+    print("\n  apply_guardrail latency per policy type")
+    print(f"  {'policy':<12}{'calls':>7}{'p50 ms':>10}{'p95 ms':>10}")
+    for policy, stats in report["latency"].items():
+        print(f"  {policy:<12}{stats['calls']:>7}{stats['p50_ms']:>10}{stats['p95_ms']:>10}")
+
+    for r in report["failed"]:
+        print(f"  ❌ FAIL {r['name']}: expected {r['expected']}, got {r['actual']}")
+    for e in report["errors"]:
+        print(f"  ❌ ERROR {e['name']}: {e['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the guardrail regression test cases")
+    parser.add_argument("--cases", default=TEST_CASES_FILE, help="Test cases YAML file")
+    parser.add_argument("--backend", choices=["bedrock", "local"], default="bedrock",
+                        help="Amazon Bedrock apply_guardrail, or the local pre-filter stub (no AWS)")
+    parser.add_argument("--config", default="prereqs_config.yaml",
+                        help="Configuration file path (default: prereqs_config.yaml)")
+    parser.add_argument("--region", default="ap-southeast-2", help="AWS region (default: ap-southeast-2)")
+    parser.add_argument("--guardrail-id", help="Guardrail to test (default: the one of the configuration)")
+    parser.add_argument("--guardrail-version", help="Guardrail version (default: the one of the configuration)")
+    parser.add_argument("--concurrency", type=int, default=4, help="apply_guardrail calls in flight (default: 4)")
+    parser.add_argument("--rate", type=float, default=10.0,
+                        help="Maximum apply_guardrail calls per second, 0 for no limit (default: 10)")
+    parser.add_argument("--stub-latency-ms", type=float, default=0.0,
+                        help="Simulated latency of the local backend (default: 0)")
+    parser.add_argument("--output", help="Write the report to this JSON file")
+    args = parser.parse_args()
+
+    cases = load_test_cases(args.cases)
+    skipped = 0
+    if args.backend == "local":
+        client = LocalGuardrailBackend(latency_ms=args.stub_latency_ms)
+        guardrail_id, guardrail_version = "local-prefilter", "DRAFT"
+        skipped = sum(not case["local"] for case in cases)
+        cases = [case for case in cases if case["local"]]
+    else:
+        current_dir = os.path.dirname(os.path.abspath(__file__))
+        config = load_config(f"{current_dir}/{args.config}")
+        guardrail_id = args.guardrail_id or config.get("guardrail_id")
+        guardrail_version = args.guardrail_version or config.get("guardrail_version", "DRAFT")
+        if not guardrail_id:
+            print("❌ No guardrail ID found in configuration")
+            return 1
+        client = boto3.client("bedrock-runtime", region_name=args.region)
+
+    print(f"🧪 Running {len(cases)} guardrail cases against {args.backend} guardrail {guardrail_id} "
+          f"(concurrency {args.concurrency}, rate {args.rate or 'unlimited'}/s)")
+    results = run_cases(client, cases, guardrail_id, guardrail_version, args.concurrency, args.rate)
+    report = summarize(results, skipped)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"backend": args.backend, "guardrail_id": guardrail_id,
+                       "guardrail_version": guardrail_version, **report, "results": results}, f, indent=2)
+        print(f"\n✅ Report saved to {os.path.abspath(args.output)}")
+
+    return 1 if report["failed"] or report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
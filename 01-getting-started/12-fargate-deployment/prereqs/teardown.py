@@ -0,0 +1,214 @@
+"""
+Dependency-aware teardown engine for the Knowledge Base resources.
+
+Deleting a Knowledge Base stack involves several independent resources (S3 buckets, IAM roles,
+OpenSearch Serverless policies, Lambda functions) and a few real dependencies (the data source
+must be gone before the Knowledge Base, the collection before its encryption policy...).
+run_teardown executes a list of TeardownStep in a thread pool, starting every step as soon as
+the steps it depends on have finished, and the helpers below wait on the actual resource state
+instead of sleeping for a fixed amount of time.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from botocore.exceptions import ClientError
+
+# Maximum number of keys accepted by a single S3 delete_objects call
+s3_delete_batch_size = 1000
+
+
+class TeardownStep:
+    """
+    A single deletion in the teardown graph
+    Args:
+        name (str): unique name of the step
+        fn (callable): function performing the deletion (and waiting for it to complete)
+        depends_on (list): names of the steps that must finish before this one starts
+    """
+
+    def __init__(self, name, fn, depends_on=None):
+        self.name = name
+        self.fn = fn
+        self.depends_on = list(depends_on or [])
+
+
+def run_teardown(steps, max_workers: int = 8):
+    """
+    Run the teardown steps concurrently, respecting their dependencies.
+    Teardown is best effort: a failing step is reported and its dependents still run,
+    matching the behaviour of the sequential deletion it replaces
+    Args:
+        steps (list): TeardownStep objects
+        max_workers (int): maximum number of concurrent deletions
+    Returns:
+        dict mapping step name to (status, seconds, error)
+    """
+    by_name = {step.name: step for step in steps}
+    for step in steps:
+        unknown = [d for d in step.depends_on if d not in by_name]
+        if unknown:
+            raise ValueError(f"Step {step.name} depends on unknown steps {unknown}")
+
+    results = {}
+    pending = dict(by_name)
+    running = {}
+    started_at = {}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            ready = [s for s in pending.values() if all(d in results for d in s.depends_on)]
+            for step in ready:
+                del pending[step.name]
+                started_at[step.name] = time.perf_counter()
+                running[executor.submit(step.fn)] = step.name
+            if not running:
+                raise ValueError(f"Circular dependencies between steps {list(pending)}")
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                elapsed = time.perf_counter() - started_at[name]
+                error = future.exception()
+                if error is None:
+                    print(f"[teardown] {name} done in {elapsed:.1f}s")
+                    results[name] = ("ok", elapsed, None)
+                else:
+                    print(f"[teardown] {name} failed after {elapsed:.1f}s: {error}")
+                    results[name] = ("failed", elapsed, str(error))
+    print(f"[teardown] {len(results)} steps finished in {time.perf_counter() - start:.1f}s")
+    return results
+
+
+def wait_until(predicate, description: str, timeout: int = 900, initial_delay: float = 1.0, max_delay: float = 15.0):
+    """
+    Poll `predicate` with exponential backoff until it returns True
+    Args:
+        predicate (callable): returns True once the expected state is reached
+        description (str): used in the timeout error
+        timeout (int): maximum number of seconds to wait
+        initial_delay (float): first polling interval in seconds
+        max_delay (float): maximum polling interval in seconds
+    """
+    deadline = time.monotonic() + timeout
+    delay = initial_delay
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Timed out waiting for {description}")
+        time.sleep(delay)
+        delay = min(delay * 2, max_delay)
+
+
+def _is_not_found(error: ClientError):
+    return error.response["Error"]["Code"] in ("ResourceNotFoundException", "NoSuchEntity", "NoSuchBucket")
+
+
+def wait_for_data_source_deleted(bedrock_agent_client, kb_id: str, ds_id: str):
+    """
+    Wait until a Knowledge Base data source no longer exists
+    """
+    def deleted():
+        try:
+            bedrock_agent_client.get_data_source(knowledgeBaseId=kb_id, dataSourceId=ds_id)
+            return False
+        except ClientError as e:
+            if _is_not_found(e):
+                return True
+            raise
+
+    wait_until(deleted, f"data source {ds_id} deletion")
+
+
+def wait_for_knowledge_base_deleted(bedrock_agent_client, kb_id: str):
+    """
+    Wait until a Knowledge Base no longer exists
+    """
+    def deleted():
+        try:
+            status = bedrock_agent_client.get_knowledge_base(knowledgeBaseId=kb_id)["knowledgeBase"]["status"]
+        except ClientError as e:
+            if _is_not_found(e):
+                return True
+            raise
+        if status == "DELETE_UNSUCCESSFUL":
+            raise RuntimeError(f"Knowledge Base {kb_id} deletion failed")
+        return False
+
+    wait_until(deleted, f"knowledge base {kb_id} deletion")
+
+
+def wait_for_collection_deleted(aoss_client, collection_id: str):
+    """
+    Wait until an OpenSearch Serverless collection no longer exists
+    """
+    def deleted():
+        details = aoss_client.batch_get_collection(ids=[collection_id])["collectionDetails"]
+        if details and details[0]["status"] == "FAILED":
+            raise RuntimeError(f"Collection {collection_id} deletion failed")
+        return not details
+
+    wait_until(deleted, f"collection {collection_id} deletion")
+
+
+def empty_and_delete_bucket(s3_client, bucket_name: str):
+    """
+    Delete every object version and delete marker of a bucket in batches of 1000 keys per
+    delete_objects call, then delete the bucket. Works for versioned and unversioned buckets
+    Args:
+        s3_client: boto3 S3 client
+        bucket_name (str): bucket to delete
+    """
+    try:
+        s3_client.head_bucket(Bucket=bucket_name)
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("404", "NoSuchBucket"):
+            print(f"Bucket {bucket_name} does not exist, skipping deletion")
+            return
+        raise
+
+    # Always list from the start: the deleted keys are gone, so no pagination marker is needed
+    deleted = 0
+    while True:
+        page = s3_client.list_object_versions(Bucket=bucket_name, MaxKeys=s3_delete_batch_size)
+        batch = [
+            {"Key": obj["Key"], "VersionId": obj["VersionId"]}
+            for obj in page.get("Versions", []) + page.get("DeleteMarkers", [])
+        ][:s3_delete_batch_size]
+        if not batch:
+            break
+        deleted += _delete_batch(s3_client, bucket_name, batch)
+
+    s3_client.delete_bucket(Bucket=bucket_name)
+    s3_client.get_waiter("bucket_not_exists").wait(Bucket=bucket_name)
+    print(f"Deleted {deleted} object versions and bucket {bucket_name}")
+
+
+def _delete_batch(s3_client, bucket_name: str, batch):
+    response = s3_client.delete_objects(Bucket=bucket_name, Delete={"Objects": batch, "Quiet": True})
+    errors = response.get("Errors", [])
+    if errors:
+        raise RuntimeError(f"Could not delete {len(errors)} objects from {bucket_name}: {errors[:3]}")
+    return len(batch)
+
+
+def delete_role_and_policies(iam_client, role_name: str):
+    """
+    Detach and delete the customer managed policies of a role, then delete the role.
+    AWS managed and service-role policies are only detached
+    Args:
+        iam_client: boto3 IAM client
+        role_name (str): the role to delete
+    """
+    try:
+        attached = iam_client.list_attached_role_policies(RoleName=role_name, MaxItems=100)["AttachedPolicies"]
+    except ClientError as e:
+        if _is_not_found(e):
+            print(f"Role {role_name} does not exist")
+            return
+        raise
+    for policy in attached:
+        policy_arn = policy["PolicyArn"]
+        iam_client.detach_role_policy(RoleName=role_name, PolicyArn=policy_arn)
+        if not policy_arn.startswith("arn:aws:iam::aws:") and policy_arn.split("/")[1] != "service-role":
+            iam_client.delete_policy(PolicyArn=policy_arn)
+    iam_client.delete_role(RoleName=role_name)
+    print(f"Deleted role {role_name} and {len(attached)} attached policies")
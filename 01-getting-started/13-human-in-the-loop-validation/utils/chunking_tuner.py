@@ -0,0 +1,379 @@
+"""
+Offline tuner for the Knowledge Base chunking strategy.
+
+BedrockKnowledgeBase.create_chunking_strategy_config ships fixed presets (FIXED_SIZE 300/20,
+HIERARCHICAL 1500/300, SEMANTIC 300/95th percentile). This module sweeps the parameters of those
+strategies over a local copy of the corpus and a labeled question set, measuring for every
+configuration:
+    - answer-chunk hit rate: share of questions whose expected answer is contained in one of the
+      top-k chunks returned by a local BM25 retriever
+    - index size: number of vectors and an estimate of the bytes stored in the vector index
+    - query latency: p50/p95 local retrieval time
+
+The Pareto-optimal configurations are reported and the selected one is written to a JSON file
+that can be passed straight to BedrockKnowledgeBase, so the data source is created with it:
+
+    tuned = load_tuned_config("chunking_config.json")
+    knowledge_base = BedrockKnowledgeBase(..., **tuned)
+
+Usage:
+    python utils/chunking_tuner.py --corpus onboarding_text/ --questions questions.jsonl
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import time
+from collections import Counter
+from itertools import product
+
+# Parameter grid swept for each strategy. Keys match the Bedrock chunking configuration fields.
+default_search_space = {
+    "FIXED_SIZE": {
+        "maxTokens": [200, 300, 500, 800],
+        "overlapPercentage": [10, 20],
+    },
+    "HIERARCHICAL": {
+        "parentMaxTokens": [1000, 1500, 2000],
+        "childMaxTokens": [200, 300, 500],
+        "overlapTokens": [60],
+    },
+    "SEMANTIC": {
+        "maxTokens": [300, 500],
+        "bufferSize": [0, 1],
+        "breakpointPercentileThreshold": [90, 95],
+    },
+}
+
+token_pattern = re.compile(r"\w+", re.UNICODE)
+sentence_pattern = re.compile(r"(?<=[.!?])\s+")
+
+
+def tokenize(text: str):
+    """
+    Split text into lowercase word tokens. Used both as a proxy for model tokens and for retrieval
+    Args:
+        text (str): the text to tokenize
+    """
+    return token_pattern.findall(text.lower())
+
+
+def normalize(text: str):
+    """
+    Collapse whitespace and case so that answers can be matched against chunk text
+    Args:
+        text (str): the text to normalize
+    """
+    return " ".join(text.lower().split())
+
+
+def load_corpus(corpus_dir: str):
+    """
+    Load the documents of a local corpus. Supports .txt and .md files and .jsonl shards with a
+    'text' field (as written by utils/preprocess.py to <output>/jsonl: point corpus_dir at that
+    directory, not at <output>, which also holds the same documents as .txt files)
+    Args:
+        corpus_dir (str): directory containing the documents
+    Returns:
+        list of document texts
+    """
+    documents = []
+    for root, _, files in os.walk(corpus_dir):
+        for file_name in sorted(files):
+            path = os.path.join(root, file_name)
+            if file_name.endswith((".txt", ".md")):
+                with open(path, "r", encoding="utf-8") as f:
+                    documents.append(f.read())
+            elif file_name.endswith(".jsonl"):
+                with open(path, "r", encoding="utf-8") as f:
+                    documents.extend(json.loads(line)["text"] for line in f if line.strip())
+    return documents
+
+
+def load_questions(questions_file: str):
+    """
+    Load a labeled question set from a JSON list or a JSONL file.
+    Each record must have a 'question' and an 'answer' (a text span expected in the retrieved chunk)
+    Args:
+        questions_file (str): path to the question set
+    """
+    with open(questions_file, "r", encoding="utf-8") as f:
+        if questions_file.endswith(".jsonl"):
+            return [json.loads(line) for line in f if line.strip()]
+        return json.load(f)
+
+
+def _windows(words, size, step):
+    """Yield windows of `size` words advancing by `step` words"""
+    step = max(step, 1)
+    for start in range(0, max(len(words) - size, 0) + 1, step):
+        yield words[start:start + size]
+    if len(words) > size and (len(words) - size) % step:
+        yield words[-size:]
+
+
+def fixed_size_chunks(document: str, maxTokens: int, overlapPercentage: int):
+    """
+    Local equivalent of the FIXED_SIZE strategy
+    Returns:
+        list of (indexed_text, returned_text) tuples
+    """
+    words = document.split()
+    step = maxTokens - int(maxTokens * overlapPercentage / 100)
+    return [(chunk, chunk) for chunk in (" ".join(w) for w in _windows(words, maxTokens, step))]
+
+
+def hierarchical_chunks(document: str, parentMaxTokens: int, childMaxTokens: int, overlapTokens: int):
+    """
+    Local equivalent of the HIERARCHICAL strategy: child chunks are indexed, the parent is returned
+    Returns:
+        list of (indexed_text, returned_text) tuples
+    """
+    chunks = []
+    words = document.split()
+    for parent_words in _windows(words, parentMaxTokens, parentMaxTokens - overlapTokens):
+        parent = " ".join(parent_words)
+        for child_words in _windows(parent_words, childMaxTokens, childMaxTokens - overlapTokens):
+            chunks.append((" ".join(child_words), parent))
+    return chunks
+
+
+def _cosine_distance(a: Counter, b: Counter):
+    dot = sum(count * b[token] for token, count in a.items())
+    norm = math.sqrt(sum(v * v for v in a.values())) * math.sqrt(sum(v * v for v in b.values()))
+    return 1.0 - (dot / norm if norm else 0.0)
+
+
+def semantic_chunks(document: str, maxTokens: int, bufferSize: int, breakpointPercentileThreshold: int):
+    """
+    Local equivalent of the SEMANTIC strategy. Sentences (grouped with `bufferSize` neighbours) are
+    compared with bag-of-words vectors and the document is split where the distance between
+    consecutive groups is above the given percentile, or when a chunk reaches `maxTokens`
+    Returns:
+        list of (indexed_text, returned_text) tuples
+    """
+    sentences = [s for s in sentence_pattern.split(document) if s.strip()]
+    if not sentences:
+        return []
+    groups = [
+        Counter(tokenize(" ".join(sentences[max(i - bufferSize, 0):i + bufferSize + 1])))
+        for i in range(len(sentences))
+    ]
+    distances = [_cosine_distance(groups[i], groups[i + 1]) for i in range(len(groups) - 1)]
+    threshold = sorted(distances)[int((len(distances) - 1) * breakpointPercentileThreshold / 100)] if distances else 1.0
+
+    chunks, current, current_size = [], [], 0
+    for i, sentence in enumerate(sentences):
+        size = len(sentence.split())
+        if current and current_size + size > maxTokens:
+            chunks.append(" ".join(current))
+            current, current_size = [], 0
+        current.append(sentence)
+        current_size += size
+        if i < len(distances) and distances[i] > threshold:
+            chunks.append(" ".join(current))
+            current, current_size = [], 0
+    if current:
+        chunks.append(" ".join(current))
+    return [(chunk, chunk) for chunk in chunks]
+
+
+chunkers = {
+    "FIXED_SIZE": fixed_size_chunks,
+    "HIERARCHICAL": hierarchical_chunks,
+    "SEMANTIC": semantic_chunks,
+}
+
+
+class BM25Index:
+    """
+    Minimal in-memory BM25 index used to approximate vector retrieval over the chunks
+    """
+
+    def __init__(self, chunks, k1=1.5, b=0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        self.term_freqs = [Counter(tokenize(indexed)) for indexed, _ in chunks]
+        self.lengths = [sum(tf.values()) for tf in self.term_freqs]
+        self.avg_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0
+        document_freq = Counter(token for tf in self.term_freqs for token in tf)
+        n = len(chunks)
+        self.idf = {t: math.log(1 + (n - df + 0.5) / (df + 0.5)) for t, df in document_freq.items()}
+        self.postings = {}
+        for idx, tf in enumerate(self.term_freqs):
+            for token in tf:
+                self.postings.setdefault(token, []).append(idx)
+
+    def search(self, query: str, top_k: int = 5):
+        """
+        Return the `returned_text` of the top-k chunks for a query
+        """
+        scores = Counter()
+        for token in set(tokenize(query)):
+            idf = self.idf.get(token)
+            if idf is None:
+                continue
+            for idx in self.postings[token]:
+                tf = self.term_freqs[idx][token]
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[idx] / self.avg_length)
+                scores[idx] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return [self.chunks[idx][1] for idx, _ in scores.most_common(top_k)]
+
+
+def _percentile(values, percentile):
+    ordered = sorted(values)
+    return ordered[min(int(round((len(ordered) - 1) * percentile / 100)), len(ordered) - 1)] if ordered else 0.0
+
+
+def evaluate_configuration(documents, questions, strategy, parameters, top_k=5, embedding_dimensions=1024):
+    """
+    Chunk the corpus with one configuration and measure hit rate, index size and query latency
+    Args:
+        documents (list): document texts
+        questions (list): labeled questions with 'question' and 'answer'
+        strategy (str): FIXED_SIZE, HIERARCHICAL or SEMANTIC
+        parameters (dict): the strategy parameters
+        top_k (int): number of chunks retrieved per question
+        embedding_dimensions (int): vector size used to estimate the index size
+    """
+    chunks = [chunk for document in documents for chunk in chunkers[strategy](document, **parameters)]
+    index = BM25Index(chunks)
+
+    hits = 0
+    latencies = []
+    for question in questions:
+        start = time.perf_counter()
+        results = index.search(question["question"], top_k=top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        answer = normalize(question["answer"])
+        hits += any(answer in normalize(text) for text in results)
+
+    text_bytes = sum(len(indexed.encode("utf-8")) for indexed, _ in chunks)
+    return {
+        "chunking_strategy": strategy,
+        "parameters": parameters,
+        "hit_rate": hits / len(questions) if questions else 0.0,
+        "num_vectors": len(chunks),
+        "index_bytes": text_bytes + len(chunks) * embedding_dimensions * 4,
+        "latency_p50_ms": _percentile(latencies, 50),
+        "latency_p95_ms": _percentile(latencies, 95),
+    }
+
+
+def pareto_front(results):
+    """
+    Keep the configurations not dominated on (higher hit rate, smaller index, lower p50 latency)
+    """
+    def dominates(a, b):
+        better_or_equal = (
+            a["hit_rate"] >= b["hit_rate"]
+            and a["index_bytes"] <= b["index_bytes"]
+            and a["latency_p50_ms"] <= b["latency_p50_ms"]
+        )
+        strictly_better = (
+            a["hit_rate"] > b["hit_rate"]
+            or a["index_bytes"] < b["index_bytes"]
+            or a["latency_p50_ms"] < b["latency_p50_ms"]
+        )
+        return better_or_equal and strictly_better
+
+    return [r for r in results if not any(dominates(other, r) for other in results if other is not r)]
+
+
+def to_bedrock_parameters(strategy: str, parameters: dict):
+    """
+    Translate swept parameters into the Bedrock chunking configuration fields expected by
+    BedrockKnowledgeBase(chunking_parameters=...)
+    """
+    if strategy == "HIERARCHICAL":
+        return {
+            "levelConfigurations": [
+                {"maxTokens": parameters["parentMaxTokens"]},
+                {"maxTokens": parameters["childMaxTokens"]},
+            ],
+            "overlapTokens": parameters["overlapTokens"],
+        }
+    return dict(parameters)
+
+
+def tune_chunking_strategy(
+    corpus_dir: str,
+    questions_file: str,
+    output_file: str = "chunking_config.json",
+    strategies=("FIXED_SIZE", "HIERARCHICAL", "SEMANTIC"),
+    search_space=None,
+    top_k: int = 5,
+):
+    """
+    Sweep the chunking parameters and write the selected Pareto-optimal configuration to a file.
+    Among the Pareto front the configuration with the best hit rate is selected, ties are broken by
+    index size and then latency
+    Args:
+        corpus_dir (str): directory with the local copy of the corpus
+        questions_file (str): JSON/JSONL labeled question set
+        output_file (str): where to write the selected configuration
+        strategies (tuple): strategies to sweep
+        search_space (dict): parameter grid per strategy, defaults to default_search_space
+        top_k (int): number of chunks retrieved per question
+    Returns:
+        dict with the selected configuration and the Pareto front
+    """
+    search_space = search_space or default_search_space
+    documents = load_corpus(corpus_dir)
+    questions = load_questions(questions_file)
+    if not documents or not questions:
+        raise ValueError("The corpus and the question set must both be non-empty")
+    print(f"Loaded {len(documents)} documents and {len(questions)} questions")
+
+    results = []
+    for strategy in strategies:
+        grid = search_space[strategy]
+        for values in product(*grid.values()):
+            parameters = dict(zip(grid.keys(), values))
+            result = evaluate_configuration(documents, questions, strategy, parameters, top_k=top_k)
+            print(
+                f"{strategy} {parameters}: hit rate {result['hit_rate']:.2%}, "
+                f"{result['num_vectors']} vectors, p50 {result['latency_p50_ms']:.2f} ms"
+            )
+            results.append(result)
+
+    front = pareto_front(results)
+    best = sorted(front, key=lambda r: (-r["hit_rate"], r["index_bytes"], r["latency_p50_ms"]))[0]
+    tuned = {
+        "chunking_strategy": best["chunking_strategy"],
+        "chunking_parameters": to_bedrock_parameters(best["chunking_strategy"], best["parameters"]),
+        "metrics": {k: v for k, v in best.items() if k not in ("chunking_strategy", "parameters")},
+        "pareto_front": front,
+    }
+    with open(output_file, "w") as f:
+        json.dump(tuned, f, indent=2)
+    print(f"Selected {tuned['chunking_strategy']} {tuned['chunking_parameters']}, written to {output_file}")
+    return tuned
+
+
+def load_tuned_config(config_file: str = "chunking_config.json"):
+    """
+    Load a configuration written by tune_chunking_strategy as BedrockKnowledgeBase keyword arguments
+    Args:
+        config_file (str): path to the tuned configuration
+    """
+    with open(config_file, "r") as f:
+        tuned = json.load(f)
+    return {
+        "chunking_strategy": tuned["chunking_strategy"],
+        "chunking_parameters": tuned["chunking_parameters"],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", required=True, help="Directory with the local corpus")
+    parser.add_argument("--questions", required=True, help="JSON/JSONL labeled question set")
+    parser.add_argument("--output", default="chunking_config.json", help="Where to write the selected config")
+    parser.add_argument("--top_k", type=int, default=5, help="Number of chunks retrieved per question")
+    args = parser.parse_args()
+
+    tune_chunking_strategy(args.corpus, args.questions, output_file=args.output, top_k=args.top_k)
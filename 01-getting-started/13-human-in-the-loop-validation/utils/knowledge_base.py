@@ -9,6 +9,15 @@ import zipfile
 from io import BytesIO
 import warnings
 import random
+from .teardown import (
+    TeardownStep,
+    run_teardown,
+    wait_for_data_source_deleted,
+    wait_for_knowledge_base_deleted,
+    wait_for_collection_deleted,
+    empty_and_delete_bucket,
+    delete_role_and_policies,
+)
 warnings.filterwarnings('ignore')
 
 valid_generation_models = ["anthropic.claude-3-5-sonnet-20240620-v1:0", 
@@ -63,6 +72,7 @@ class BedrockKnowledgeBase:
             reranking_model="cohere.rerank-v3-5:0",
             graph_model="anthropic.claude-3-haiku-20240307-v1:0",
             chunking_strategy="FIXED_SIZE",
+            chunking_parameters=None,
             suffix=None,
             vector_store="OPENSEARCH_SERVERLESS" # can be OPENSEARCH_SERVERLESS or NEPTUNE_ANALYTICS
     ):
@@ -80,6 +90,8 @@ class BedrockKnowledgeBase:
             generation_model(str): The generation model to be used for the Knowledge Base.
             reranking_model(str): The reranking model to be used for the Knowledge Base.
             chunking_strategy(str): The chunking strategy to be used for the Knowledge Base.
+            chunking_parameters(dict): Optional overrides for the chunking strategy preset, e.g. the
+                output of utils.chunking_tuner.tune_chunking_strategy.
             suffix(str): A suffix to be used for naming resources.
         """
 
@@ -106,6 +118,7 @@ class BedrockKnowledgeBase:
         self.bucket_names=[d["bucket_name"] for d in self.data_sources if d['type']== 'S3']
         self.secrets_arns = [d["credentialsSecretArn"] for d in self.data_sources if d['type']== 'CONFLUENCE'or d['type']=='SHAREPOINT' or d['type']=='SALESFORCE']
         self.chunking_strategy = chunking_strategy
+        self.chunking_parameters = chunking_parameters or {}
         self.multi_modal = multi_modal
         self.parser = parser
         
@@ -813,7 +826,17 @@ class BedrockKnowledgeBase:
                 "chunkingConfiguration": {"chunkingStrategy": "NONE"}
             }
         }
-        return configs.get(strategy, configs["NONE"])
+        config = configs.get(strategy, configs["NONE"])
+
+        # apply tuned parameters (see utils/chunking_tuner.py) on top of the preset
+        overrides_key = {
+            "FIXED_SIZE": "fixedSizeChunkingConfiguration",
+            "HIERARCHICAL": "hierarchicalChunkingConfiguration",
+            "SEMANTIC": "semanticChunkingConfiguration",
+        }.get(strategy)
+        if overrides_key and self.chunking_parameters:
+            config["chunkingConfiguration"][overrides_key].update(self.chunking_parameters)
+        return config
 
     @retry(wait_random_min=1000, wait_random_max=2000, stop_max_attempt_number=7)
     def create_knowledge_base(self, data_sources):
@@ -1143,149 +1166,120 @@ class BedrockKnowledgeBase:
 
     def delete_kb(self, delete_s3_bucket=False, delete_iam_roles_and_policies=True, delete_lambda_function=False):
         """
-        Delete the Knowledge Base resources
+        Delete the Knowledge Base resources. Independent deletions run concurrently and each step
+        waits on the real resource state of its dependencies (see utils/teardown.py)
         Args:
             delete_s3_bucket (bool): boolean to indicate if s3 bucket should also be deleted
             delete_iam_roles_and_policies (bool): boolean to indicate if IAM roles and Policies should also be deleted
             delete_lambda_function (bool): boolean to indicate if Lambda function should also be deleted
         """
-        
-        with warnings.catch_warnings():
-            warnings.filterwarnings("ignore")
+        kb_id = self.knowledge_base['knowledgeBaseId']
 
-            # delete knowledge base and data source.
-            
-            # Delete knowledge base and data sources
+        def delete_data_source(ds_id):
             try:
-                # First delete all data sources
-                for ds in self.data_source:
-                    try:
-                        self.bedrock_agent_client.delete_data_source(
-                            dataSourceId=ds["dataSourceId"],
-                            knowledgeBaseId=self.knowledge_base['knowledgeBaseId']
-                        )
-                        print(f"Deleted data source {ds['dataSourceId']}")
-                    except self.bedrock_agent_client.exceptions.ResourceNotFoundException:
-                        print(f"Data source {ds['dataSourceId']} not found")
-                    except Exception as e:
-                        print(f"Error deleting data source {ds['dataSourceId']}: {str(e)}")
-
-                # Then delete the knowledge base
-                self.bedrock_agent_client.delete_knowledge_base(
-                    knowledgeBaseId=self.knowledge_base['knowledgeBaseId']
-                )
-                print("======== Knowledge base and all data sources deleted =========")
-            
+                self.bedrock_agent_client.delete_data_source(dataSourceId=ds_id, knowledgeBaseId=kb_id)
+            except self.bedrock_agent_client.exceptions.ResourceNotFoundException:
+                print(f"Data source {ds_id} not found")
+                return
+            wait_for_data_source_deleted(self.bedrock_agent_client, kb_id, ds_id)
+            print(f"Deleted data source {ds_id}")
+
+        def delete_knowledge_base():
+            try:
+                self.bedrock_agent_client.delete_knowledge_base(knowledgeBaseId=kb_id)
             except self.bedrock_agent_client.exceptions.ResourceNotFoundException as e:
                 print("Knowledge base not found:", e)
-            except Exception as e:
-                print(f"Error during knowledge base deletion: {str(e)}")
+                return
+            wait_for_knowledge_base_deleted(self.bedrock_agent_client, kb_id)
+            print("======== Knowledge base and all data sources deleted =========")
 
-            # delete s3 bucket
-            if delete_s3_bucket==True:
-                    self.delete_s3()
-                    
-            # delete IAM role and policies
-            if delete_iam_roles_and_policies:
-                self.delete_iam_roles_and_policies()
-            
-            if delete_lambda_function:
-                try:
-                    self.delete_lambda_function()
-                    print(f"Deleted Lambda function {self.lambda_function_name}")
-                except self.lambda_client.exceptions.ResourceNotFoundException:
-                    print(f"Lambda function {self.lambda_function_name} not found.")
-
-            # delete vector index and collection from vector store
-            if self.vector_store=="OPENSEARCH_SERVERLESS":
-                try:
-                    self.aoss_client.delete_collection(id=self.collection_id)
-                    self.aoss_client.delete_access_policy(
-                        type="data",
-                        name=self.access_policy_name
-                    )
-                    self.aoss_client.delete_security_policy(
-                        type="network",
-                        name=self.network_policy_name
-                    )
-                    self.aoss_client.delete_security_policy(
-                        type="encryption",
-                        name=self.encryption_policy_name
-                    )
-                    print("======== Vector Index, collection and associated policies deleted =========")
-                except Exception as e:
-                    print(e)
-            else: 
-                try: 
-                    # disable delete protection
-                    response = self.neptune_client.update_graph(
-                        graphIdentifier=self.graph_id,
-                        deletionProtection=False)
-                    print("======= Delete protection disabled before deleting the graph: ", response['deletionProtection'])
-
-                    # delete the graph
-                    self.neptune_client.delete_graph(
-                        graphIdentifier=self.graph_id,
-                        skipSnapshot=True)
-                    print("========= Neptune Analytics Graph Deleted =================================")
-                except Exception as e:
-                    print(e)
+        def delete_lambda():
+            try:
+                self.delete_lambda_function()
+                print(f"Deleted Lambda function {self.lambda_function_name}")
+            except self.lambda_client.exceptions.ResourceNotFoundException:
+                print(f"Lambda function {self.lambda_function_name} not found.")
+
+        def delete_collection():
+            self.aoss_client.delete_collection(id=self.collection_id)
+            wait_for_collection_deleted(self.aoss_client, self.collection_id)
+            print("======== Vector Index and collection deleted =========")
+
+        def delete_access_policy():
+            self.aoss_client.delete_access_policy(type="data", name=self.access_policy_name)
+
+        def delete_network_policy():
+            self.aoss_client.delete_security_policy(type="network", name=self.network_policy_name)
+
+        def delete_encryption_policy():
+            self.aoss_client.delete_security_policy(type="encryption", name=self.encryption_policy_name)
+
+        def delete_graph():
+            # disable delete protection
+            response = self.neptune_client.update_graph(
+                graphIdentifier=self.graph_id,
+                deletionProtection=False)
+            print("======= Delete protection disabled before deleting the graph: ", response['deletionProtection'])
+            self.neptune_client.delete_graph(
+                graphIdentifier=self.graph_id,
+                skipSnapshot=True)
+            print("========= Neptune Analytics Graph Deleted =================================")
+
+        ds_steps = [f"data_source_{ds['dataSourceId']}" for ds in self.data_source]
+        steps = [
+            TeardownStep(name, lambda ds_id=ds["dataSourceId"]: delete_data_source(ds_id))
+            for name, ds in zip(ds_steps, self.data_source)
+        ]
+        steps.append(TeardownStep("knowledge_base", delete_knowledge_base, ds_steps))
+        if delete_s3_bucket:
+            steps += [
+                TeardownStep(f"s3_{bucket_name}", lambda b=bucket_name: empty_and_delete_bucket(self.s3_client, b), ds_steps)
+                for bucket_name in self._all_bucket_names()
+            ]
+        if delete_iam_roles_and_policies:
+            steps += [
+                TeardownStep(f"iam_{role_name}", lambda r=role_name: delete_role_and_policies(self.iam_client, r), ["knowledge_base"])
+                for role_name in self.roles
+            ]
+        if delete_lambda_function:
+            steps.append(TeardownStep("lambda", delete_lambda, ["knowledge_base"]))
+        if self.vector_store == "OPENSEARCH_SERVERLESS":
+            steps += [
+                TeardownStep("collection", delete_collection, ["knowledge_base"]),
+                TeardownStep("access_policy", delete_access_policy, ["knowledge_base"]),
+                TeardownStep("network_policy", delete_network_policy, ["collection"]),
+                TeardownStep("encryption_policy", delete_encryption_policy, ["collection"]),
+            ]
+        else:
+            steps.append(TeardownStep("neptune_graph", delete_graph, ["knowledge_base"]))
+
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore")
+            return run_teardown(steps)
 
-            
     def delete_iam_roles_and_policies(self):
         for role_name in self.roles:
-            print(f"Found role {role_name}")
-            try:
-                self.iam_client.get_role(RoleName=role_name)
-            except self.iam_client.exceptions.NoSuchEntityException:
-                print(f"Role {role_name} does not exist") 
-                continue
-            attached_policies = self.iam_client.list_attached_role_policies(RoleName=role_name)["AttachedPolicies"]
-            print(f"======Attached policies with role {role_name}========\n", attached_policies)
-            for attached_policy in attached_policies:
-                policy_arn = attached_policy["PolicyArn"]
-                policy_name = attached_policy["PolicyName"]
-                self.iam_client.detach_role_policy(RoleName=role_name, PolicyArn=policy_arn)
-                print(f"Detached policy {policy_name} from role {role_name}")
-                if str(policy_arn.split("/")[1]) == "service-role":
-                    print(f"Skipping deletion of service-linked role policy {policy_name}")
-                else: 
-                    self.iam_client.delete_policy(PolicyArn=policy_arn)
-                    print(f"Deleted policy {policy_name} from role {role_name}")
-                
-            self.iam_client.delete_role(RoleName=role_name)
-            print(f"Deleted role {role_name}")
+            delete_role_and_policies(self.iam_client, role_name)
         print("======== All IAM roles and policies deleted =========")
 
     def bucket_exists(bucket):
         s3 = boto3.resource('s3')
         return s3.Bucket(bucket) in s3.buckets.all()
 
-    def delete_s3(self):
-        """
-        Delete the objects contained in the Knowledge Base S3 bucket.
-        Once the bucket is empty, delete the bucket
-        """
-        s3 = boto3.resource('s3')
+    def _all_bucket_names(self):
         bucket_names = self.bucket_names.copy()
         if self.intermediate_bucket_name:
             bucket_names.append(self.intermediate_bucket_name)
+        return bucket_names
 
-        for bucket_name in bucket_names:
+    def delete_s3(self):
+        """
+        Delete the objects contained in the Knowledge Base S3 buckets, including all versions,
+        in batches of 1000 keys. Once a bucket is empty, delete the bucket
+        """
+        for bucket_name in self._all_bucket_names():
             try:
-                bucket = s3.Bucket(bucket_name)
-                if bucket in s3.buckets.all():
-                    print(f"Found bucket {bucket_name}")
-                    # Delete all objects including versions (if versioning enabled)
-                    bucket.object_versions.delete()
-                    bucket.objects.all().delete()
-                    print(f"Deleted all objects in bucket {bucket_name}")
-                    
-                    # Delete the bucket
-                    bucket.delete()
-                    print(f"Deleted bucket {bucket_name}")
-                else:
-                    print(f"Bucket {bucket_name} does not exist, skipping deletion")
+                empty_and_delete_bucket(self.s3_client, bucket_name)
             except Exception as e:
                 print(f"Error deleting bucket {bucket_name}: {str(e)}")
 
@@ -0,0 +1,276 @@
+"""
+Local pre-processing pipeline for the Knowledge Base corpora.
+
+The sample corpora (kb_files/*.docx, onboarding_files/*.pdf, the Ollama sample PDF) are uploaded
+raw and parsed remotely during ingestion. This module extracts the text locally instead:
+    - text extraction (.docx with the standard library, .pdf with pypdf, .txt/.md as is)
+    - cleanup (unicode normalization, de-hyphenation, whitespace and control characters)
+    - deduplication of repeated headers/footers and of identical documents
+across a process pool, and writes the normalized text as JSONL shards (<output>/jsonl) and/or
+one .txt file per document (<output>/text). Each run replaces the previous output of its formats.
+
+Extraction results are cached by file hash, so re-running the pipeline only processes new or
+modified files. The JSONL shards can be used directly by utils/chunking_tuner.py, and the .txt
+output can be uploaded to the data source bucket in place of the raw files.
+
+Usage:
+    python utils/preprocess.py --input onboarding_files ../01-connecting-with-aws-services/prereqs/kb_files \
+        --output processed/ --format jsonl txt
+    python utils/chunking_tuner.py --corpus processed/jsonl ...
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import unicodedata
+import zipfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from xml.etree import ElementTree
+
+supported_extensions = (".docx", ".pdf", ".txt", ".md")
+# Bumped when extraction or cleanup change, so cached results of older versions are not reused
+cache_version = 2
+# A single-line paragraph of this length range repeated this many times is a header or footer
+header_footer_chars = (20, 120)
+header_footer_min_repeats = 3
+word_namespace = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+def file_sha256(path: str):
+    """
+    Return the sha256 hex digest of a file
+    Args:
+        path (str): path to the file
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def extract_docx(path: str):
+    """
+    Extract the paragraphs of a .docx document (including table cells) without external dependencies
+    Args:
+        path (str): path to the document
+    """
+    with zipfile.ZipFile(path) as archive:
+        root = ElementTree.fromstring(archive.read("word/document.xml"))
+    paragraphs = []
+    for paragraph in root.iter(f"{word_namespace}p"):
+        text = "".join(node.text or "" for node in paragraph.iter(f"{word_namespace}t"))
+        paragraphs.append(text)
+    return "\n\n".join(paragraphs)
+
+
+def extract_pdf(path: str):
+    """
+    Extract the text of a .pdf document page by page
+    Args:
+        path (str): path to the document
+    """
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise ImportError("pypdf is required to extract PDF files: pip install pypdf")
+    reader = PdfReader(path)
+    return "\n\n".join(page.extract_text() or "" for page in reader.pages)
+
+
+def extract_text(path: str):
+    """
+    Extract the raw text of a supported document
+    Args:
+        path (str): path to the document
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".docx":
+        return extract_docx(path)
+    if extension == ".pdf":
+        return extract_pdf(path)
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+def clean_text(text: str):
+    """
+    Normalize extracted text: NFKC unicode, no control characters, words hyphenated across line
+    breaks joined, whitespace collapsed, consecutive duplicate lines removed and headers/footers
+    (single-line paragraphs repeated on many pages) kept only once. Other repeated paragraphs are
+    content and are kept
+    Args:
+        text (str): the raw extracted text
+    """
+    text = unicodedata.normalize("NFKC", text)
+    text = "".join(ch for ch in text if ch in "\n\t" or unicodedata.category(ch)[0] != "C")
+    text = re.sub(r"(\w)-\n(\w)", r"\1\2", text)
+
+    paragraphs = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        lines = []
+        for line in paragraph.split("\n"):
+            line = " ".join(line.split())
+            # PDF text layers often repeat headings on consecutive lines
+            if line and (not lines or line != lines[-1]):
+                lines.append(line)
+        if lines:
+            paragraphs.append("\n".join(lines))
+
+    # keep short repeated lines (e.g. "Price") and repeated content, drop repeated headers/footers
+    counts = Counter(p.lower() for p in paragraphs if "\n" not in p)
+    min_chars, max_chars = header_footer_chars
+    kept, seen = [], set()
+    for paragraph in paragraphs:
+        key = paragraph.lower()
+        header_footer = counts.get(key, 0) >= header_footer_min_repeats and min_chars < len(paragraph) <= max_chars
+        if header_footer and key in seen:
+            continue
+        seen.add(key)
+        kept.append(paragraph)
+    return "\n\n".join(kept)
+
+
+def process_file(path: str, cache_dir: str):
+    """
+    Extract and clean a single file, using the cache when the file hash was already processed.
+    Runs in a worker process
+    Args:
+        path (str): path to the document
+        cache_dir (str): directory holding the extraction cache
+    Returns:
+        dict with the source path, file hash, cleaned text and whether it was served from cache
+    """
+    sha256 = file_sha256(path)
+    cache_file = os.path.join(cache_dir, f"{sha256}-v{cache_version}.json")
+    if os.path.exists(cache_file):
+        with open(cache_file, "r", encoding="utf-8") as f:
+            record = json.load(f)
+        record["source"] = path
+        record["cached"] = True
+        return record
+
+    try:
+        text = clean_text(extract_text(path))
+        error = None
+    except Exception as e:
+        text, error = "", str(e)
+    record = {"source": path, "sha256": sha256, "text": text, "error": error}
+    if error is None:
+        with open(cache_file, "w", encoding="utf-8") as f:
+            json.dump(record, f)
+    record["cached"] = False
+    return record
+
+
+def list_files(inputs):
+    """
+    List the supported files under the given files or directories
+    Args:
+        inputs (list): files or directories
+    """
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, names in os.walk(item):
+                files.extend(os.path.join(root, n) for n in sorted(names) if n.lower().endswith(supported_extensions))
+        elif item.lower().endswith(supported_extensions):
+            files.append(item)
+    return files
+
+
+def _reset_output_dir(path: str, extension: str):
+    """
+    Create an output directory, removing the files of a previous run (e.g. extra shards)
+    Args:
+        path (str): the output directory
+        extension (str): extension of the files written there
+    """
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(path):
+        if name.endswith(extension):
+            os.remove(os.path.join(path, name))
+    return path
+
+
+def preprocess_corpus(inputs, output_dir: str, formats=("jsonl",), shard_size: int = 500, max_workers: int = None, cache_dir: str = None):
+    """
+    Run extraction, cleanup and deduplication over a corpus with a process pool and write the
+    normalized output
+    Args:
+        inputs (list): files or directories to process
+        output_dir (str): where to write the output
+        formats (tuple): "jsonl" for JSONL shards in <output_dir>/jsonl, "txt" for one normalized .txt
+            file per document in <output_dir>/text
+        shard_size (int): number of documents per JSONL shard
+        max_workers (int): size of the process pool, defaults to the number of CPUs
+        cache_dir (str): extraction cache directory, defaults to <output_dir>/.cache
+    Returns:
+        dict with processing statistics
+    """
+    cache_dir = cache_dir or os.path.join(output_dir, ".cache")
+    os.makedirs(cache_dir, exist_ok=True)
+    files = list_files(inputs)
+    print(f"Processing {len(files)} files with {max_workers or os.cpu_count()} workers")
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        records = list(executor.map(process_file, files, [cache_dir] * len(files)))
+
+    stats = {"files": len(files), "cached": 0, "errors": 0, "duplicates": 0, "documents": 0}
+    documents = []
+    seen_texts = set()
+    for record in records:
+        stats["cached"] += record["cached"]
+        if record.get("error"):
+            stats["errors"] += 1
+            print(f"Could not extract {record['source']}: {record['error']}")
+            continue
+        text_hash = hashlib.sha256(record["text"].encode("utf-8")).hexdigest()
+        if not record["text"] or text_hash in seen_texts:
+            stats["duplicates"] += 1
+            continue
+        seen_texts.add(text_hash)
+        documents.append({
+            "id": record["sha256"][:16],
+            "source": record["source"],
+            "sha256": record["sha256"],
+            "text": record["text"],
+            "num_chars": len(record["text"]),
+        })
+    stats["documents"] = len(documents)
+
+    if "jsonl" in formats:
+        shard_dir = _reset_output_dir(os.path.join(output_dir, "jsonl"), ".jsonl")
+        for shard, start in enumerate(range(0, len(documents), shard_size)):
+            shard_path = os.path.join(shard_dir, f"shard-{shard:05d}.jsonl")
+            with open(shard_path, "w", encoding="utf-8") as f:
+                for document in documents[start:start + shard_size]:
+                    f.write(json.dumps(document, ensure_ascii=False) + "\n")
+    if "txt" in formats:
+        text_dir = _reset_output_dir(os.path.join(output_dir, "text"), ".txt")
+        for document in documents:
+            # the document id keeps files with the same name in different directories apart
+            name = os.path.splitext(os.path.basename(document["source"]))[0]
+            with open(os.path.join(text_dir, f"{name}-{document['id']}.txt"), "w", encoding="utf-8") as f:
+                f.write(document["text"])
+
+    print(
+        f"Wrote {stats['documents']} documents to {output_dir} "
+        f"({stats['cached']} from cache, {stats['duplicates']} duplicates, {stats['errors']} errors)"
+    )
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", nargs="+", required=True, help="Files or directories to process")
+    parser.add_argument("--output", required=True, help="Output directory")
+    parser.add_argument("--format", nargs="+", default=["jsonl"], choices=["jsonl", "txt"], help="Output formats")
+    parser.add_argument("--shard_size", type=int, default=500, help="Documents per JSONL shard")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes")
+    args = parser.parse_args()
+
+    preprocess_corpus(args.input, args.output, formats=args.format, shard_size=args.shard_size, max_workers=args.workers)
@@ -12,14 +12,22 @@ from a2a.types import (
 )
 
 from agent_executor import StrandsAgentExecutor
+from mcp_pool import POOL_SIZE
 
 
 @click.command()
 @click.option("--host", "host", default="localhost")
 @click.option("--port", "port", default=10000)
-def main(host: str, port: int):
+@click.option(
+    "--mcp-servers",
+    "mcp_servers",
+    default=POOL_SIZE,
+    help="Number of AWS Documentation MCP server processes (default: MCP_POOL_SIZE or 2)",
+)
+def main(host: str, port: int, mcp_servers: int):
+    agent_executor = StrandsAgentExecutor(mcp_servers=mcp_servers)
     request_handler = DefaultRequestHandler(
-        agent_executor=StrandsAgentExecutor(),
+        agent_executor=agent_executor,
         task_store=InMemoryTaskStore(),
     )
 
@@ -28,7 +36,10 @@ def main(host: str, port: int):
     )
     import uvicorn
 
-    uvicorn.run(server.build(), host=host, port=port)
+    try:
+        uvicorn.run(server.build(), host=host, port=port)
+    finally:
+        agent_executor.agent.close()
 
 
 def get_agent_card(host: str, port: int):
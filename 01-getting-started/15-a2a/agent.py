@@ -1,7 +1,7 @@
 from mcp import StdioServerParameters, stdio_client
 from strands import Agent
-from strands.tools.mcp import MCPClient
 from strands_tools import file_write
+from mcp_pool import MCPClientPool, POOL_SIZE
 import os
 import json
 import asyncio
@@ -10,24 +10,35 @@ import asyncio
 class StrandAgent:
     SUPPORTED_CONTENT_TYPES = ["text", "text/plain"]
 
-    def __init__(self):
+    def __init__(self, mcp_servers: int = POOL_SIZE):
+        """
+        Args:
+            mcp_servers (int): number of AWS Documentation MCP server processes the tool calls of
+                the concurrent sessions are balanced over
+        Raises:
+            RuntimeError: no MCP server process could be started
+        """
         self.agent = None
 
-        try:
-            os.makedirs("sessions", exist_ok=True)
-            self.documentation_mcp_server = MCPClient(
-                lambda: stdio_client(
-                    StdioServerParameters(
-                        command="uvx",
-                        args=["awslabs.aws-documentation-mcp-server@latest"],
-                    )
+        os.makedirs("sessions", exist_ok=True)
+        self.documentation_mcp_pool = MCPClientPool(
+            lambda: stdio_client(
+                StdioServerParameters(
+                    command="uvx",
+                    args=["awslabs.aws-documentation-mcp-server@latest"],
                 )
-            )
-            self.documentation_mcp_server.start()
-            self.tools = self.documentation_mcp_server.list_tools_sync() + [file_write]
-
+            ),
+            size=mcp_servers,
+        )
+        try:
+            self.documentation_mcp_pool.start()
         except Exception as e:
-            return f"Error initializing agent: {str(e)}"
+            raise RuntimeError(f"Error initializing agent: {e}") from e
+        self.tools = self.documentation_mcp_pool.tools + [file_write]
+
+    def close(self):
+        """Stop the MCP server processes"""
+        self.documentation_mcp_pool.stop()
 
     def _load_agent_from_memory(self, session_id: str) -> str:
         session_path = os.path.join("sessions", f"{session_id}.json")
@@ -65,7 +76,7 @@ class StrandAgent:
                 )
             return agent
         except Exception as e:
-            raise f"Error Loading agent from memory: {e}"
+            raise RuntimeError(f"Error Loading agent from memory: {e}") from e
 
     def _store_agent_into_memory(self, agent: Agent, session_id: str) -> bool:
         session_path = os.path.join("sessions", f"{session_id}.json")
@@ -110,15 +121,18 @@ class StrandAgent:
             self._store_agent_into_memory(agent, session_id)
 
         except Exception as e:
-            raise f"Error invoking agent: {e}"
+            raise RuntimeError(f"Error invoking agent: {e}") from e
         return response
 
 
 async def main():
     agent = StrandAgent()
 
-    async for chunk in agent.stream("hello", "123"):
-        print(chunk, "")
+    try:
+        async for chunk in agent.stream("hello", "123"):
+            print(chunk, "")
+    finally:
+        agent.close()
 
 
 if __name__ == "__main__":
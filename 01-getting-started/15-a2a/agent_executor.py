@@ -1,4 +1,5 @@
 from agent import StrandAgent
+from mcp_pool import POOL_SIZE
 from typing_extensions import override
 
 from a2a.server.agent_execution import AgentExecutor, RequestContext
@@ -17,8 +18,8 @@ from a2a.utils.errors import ServerError
 class StrandsAgentExecutor(AgentExecutor):
     """Currency AgentExecutor Example."""
 
-    def __init__(self):
-        self.agent = StrandAgent()
+    def __init__(self, mcp_servers: int = POOL_SIZE):
+        self.agent = StrandAgent(mcp_servers=mcp_servers)
 
     @override
     async def execute(
@@ -0,0 +1,253 @@
+"""
+Pool of MCP server processes shared by the A2A agent sessions.
+
+A single stdio MCP server serializes the tool calls of all the concurrent A2A tasks on one pipe, and
+when the process dies every later tool call fails until the A2A server is restarted. MCPClientPool
+runs `size` copies of the server, each behind its own MCPClient:
+    - tool calls go to the healthy client with the fewest calls in flight (round robin on ties),
+      and are retried on another client when the session of the chosen one is down
+    - a monitor thread probes every client (list_tools) every probe_interval seconds and restarts
+      the ones that failed a probe or a call, once their calls in flight have returned
+The pool exposes the server tools as MCPAgentTools whose client is the pool itself, so an Agent
+built with pool.tools is load-balanced without knowing about the pool.
+
+Usage:
+    pool = MCPClientPool(lambda: stdio_client(StdioServerParameters(command="uvx", args=[...])), size=2)
+    pool.start()
+    agent = Agent(tools=pool.tools)
+    pool.stop()
+"""
+
+import itertools
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from strands.tools.mcp import MCPClient
+from strands.tools.mcp.mcp_agent_tool import MCPAgentTool
+
+logger = logging.getLogger(__name__)
+
+POOL_SIZE = int(os.environ.get("MCP_POOL_SIZE", "2"))
+PROBE_INTERVAL_SECONDS = float(os.environ.get("MCP_PROBE_INTERVAL_SECONDS", "30"))
+PROBE_TIMEOUT_SECONDS = float(os.environ.get("MCP_PROBE_TIMEOUT_SECONDS", "10"))
+
+# MCPClient returns the exceptions of a call as error results with this prefix, while the errors of
+# the tool itself come from the server. These markers tell a dead session from a bad request
+CLIENT_ERROR_PREFIX = "Tool execution failed:"
+TRANSPORT_ERROR_MARKERS = ("session", "connection", "closed", "timed out", "timeout", "broken pipe", "end of stream", "eof")
+
+
+def is_transport_failure(result):
+    """
+    Whether an MCP tool result reports a failure of the client session rather than of the tool
+    Args:
+        result (dict): ToolResult returned by MCPClient.call_tool_sync / call_tool_async
+    """
+    if not isinstance(result, dict) or result.get("status") != "error":
+        return False
+    text = " ".join(c.get("text", "") for c in result.get("content", []) if isinstance(c, dict)).strip()
+    if not text.startswith(CLIENT_ERROR_PREFIX):
+        return False
+    # anyio stream errors (closed or broken pipe to the server process) have an empty message
+    error = text[len(CLIENT_ERROR_PREFIX):].strip().lower()
+    return not error or any(marker in error for marker in TRANSPORT_ERROR_MARKERS)
+
+
+class _PoolMember:
+    """One MCP server process and its client"""
+
+    def __init__(self, index):
+        self.index = index
+        self.client = None
+        self.healthy = False
+        self.in_flight = 0
+        self.calls = 0
+        self.failures = 0
+        self.restarts = 0
+
+
+class MCPClientPool:
+    """
+    Load-balanced, self-healing pool of MCP clients of the same server
+    Args:
+        transport_factory (callable): transport of one server process, as given to MCPClient
+        size (int): number of server processes
+        probe_interval (float): seconds between two health probes of a client
+        probe_timeout (float): seconds a probe may take before the client is restarted
+    """
+
+    def __init__(self, transport_factory, size=POOL_SIZE, probe_interval=PROBE_INTERVAL_SECONDS, probe_timeout=PROBE_TIMEOUT_SECONDS):
+        if size < 1:
+            raise ValueError("The MCP client pool needs at least one server process")
+        self.transport_factory = transport_factory
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.members = [_PoolMember(i) for i in range(size)]
+        self.tools = []
+        self._lock = threading.Lock()
+        self._round_robin = itertools.count()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._probe_executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="mcp-probe")
+        self._monitor = None
+
+    def start(self):
+        """
+        Start the server processes and the monitor, and load the tools
+        Raises:
+            RuntimeError: no server process could be started
+        """
+        with ThreadPoolExecutor(max_workers=len(self.members)) as executor:
+            list(executor.map(self._start_member, self.members))
+        healthy = [m for m in self.members if m.healthy]
+        if not healthy:
+            self.stop()
+            raise RuntimeError("Could not start any MCP server process")
+        self.tools = [MCPAgentTool(tool.mcp_tool, self) for tool in healthy[0].client.list_tools_sync()]
+        self._monitor = threading.Thread(target=self._monitor_loop, name="mcp-pool-monitor", daemon=True)
+        self._monitor.start()
+        logger.info("MCP client pool started: %d/%d server processes, %d tools", len(healthy), len(self.members), len(self.tools))
+        return self
+
+    def stop(self):
+        """Stop the monitor and the server processes"""
+        self._stopped.set()
+        self._wake.set()
+        for member in self.members:
+            self._stop_member(member)
+        self._probe_executor.shutdown(wait=False)
+
+    def _start_member(self, member):
+        try:
+            client = MCPClient(self.transport_factory)
+            client.start()
+        except Exception as e:
+            logger.warning("Could not start MCP server process %d: %s", member.index, e)
+            return
+        with self._lock:
+            member.client = client
+            member.healthy = True
+
+    def _stop_member(self, member):
+        with self._lock:
+            client, member.client, member.healthy = member.client, None, False
+        if client is not None:
+            try:
+                client.stop(None, None, None)
+            except Exception as e:
+                logger.debug("Error stopping MCP server process %d: %s", member.index, e)
+
+    def _restart_member(self, member):
+        with self._lock:
+            # an unhealthy member gets no new calls: wait for the calls in flight to return before
+            # stopping the client they run on (_release wakes the monitor when it is drained)
+            if member.in_flight:
+                logger.debug("MCP server process %d has %d calls in flight, restart postponed", member.index, member.in_flight)
+                return
+        self._stop_member(member)
+        self._start_member(member)
+        member.restarts += 1
+        logger.info("Restarted MCP server process %d (%s)", member.index, "healthy" if member.healthy else "still down")
+
+    def _mark_unhealthy(self, member, error):
+        with self._lock:
+            member.healthy = False
+            member.failures += 1
+        logger.warning("MCP server process %d is unhealthy: %s", member.index, error)
+        self._wake.set()
+
+    def _probe(self, member):
+        client = member.client
+        if client is None:
+            return False
+        try:
+            self._probe_executor.submit(client.list_tools_sync).result(timeout=self.probe_timeout)
+            return True
+        except TimeoutError:
+            self._mark_unhealthy(member, f"no answer to the probe within {self.probe_timeout}s")
+        except Exception as e:
+            self._mark_unhealthy(member, e)
+        return False
+
+    def _monitor_loop(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.probe_interval)
+            self._wake.clear()
+            for member in self.members:
+                if self._stopped.is_set():
+                    return
+                if member.healthy:
+                    self._probe(member)
+                if not member.healthy:
+                    self._restart_member(member)
+
+    def _acquire(self, exclude):
+        """Pick the healthy client with the fewest calls in flight"""
+        with self._lock:
+            candidates = [m for m in self.members if m.healthy and m not in exclude]
+            if not candidates:
+                return None
+            offset = next(self._round_robin)
+            member = min(candidates, key=lambda m: (m.in_flight, (m.index - offset) % len(self.members)))
+            member.in_flight += 1
+            member.calls += 1
+            return member
+
+    def _release(self, member):
+        with self._lock:
+            member.in_flight -= 1
+            drained = not member.healthy and member.in_flight == 0
+        if drained:
+            self._wake.set()
+
+    def call_tool_sync(self, *args, **kwargs):
+        """
+        MCPClient.call_tool_sync on the least busy healthy client. A result reporting a dead session
+        (MCPClient returns the exceptions of the call as error results) marks the client unhealthy and
+        the call is retried on another one; the last such result is returned when every client failed
+        """
+        tried, failed_result = [], None
+        while True:
+            member = self._acquire(tried)
+            if member is None:
+                return self._no_member_left(failed_result)
+            tried.append(member)
+            try:
+                result = member.client.call_tool_sync(*args, **kwargs)
+            except Exception as e:
+                self._mark_unhealthy(member, e)
+                continue
+            finally:
+                self._release(member)
+            if not is_transport_failure(result):
+                return result
+            self._mark_unhealthy(member, result["content"][0].get("text"))
+            failed_result = result
+
+    async def call_tool_async(self, *args, **kwargs):
+        """MCPClient.call_tool_async on the least busy healthy client, see call_tool_sync"""
+        tried, failed_result = [], None
+        while True:
+            member = self._acquire(tried)
+            if member is None:
+                return self._no_member_left(failed_result)
+            tried.append(member)
+            try:
+                result = await member.client.call_tool_async(*args, **kwargs)
+            except Exception as e:
+                self._mark_unhealthy(member, e)
+                continue
+            finally:
+                self._release(member)
+            if not is_transport_failure(result):
+                return result
+            self._mark_unhealthy(member, result["content"][0].get("text"))
+            failed_result = result
+
+    @staticmethod
+    def _no_member_left(failed_result):
+        if failed_result is not None:
+            return failed_result
+        raise RuntimeError("No healthy MCP server process available")